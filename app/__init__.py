@@ -3,82 +3,142 @@ import logging
 from datetime import datetime
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
+from .logging_config import configure_logging
+from .db_routing import RoutingSession, replica_set
+from . import db_tuning
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
-logger.debug("Starting Learning Management System")
 
 # Create base class for SQLAlchemy models
 class Base(DeclarativeBase):
     pass
 
 # Initialize SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
 # Initialize other extensions
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless enforcement is switched on per connection
+    if type(dbapi_connection).__module__.startswith('sqlite3'):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
 def create_app():
     """Application factory pattern"""
+    from .startup import timed, register_startup_report
+    from .templating import init_template_cache, register_template_cli
+
     app = Flask(__name__)
     app.config.from_object(Config)
-    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    configure_logging(app.config)
+    logger.debug("Starting Learning Management System")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=1, x_host=1)
 
     # Configure the database
     database_url = app.config['DATABASE_URL']
     if 'sqlite' in database_url.lower():
         logger.info("Using SQLite database for local development")
     else:
-        logger.info(f"Using database: {database_url.split('@')[0].split('://')[0]}://...")
+        logger.info("Using database: %s://...", database_url.split('@')[0].split('://')[0])
     
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    replica_set.configure(app)
+    db_tuning.configure(app)
 
     # Initialize extensions
-    db.init_app(app)
-    login_manager.init_app(app)
-    csrf.init_app(app)
+    with timed(app, 'extensions'):
+        db.init_app(app)
+        db_tuning.init_app(app)
+        replica_set.init_app(app)
+        login_manager.init_app(app)
+        csrf.init_app(app)
     
+    init_template_cache(app)
+
     # Configure login manager
-    login_manager.login_view = 'main.login'
+    login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
 
     with app.app_context():
-        # Import models to create tables
-        from . import models
-        db.create_all()
-        logger.info("Database tables created successfully")
-        
-        # Download NLTK data for document analysis
-        try:
-            import nltk
-            logger.info("Downloading NLTK data for document analysis...")
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True) 
-            nltk.download('wordnet', quiet=True)
-            logger.info("Downloaded NLTK resource: punkt")
-            logger.info("Downloaded NLTK resource: stopwords")
-            logger.info("Downloaded NLTK resource: wordnet")
-        except Exception as e:
-            logger.warning(f"Could not download NLTK data: {e}")
-
-        # Import and register routes
-        from . import routes
-        routes.register_routes(app)
+        # Import models and verify the stored schema version; DDL only
+        # runs from `flask schema upgrade` (or SCHEMA_AUTO_UPGRADE=1)
+        with timed(app, 'models'):
+            from . import models
+        with timed(app, 'schema_check'):
+            from .schema import check_schema, register_cli
+            if check_schema(app):
+                logger.info("Database schema is up to date")
+        register_cli(app)
+
+        from .utils.catalog_cache import catalog_cache
+        catalog_cache.init_app(app)
+
+        from .cache import cache
+        cache.init_app(app)
+
+        from . import metrics
+        metrics.init_app(app)
+
+        from . import profiling
+        profiling.init_app(app)
+
+        from . import admission
+        admission.init_app(app)
+
+        # Import and register blueprints; NLTK data for document analysis
+        # is fetched by download_nltk_data.py at deploy time, not here
+        with timed(app, 'routes'):
+            from . import routes
+            routes.register_routes(app)
         logger.debug("Routes imported successfully")
         
         # Register context processors
         register_context_processors(app)
+        register_startup_report(app)
+        register_template_cli(app)
+
+        from .utils.activity_log import register_activity_cli
+        register_activity_cli(app)
+
+        from .utils.analytics import register_analytics_cli
+        register_analytics_cli(app)
+
+        from .utils.lesson_ingest import register_lessons_cli
+        register_lessons_cli(app)
+
+        from .utils.course_progress import register_progress_cli
+        register_progress_cli(app)
+
+        from .utils.access_rules import register_access_cli
+        register_access_cli(app)
+
+        if app.config.get('PRELOAD_APP'):
+            with timed(app, 'preload'):
+                preload_app(app)
 
     return app
 
+def preload_app(app):
+    """Compile every template up front so forked workers share the result"""
+    from .templating import compile_templates
+    count = compile_templates(app)
+    logger.info("Preloaded %s application templates", count)
+
 # Template context processors
 def inject_now():
     return {'now': datetime.utcnow()}
@@ -0,0 +1,230 @@
+"""Admission control for endpoints that can monopolize a worker.
+
+Password hashing on login, QR rendering, document analysis and bulk admin
+actions are gated by ADMISSION_LIMITS. Each gated request first passes
+its per-IP and per-user rate limits, then takes a slot from the
+endpoint's concurrency limit and from a shared pool of
+ADMISSION_EXPENSIVE_SLOTS (by default half the worker threads sharing
+the counters), so ungated learner pages always find a free thread. A
+request that finds no free slot may wait up to ADMISSION_MAX_WAIT
+seconds in a bounded queue. Otherwise it is turned away at once with a
+429 (rate limited) or 503 (busy) and a ``Retry-After`` header.
+
+All counters live in the shared cache, so the limits span every worker
+that shares the backend. With the default per-process memory backend,
+the limits apply to each worker separately.
+
+Rate limits are sliding windows: the previous window's count, weighted
+by how much of it still overlaps, plus the current count. Slots are
+counters keyed by ADMISSION_LEASE_SECONDS epochs. A slot still held
+when its worker dies stops counting after two epochs, so the limit
+heals without cleanup.
+"""
+import math
+import time
+import logging
+from flask import current_app, g, request, session, jsonify, Response
+from flask_login import current_user
+from .cache import cache, MemoryBackend, RedisBackend, RedisError
+from .metrics import ADMISSION_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = 'adm:'
+_POLL_SECONDS = 0.05
+# The shared slot pool all gated endpoints draw from
+_POOL = 'expensive'
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+# ---------------------------------------------------------------- rate limits
+
+def _over_rate(name, identity, limit, period):
+    """Count this request against ``identity``; return seconds to wait if over ``limit``"""
+    now = time.time()
+    window, into = divmod(now, period)
+    key = f'{_PREFIX}rate:{name}:{identity}:'
+    current = cache.incr(f'{key}{int(window)}', ttl=2 * period)
+    previous = cache.counter(f'{key}{int(window) - 1}')
+    if previous * (1 - into / period) + current <= limit:
+        return None
+    return period - into
+
+
+def _user_identity():
+    """The account a request acts for, even before the user is logged in"""
+    if current_user.is_authenticated:
+        return f'u{current_user.id}'
+    # Half-way through login: password checked, 2FA pending or being set up
+    pending = session.get('user_id') or session.get('setup_user_id')
+    if pending:
+        return f'u{pending}'
+    email = request.form.get('email', '').strip().lower()
+    return f'e{email}' if email else None
+
+
+# ---------------------------------------------------------------- slots
+
+class _Slots:
+    """A concurrency limit shared through cache counters"""
+
+    def __init__(self, name, limit, lease):
+        self.name = name
+        self.limit = limit
+        self.lease = lease
+
+    def _keys(self):
+        epoch = int(time.time() // self.lease)
+        return (f'{_PREFIX}slots:{self.name}:{epoch}',
+                f'{_PREFIX}slots:{self.name}:{epoch - 1}')
+
+    def acquire(self):
+        """Take a slot; returns the key to release, or None when all are taken"""
+        key, previous = self._keys()
+        held = cache.incr(key, ttl=3 * self.lease) + cache.counter(previous)
+        if held <= self.limit:
+            return key
+        self.release(key)
+        return None
+
+    def release(self, key):
+        cache.incr(key, -1, ttl=3 * self.lease)
+
+
+def _acquire_all(slots):
+    taken = []
+    for slot in slots:
+        key = slot.acquire()
+        if key is None:
+            for held, held_key in taken:
+                held.release(held_key)
+            return None
+        taken.append((slot, key))
+    return taken
+
+
+def _admit(slots, queues, max_wait):
+    """Take every slot, waiting in the queues for at most ``max_wait`` seconds"""
+    taken = _acquire_all(slots)
+    if taken is not None:
+        return taken
+    if not max_wait:
+        raise Rejected(503, 'busy', 1)
+
+    waiting = []
+    try:
+        for queue in queues:
+            key = queue.acquire()
+            if key is None:
+                raise Rejected(503, 'queue_full', max_wait)
+            waiting.append((queue, key))
+        deadline = time.monotonic() + max_wait
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_SECONDS)
+            taken = _acquire_all(slots)
+            if taken is not None:
+                return taken
+        raise Rejected(503, 'timeout', max_wait)
+    finally:
+        for queue, key in waiting:
+            queue.release(key)
+
+
+# ---------------------------------------------------------------- hooks
+
+def _rule():
+    rule = current_app.config['ADMISSION_LIMITS'].get(request.endpoint)
+    if rule is None or request.method not in rule.get('methods', (request.method,)):
+        return None
+    return rule
+
+
+def _pool_size(config):
+    size = config['ADMISSION_EXPENSIVE_SLOTS']
+    if not size:
+        # Half the threads sharing the counters; the rest stay free for
+        # learner traffic. gunicorn.conf.py sets the real worker count.
+        threads = config['GUNICORN_THREADS']
+        if not isinstance(cache.backend, MemoryBackend):
+            threads *= config['WEB_CONCURRENCY']
+        size = max(1, threads // 2)
+    return size
+
+
+def _check(endpoint, rule):
+    config = current_app.config
+    limits = [('ip', request.remote_addr or 'unknown', rule.get('per_ip'))]
+    identity = _user_identity() if rule.get('per_user') else None
+    if identity:
+        limits.append(('user', identity, rule['per_user']))
+    for kind, who, limit in limits:
+        if limit:
+            wait = _over_rate(endpoint, who, *limit)
+            if wait is not None:
+                raise Rejected(429, f'rate_{kind}', wait)
+
+    lease = config['ADMISSION_LEASE_SECONDS']
+    pool = _pool_size(config)
+    slots = [_Slots(_POOL, pool, lease)]
+    queues = [_Slots(f'{_POOL}:queue', pool, lease)]
+    if rule.get('concurrency'):
+        slots.insert(0, _Slots(endpoint, rule['concurrency'], lease))
+        queues.insert(0, _Slots(f'{endpoint}:queue', rule.get('queue', 0), lease))
+    max_wait = config['ADMISSION_MAX_WAIT'] if rule.get('queue') else 0
+    return _admit(slots, queues, max_wait)
+
+
+def _rejection_response(rejected):
+    message = {429: 'Too many requests, please slow down.',
+               503: 'This action is busy right now, please try again shortly.'}[rejected.status]
+    # Kept cheap on purpose: no templates, no database
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'error': message, 'status': rejected.status})
+    else:
+        response = Response(message + '\n', mimetype='text/plain')
+    response.status_code = rejected.status
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response
+
+
+def _before_request():
+    rule = _rule()
+    if rule is None:
+        return None
+    endpoint = request.endpoint
+    try:
+        g._admission_slots = _check(endpoint, rule)
+    except Rejected as rejected:
+        ADMISSION_REJECTIONS.inc(endpoint, rejected.reason)
+        logger.info("Turned away %s %s (%s)", request.method, endpoint, rejected.reason)
+        return _rejection_response(rejected)
+    except (RedisError, OSError) as e:
+        # Without the shared store, serve the request rather than fail it
+        logger.warning("Admission control unavailable, admitting %s: %s", endpoint, e)
+    return None
+
+
+def _teardown_request(exc):
+    for slot, key in g.pop('_admission_slots', None) or ():
+        try:
+            slot.release(key)
+        except (RedisError, OSError) as e:
+            logger.warning("Could not release %s slot: %s", slot.name, e)
+
+
+def init_app(app):
+    """Gate the endpoints in ADMISSION_LIMITS; call after the cache is set up"""
+    if not app.config.get('ADMISSION_ENABLED', True):
+        return
+    if isinstance(cache.backend, RedisBackend) and not app.config['ADMISSION_EXPENSIVE_SLOTS']:
+        logger.warning("ADMISSION_EXPENSIVE_SLOTS is unset: the shared pool is sized from this "
+                       "host's workers; set it to the total for every host using this Redis")
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
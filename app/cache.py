@@ -0,0 +1,487 @@
+import os
+import mmap
+import time
+import socket
+import pickle
+import random
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from sqlalchemy import event
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_TAG_PREFIX = 'tag:'
+
+
+class CacheBackend:
+    """Storage driver interface; values reaching a driver are already wrapped with tag versions"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key, amount=1, ttl=None):
+        """Atomically add amount to an integer counter, creating it at 0"""
+        raise NotImplementedError
+
+    def counters(self, keys):
+        """Current values of counters created by incr, 0 when missing"""
+        return [value or 0 for value in self.get_many(keys)]
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU dictionary"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            value = (entry[0] if entry else 0) + amount
+            expires = entry[1] if entry else (time.monotonic() + ttl if ttl else None)
+            self._data[key] = (value, expires)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FilesystemBackend(CacheBackend):
+    """One file per key in a directory shared by all workers on the host.
+
+    Files are written atomically (temp file + rename) and read through
+    mmap; counters are updated under an exclusive flock. Expired files are
+    removed when read, and every ``sweep_interval`` seconds a write also
+    checks up to ``sweep_limit`` files for expired entries that nobody
+    reads any more.
+    """
+
+    def __init__(self, directory, sweep_interval=60, sweep_limit=1000):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self.sweep_limit = sweep_limit
+        self._next_sweep = time.monotonic() + sweep_interval
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, '.lock')
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _entry(self, path):
+        """``(expires, value)`` stored at path, expired or not; None if missing"""
+        try:
+            with open(path, 'rb') as handle:
+                with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    return pickle.loads(view)
+        except (FileNotFoundError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def _expired(expires):
+        return expires is not None and expires <= time.time()
+
+    def _read(self, path):
+        entry = self._entry(path)
+        if entry is None:
+            return None, False
+        expires, value = entry
+        if self._expired(expires):
+            self._discard(path)
+            return None, False
+        return value, True
+
+    def _write(self, path, value, expires):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            pickle.dump((expires, value), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def _maybe_sweep(self):
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    def _remove_if_expired(self, path):
+        # Caller holds the lock: a counter rewritten since it was read stays
+        entry = self._entry(path)
+        if entry is not None and self._expired(entry[0]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return True
+        return False
+
+    def _discard(self, path):
+        with self._locked():
+            self._remove_if_expired(path)
+
+    @contextmanager
+    def _locked(self):
+        import fcntl
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def sweep(self):
+        """Remove expired entries among up to sweep_limit files; returns how many"""
+        names = [name for name in os.listdir(self.directory) if not name.startswith('.')]
+        if len(names) > self.sweep_limit:
+            names = random.sample(names, self.sweep_limit)
+        removed = 0
+        with self._locked():
+            for name in names:
+                removed += self._remove_if_expired(os.path.join(self.directory, name))
+        return removed
+
+    def get(self, key):
+        return self._read(self._path(key))[0]
+
+    def set(self, key, value, ttl=None):
+        self._write(self._path(key), value, time.time() + ttl if ttl else None)
+        self._maybe_sweep()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def incr(self, key, amount=1, ttl=None):
+        path = self._path(key)
+        with self._locked():
+            entry = self._entry(path)
+            if entry is None or self._expired(entry[0]):
+                value, expires = amount, time.time() + ttl if ttl else None
+            else:
+                # An existing counter keeps the expiry it was created with
+                expires, value = entry[0], entry[1] + amount
+            self._write(path, value, expires)
+        self._maybe_sweep()
+        return value
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name != '.lock':
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP client for Redis or any Redis-compatible server.
+
+    Keeps one connection per thread and reconnects once on socket errors.
+    Only the handful of commands the cache needs are implemented.
+    """
+
+    def __init__(self, url, prefix='', timeout=2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or '/0').lstrip('/') or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+        if hasattr(os, 'register_at_fork'):
+            # A socket inherited from the gunicorn master must not be shared
+            os.register_at_fork(after_in_child=self._forget_connections)
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password, retry=False)
+        if self.db:
+            self._call('SELECT', self.db, retry=False)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _encode(self, args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            out.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(out)
+
+    def _reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by cache server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._reply() for _ in range(count)]
+        raise RedisError(f'Unexpected reply {line!r}')
+
+    def _call(self, *args, retry=True):
+        try:
+            if getattr(self._local, 'sock', None) is None:
+                self._connect()
+            self._local.sock.sendall(self._encode(args))
+            return self._reply()
+        except (OSError, ConnectionError):
+            self._disconnect()
+            if not retry:
+                raise
+            return self._call(*args, retry=False)
+
+    def get(self, key):
+        raw = self._call('GET', self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        raws = self._call('MGET', *[self.prefix + key for key in keys])
+        return [pickle.loads(raw) if raw is not None else None for raw in raws]
+
+    def set(self, key, value, ttl=None):
+        args = ['SET', self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)]
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        self._call(*args)
+
+    def delete(self, key):
+        self._call('DEL', self.prefix + key)
+
+    def incr(self, key, amount=1, ttl=None):
+        # Counters are stored as plain integers, not pickles, so INCRBY works
+        value = self._call('INCRBY', self.prefix + key, amount)
+        if ttl and value == amount:
+            self._call('PEXPIRE', self.prefix + key, int(ttl * 1000))
+        return value
+
+    def counters(self, keys):
+        if not keys:
+            return []
+        raws = self._call('MGET', *[self.prefix + key for key in keys])
+        return [int(raw) if raw is not None else 0 for raw in raws]
+
+    def clear(self):
+        cursor = b'0'
+        while True:
+            cursor, keys = self._call('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            if keys:
+                self._call('DEL', *keys)
+            if cursor in (b'0', '0', 0):
+                break
+
+
+class Cache:
+    """Application cache with TTLs, tags and counters over a pluggable backend.
+
+    Tags are version counters stored in the backend: each entry remembers
+    the versions of its tags when it was written and is treated as a miss
+    once any of them has been bumped. Commits that touch a table bump the
+    ``table:<name>`` tag, so entries tagged with the tables they were
+    computed from expire on their own in every worker.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.default_ttl = None
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config, app.instance_path)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL') or None
+        app.extensions['cache'] = self
+        from . import db
+        if not event.contains(db.session, 'after_commit', _invalidate_committed_tables):
+            event.listen(db.session, 'before_flush', _track_flush_tables)
+            event.listen(db.session, 'do_orm_execute', _track_statement_table)
+            event.listen(db.session, 'after_commit', _invalidate_committed_tables)
+            event.listen(db.session, 'after_rollback', _clear_tracked_tables)
+        logger.info("Cache backend: %s", type(self.backend).__name__)
+
+    def _tag_versions(self, tags):
+        if not tags:
+            return ()
+        versions = self.backend.counters([_TAG_PREFIX + tag for tag in tags])
+        return tuple(zip(tags, versions))
+
+    def _unwrap(self, entry):
+        if entry is None:
+            return None
+        value, tag_versions = entry
+        if tag_versions:
+            tags = [tag for tag, _ in tag_versions]
+            if self._tag_versions(tags) != tag_versions:
+                return None
+        return value
+
+    def get(self, key, default=None):
+        value = self._unwrap(self.backend.get(key))
+        CACHE_REQUESTS.inc('app', 'miss' if value is None else 'hit')
+        return default if value is None else value
+
+    def get_many(self, *keys):
+        values = [self._unwrap(entry) for entry in self.backend.get_many(list(keys))]
+        misses = values.count(None)
+        if misses:
+            CACHE_REQUESTS.inc('app', 'miss', amount=misses)
+        if len(values) > misses:
+            CACHE_REQUESTS.inc('app', 'hit', amount=len(values) - misses)
+        return values
+
+    def set(self, key, value, ttl=None, tags=()):
+        """Store value; it expires after ttl seconds or when one of its tags is invalidated"""
+        self.backend.set(key, (value, self._tag_versions(tuple(tags))), ttl or self.default_ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        """Atomically increment a shared counter and return its new value"""
+        return self.backend.incr(key, amount, ttl)
+
+    def counter(self, key):
+        """Read a counter maintained with incr (0 if it does not exist)"""
+        return self.backend.counters([key])[0]
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            self.backend.incr(_TAG_PREFIX + tag)
+
+    def clear(self):
+        self.backend.clear()
+
+    def memoize(self, key, compute, ttl=None, tags=()):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, ttl=ttl, tags=tags)
+        return value
+
+
+def make_backend(config, instance_path='.'):
+    """Build the backend named by CACHE_BACKEND"""
+    name = config.get('CACHE_BACKEND', 'memory')
+    if name == 'memory':
+        return MemoryBackend(max_entries=config.get('CACHE_MAX_ENTRIES', 10000))
+    if name == 'filesystem':
+        return FilesystemBackend(config.get('CACHE_DIR') or os.path.join(instance_path, 'cache'))
+    if name == 'redis':
+        return RedisBackend(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+                            prefix=config.get('CACHE_KEY_PREFIX', 'lms:'))
+    raise ValueError(f"Unknown CACHE_BACKEND {name!r}")
+
+
+def table_tag(table_name):
+    """Tag bumped whenever a commit writes to the table"""
+    return f'table:{table_name}'
+
+
+def _track_flush_tables(session, flush_context, instances):
+    tables = session.info.setdefault('cache_tables', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+
+def _track_statement_table(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None:
+        orm_execute_state.session.info.setdefault('cache_tables', set()).add(table.name)
+
+
+def _invalidate_committed_tables(session):
+    tables = session.info.pop('cache_tables', None)
+    if tables:
+        try:
+            cache.invalidate_tags(*(table_tag(name) for name in tables))
+        except Exception as e:
+            logger.error("Failed to invalidate cache tags for %s: %s", sorted(tables), e)
+
+
+def _clear_tracked_tables(session):
+    session.info.pop('cache_tables', None)
+
+
+cache = Cache()
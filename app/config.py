@@ -12,11 +12,152 @@ class Config:
     else:
         DATABASE_URL = db_url or 'sqlite:///lms.db'
     
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
+    # Engine options come from the per-backend profiles in app/db_tuning.py;
+    # anything set here overrides them for every engine
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # SQLite: journal mode, fsync level, page cache (KiB), memory map (bytes)
+    # and how long a writer waits for the lock before "database is locked"
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '15000'))
+
+    # PostgreSQL pools are per worker process. DB_POOL_SIZE defaults to the
+    # worker's threads plus one; DB_MAX_OVERFLOW, when unset, splits
+    # DB_MAX_CONNECTIONS (the server's budget for this app) across
+    # WEB_CONCURRENCY workers. Checkouts only ping connections idle for
+    # DB_PING_IDLE_SECONDS. Set the timeouts to 0 behind PgBouncer in
+    # transaction mode, which rejects startup options.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', '1'))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '0'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+    DB_PING_IDLE_SECONDS = float(os.environ.get('DB_PING_IDLE_SECONDS', '60'))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.environ.get('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', '60000'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Optional read replicas (comma-separated URLs). Views marked with
+    # @replica_reads read from a healthy replica; writes, and a client's
+    # requests for REPLICA_PIN_SECONDS after it writes, use the primary
+    DATABASE_REPLICA_URLS = os.environ.get('DATABASE_REPLICA_URLS', '')
+    REPLICA_HEALTH_INTERVAL = float(os.environ.get('REPLICA_HEALTH_INTERVAL', '10'))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '30'))
+    REPLICA_PIN_SECONDS = float(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+    
+    # Workers only check the stored schema version at boot. Migrations run
+    # from `flask --app main schema upgrade`; set SCHEMA_AUTO_UPGRADE=1 to
+    # apply them on startup instead (single-process development only).
+    SCHEMA_AUTO_UPGRADE = os.environ.get('SCHEMA_AUTO_UPGRADE') == '1'
+    
+    # Load routes and compile templates in the gunicorn master before fork
+    # (see gunicorn.conf.py)
+    PRELOAD_APP = os.environ.get('PRELOAD_APP') == '1'
+    
+    # Compiled template bytecode, shared by all workers on the host. Relative
+    # paths are resolved against the instance folder; set to '' to disable.
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', 'jinja_cache')
+    
+    # Logging goes through a queue drained by a background thread.
+    # LOG_LEVELS overrides single loggers, e.g. "app.routes.admin=DEBUG,werkzeug=WARNING";
+    # LOG_DEBUG_SAMPLE_RATE keeps only that fraction of DEBUG records.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json or text
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+    
+    # Activity log retention: `flask activity prune` rolls events older than
+    # this into daily aggregates and (optionally) the archive table
+    ACTIVITY_RETENTION_DAYS = int(os.environ.get('ACTIVITY_RETENTION_DAYS', '180'))
+    ACTIVITY_ARCHIVE = os.environ.get('ACTIVITY_ARCHIVE', '1') == '1'
+
+    # Dashboard analytics: the scheduled `flask analytics rollup` recomputes
+    # recent days; the dashboard warns once the rollups are older than
+    # ANALYTICS_REFRESH_SECONDS
+    ANALYTICS_REFRESH_SECONDS = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', '300'))
+    ANALYTICS_LOOKBACK_DAYS = int(os.environ.get('ANALYTICS_LOOKBACK_DAYS', '1'))
+
+    # Shared cache: 'memory' (per worker), 'filesystem' (shared by workers on
+    # one host, CACHE_DIR defaults to instance/cache) or 'redis' (any
+    # Redis-protocol server at CACHE_REDIS_URL)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DIR = os.environ.get('CACHE_DIR')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'lms:')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', '300'))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))
+
+    # Batched learner events (POST /api/events): events per request, and how
+    # long idempotency receipts are kept so client retries are not re-applied
+    EVENT_BATCH_MAX = int(os.environ.get('EVENT_BATCH_MAX', '100'))
+    EVENT_RECEIPT_HOURS = int(os.environ.get('EVENT_RECEIPT_HOURS', '48'))
+
+    # JSON API (/api/v1) page sizes: default and the most ?limit= may ask for
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '50'))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '200'))
+
+    # Prometheus metrics at METRICS_PATH. Under gunicorn, METRICS_DIR is a
+    # directory shared by the workers (cleared by the master on start) that
+    # each worker writes its snapshot to every METRICS_FLUSH_SECONDS.
+    # Scrapes need METRICS_TOKEN as a Bearer token, or must come straight
+    # from an address in METRICS_ALLOWED_NETWORKS (comma-separated CIDRs,
+    # matched against the connection, not X-Forwarded-For). With neither
+    # set the endpoint only answers in debug mode.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_NETWORKS = os.environ.get('METRICS_ALLOWED_NETWORKS', '')
+
+    # Slow-request profiles: requests running longer than PROFILE_THRESHOLD_MS
+    # (0 disables) have their stack sampled every PROFILE_INTERVAL_MS, and
+    # requests with a signed X-Profile header run under cProfile. The newest
+    # PROFILE_KEEP profiles are kept in PROFILE_DIR (relative to instance/).
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', '1') == '1'
+    PROFILE_THRESHOLD_MS = float(os.environ.get('PROFILE_THRESHOLD_MS', '1000'))
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '10'))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+    PROFILE_TOKEN_MAX_AGE = int(os.environ.get('PROFILE_TOKEN_MAX_AGE', '3600'))
+
+    # Admission control for expensive endpoints (see app/admission.py).
+    # ADMISSION_LIMITS maps an endpoint to its rules: 'methods' gated (all
+    # when omitted), 'per_ip' / 'per_user' as (requests, seconds), and
+    # 'concurrency' with a 'queue' of requests allowed to wait up to
+    # ADMISSION_MAX_WAIT seconds for a slot. Gated endpoints together hold
+    # at most ADMISSION_EXPENSIVE_SLOTS requests (0: half the threads of
+    # one worker with the memory cache backend, else of all WEB_CONCURRENCY
+    # workers; set it explicitly when several hosts share Redis). Slots of
+    # crashed workers expire within two ADMISSION_LEASE_SECONDS periods.
+    # Per-IP limits key on request.remote_addr, which is the connecting
+    # peer unless PROXY_FIX_X_FOR trusts that many X-Forwarded-For hops.
+    # Set it to the number of proxies in front of the app (1 behind a single
+    # load balancer); clients can forge the header past the trusted hops.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+    ADMISSION_MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', '2'))
+    ADMISSION_EXPENSIVE_SLOTS = int(os.environ.get('ADMISSION_EXPENSIVE_SLOTS', '0'))
+    ADMISSION_LEASE_SECONDS = int(os.environ.get('ADMISSION_LEASE_SECONDS', '120'))
+    ADMISSION_LIMITS = {
+        'auth.login': {'methods': ('POST',), 'per_ip': (20, 60), 'per_user': (10, 300),
+                       'concurrency': 4, 'queue': 8},
+        'auth.register': {'methods': ('POST',), 'per_ip': (10, 600), 'concurrency': 4, 'queue': 8},
+        'auth.setup_2fa': {'per_user': (20, 60), 'concurrency': 4, 'queue': 8},
+        'auth.two_factor_auth': {'methods': ('POST',), 'per_ip': (30, 60), 'per_user': (10, 300)},
+        'documents.document_analysis': {'methods': ('POST',), 'per_user': (10, 600),
+                                        'concurrency': 2, 'queue': 4},
+        'admin.admin_bulk_interest_requests': {'concurrency': 1, 'queue': 2},
+        'admin.admin_export': {'concurrency': 2, 'queue': 2},
+    }
+
+    # Rows per page in the admin user directory
+    ADMIN_USERS_PAGE_SIZE = int(os.environ.get('ADMIN_USERS_PAGE_SIZE', '50'))
     
     # Application settings
     APP_NAME = "Erlang Systems LMS"
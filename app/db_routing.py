@@ -0,0 +1,135 @@
+import time
+import random
+import logging
+import threading
+from flask import g, request, current_app, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica'
+
+
+def replica_reads(view):
+    """Mark a view whose queries may be served by a read replica.
+
+    Writes in the same request still go to the primary, and every query
+    after the first write stays there.
+    """
+    view.replica_reads = True
+    return view
+
+
+class RoutingSession(Session):
+    """Session that sends reads in replica_reads views to a healthy replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or not _is_read(clause):
+                # Read-after-write: everything after a write uses the primary
+                self.info['primary_pinned'] = True
+            elif _replica_allowed(self):
+                engine = replica_set.choose()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_read(clause):
+    """True only for SELECTs; DML, DDL, raw connections and other text() go to the primary"""
+    if isinstance(clause, TextClause):
+        words = clause.text.lstrip().split(None, 1)
+        return bool(words) and words[0].upper() == 'SELECT'
+    return getattr(clause, 'is_select', False)
+
+
+def _replica_allowed(session):
+    return (has_request_context() and g.get('replica_reads', False)
+            and not session.info.get('primary_pinned'))
+
+
+class ReplicaSet:
+    """Replica engines with a cached health check per engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health = {}
+        self.keys = ()
+
+    def configure(self, app):
+        """Register each DATABASE_REPLICA_URLS entry as a Flask-SQLAlchemy bind; call before db.init_app"""
+        urls = [url.strip() for url in app.config.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        self.keys = tuple(f'{REPLICA_BIND_PREFIX}{index}' for index in range(len(urls)))
+        binds.update(zip(self.keys, urls))
+        app.config['SQLALCHEMY_BINDS'] = binds
+        if self.keys:
+            logger.info("Routing read-only views across %d replica(s)", len(self.keys))
+
+    def init_app(self, app):
+        app.extensions['replica_set'] = self
+        if self.keys:
+            app.before_request(_mark_replica_reads)
+            app.after_request(_remember_write)
+
+    def choose(self):
+        """Return the request's replica engine, or None to use the primary.
+
+        A random healthy replica is picked on the first read and kept for
+        the rest of the request (as is falling back to the primary), so its
+        reads all see the same replication lag.
+        """
+        from . import db
+        if 'replica_key' not in g:
+            healthy = [key for key in self.keys if self._is_healthy(key, db.engines[key])]
+            g.replica_key = random.choice(healthy) if healthy else None
+        return db.engines[g.replica_key] if g.replica_key else None
+
+    def _is_healthy(self, key, engine):
+        interval = current_app.config['REPLICA_HEALTH_INTERVAL']
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(key, (False, None))
+        if checked_at is not None and now - checked_at < interval:
+            return healthy
+        with self._lock:
+            healthy = self._probe(key, engine)
+            self._health[key] = (healthy, now)
+        return healthy
+
+    def _probe(self, key, engine):
+        max_lag = current_app.config['REPLICA_MAX_LAG_SECONDS']
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'postgresql':
+                    lag = connection.execute(text(
+                        "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    )).scalar()
+                    if max_lag and lag > max_lag:
+                        logger.warning("Replica %s is %.1fs behind; using the primary", key, lag)
+                        return False
+                else:
+                    connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.warning("Replica %s failed its health check: %s", key, e)
+            return False
+        return True
+
+
+def _mark_replica_reads():
+    view = current_app.view_functions.get(request.endpoint)
+    # Requests shortly after this client wrote stay on the primary until
+    # replicas have had time to catch up
+    g.replica_reads = (getattr(view, 'replica_reads', False)
+                       and flask_session.get('primary_until', 0) < time.time())
+
+
+def _remember_write(response):
+    from . import db
+    if db.session().info.get('primary_pinned'):
+        flask_session['primary_until'] = time.time() + current_app.config['REPLICA_PIN_SECONDS']
+    return response
+
+
+replica_set = ReplicaSet()
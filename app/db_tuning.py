@@ -0,0 +1,146 @@
+"""Per-backend engine options and connection setup.
+
+SQLite files get WAL journaling, relaxed fsyncs, a memory map, a larger
+page cache and a busy timeout on every new connection, so readers never
+block the writer and concurrent writers wait instead of failing with
+"database is locked". PostgreSQL pools are sized from the gunicorn worker
+and thread counts, reuse the most recent connection first, carry server
+side statement timeouts, and only ping connections that sat idle long
+enough to have been dropped, instead of pinging on every checkout.
+"""
+import os
+import time
+import logging
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+def backend(url):
+    return make_url(url).get_backend_name()
+
+
+def _sqlite_options(url, config):
+    # A local file: nothing to ping or recycle; PRAGMAs are set on connect
+    return {}
+
+
+def _postgresql_options(url, config):
+    threads = config['GUNICORN_THREADS']
+    pool_size = config['DB_POOL_SIZE'] or threads + 1
+    max_overflow = config['DB_MAX_OVERFLOW']
+    if max_overflow is None:
+        budget = config['DB_MAX_CONNECTIONS']
+        # Each worker process has its own pool: split the server's budget
+        max_overflow = max(budget // config['WEB_CONCURRENCY'] - pool_size, 0) if budget else threads
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_use_lifo': True,
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if make_url(url).get_driver_name() not in ('psycopg2', 'psycopg'):
+        return options
+
+    server_options = []
+    # `flask` maintenance commands (schema upgrade, rollups, reconcile) may
+    # legitimately run long statements, so the timeout covers serving only
+    if config['DB_STATEMENT_TIMEOUT_MS'] and os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        server_options.append(f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}")
+    if config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS']:
+        server_options.append(
+            f"-c idle_in_transaction_session_timeout={config['DB_IDLE_IN_TRANSACTION_TIMEOUT_MS']}")
+    connect_args = {'keepalives': 1, 'keepalives_idle': 30, 'keepalives_interval': 10, 'keepalives_count': 3}
+    if server_options:
+        connect_args['options'] = ' '.join(server_options)
+    options['connect_args'] = connect_args
+    return options
+
+
+def _default_options(url, config):
+    return {'pool_recycle': config['DB_POOL_RECYCLE'], 'pool_pre_ping': True}
+
+
+PROFILES = {
+    'sqlite': _sqlite_options,
+    'postgresql': _postgresql_options,
+}
+
+
+def engine_options(url, config):
+    """Engine options for a database URL; SQLALCHEMY_ENGINE_OPTIONS entries win"""
+    options = PROFILES.get(backend(url), _default_options)(url, config)
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def configure(app):
+    """Set per-backend options for the primary and every bind; call before db.init_app"""
+    config = app.config
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'], config)
+    binds = {}
+    for key, value in (config.get('SQLALCHEMY_BINDS') or {}).items():
+        bind = dict(value) if isinstance(value, dict) else {'url': value}
+        binds[key] = {**engine_options(bind['url'], config), **bind}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def _listen_sqlite(engine, config):
+    pragmas = [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+    if engine.url.database not in (None, '', ':memory:'):
+        pragmas.insert(0, f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _listen_postgresql(engine, config):
+    idle_limit = config['DB_PING_IDLE_SECONDS']
+
+    @event.listens_for(engine, 'checkin')
+    def remember_checkin(dbapi_connection, connection_record):
+        connection_record.info['checked_in_at'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        # Connections used moments ago are assumed alive; only ones idle long
+        # enough for a firewall or failover to have dropped them are pinged
+        checked_in_at = connection_record.info.get('checked_in_at')
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_limit:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        except Exception as e:
+            # The pool discards this connection and checks out a fresh one
+            raise exc.DisconnectionError(f'Idle connection failed its ping: {e}') from e
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def init_app(app):
+    """Attach connection setup to each engine; call after db.init_app"""
+    from . import db
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        name = engine.dialect.name
+        if name == 'sqlite':
+            _listen_sqlite(engine, app.config)
+        elif name == 'postgresql':
+            _listen_postgresql(engine, app.config)
+        logger.debug("Engine %s (%s): pool %s", key or 'default', name, engine.pool.status())
@@ -20,8 +20,7 @@ try:
 except LookupError:
     nltk.download('punkt', download_dir=nltk_data_path)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application (see app/logging_config.py)
 logger = logging.getLogger(__name__)
 
 # Download required NLTK data
@@ -29,10 +28,6 @@ nltk.download('punkt')
 nltk.download('stopwords')
 nltk.download('averaged_perceptron_tagger')
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 
 def extract_text_from_pdf(file_stream):
     """Extract text from a PDF file"""
@@ -43,7 +38,7 @@ def extract_text_from_pdf(file_stream):
             text += page.extract_text() + "\n"
         return text
     except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
+        logger.error("Error extracting text from PDF: %s", e)
         return None
 
 
@@ -56,7 +51,7 @@ def extract_text_from_docx(file_stream):
             text += para.text + "\n"
         return text
     except Exception as e:
-        logger.error(f"Error extracting text from DOCX: {str(e)}")
+        logger.error("Error extracting text from DOCX: %s", e)
         return None
 
 
@@ -66,7 +61,7 @@ def extract_text_from_txt(file_stream):
         text = file_stream.read().decode('utf-8')
         return text
     except Exception as e:
-        logger.error(f"Error extracting text from text file: {str(e)}")
+        logger.error("Error extracting text from text file: %s", e)
         return None
 
 
@@ -81,7 +76,7 @@ def extract_text(file_stream, filename):
     elif file_ext == '.txt':
         return extract_text_from_txt(file_stream)
     else:
-        logger.error(f"Unsupported file format: {file_ext}")
+        logger.error("Unsupported file format: %s", file_ext)
         return None
 
 
@@ -109,7 +104,7 @@ def get_important_sentences(text, num_sentences=5):
                                      reverse=True)[:num_sentences]
         return [sentence for sentence, score in important_sentences]
     except Exception as e:
-        logger.error(f"Error getting important sentences: {str(e)}")
+        logger.error("Error getting important sentences: %s", e)
         return []
 
 
@@ -130,7 +125,7 @@ def generate_summary(text, max_length=500):
 
         return summary
     except Exception as e:
-        logger.error(f"Error generating summary: {str(e)}")
+        logger.error("Error generating summary: %s", e)
         return "Error generating summary."
 
 
@@ -162,7 +157,7 @@ def generate_questions(text):
                     break
 
             except Exception as e:
-                logger.error(f"Error processing sentence: {str(e)}")
+                logger.error("Error processing sentence: %s", e)
                 continue
 
         if not questions:
@@ -173,14 +168,14 @@ def generate_questions(text):
 
         return questions
     except Exception as e:
-        logger.error(f"Error generating questions: {str(e)}")
+        logger.error("Error generating questions: %s", e)
         return [{"question": "Error generating questions", "answer": str(e)}]
 
 
 def analyze_document(file_stream, filename):
     """Main function to analyze a document"""
     try:
-        logger.info(f"Starting analysis of document: {filename}")
+        logger.info("Starting analysis of document: %s", filename)
 
         # Extract text from the document
         text = extract_text(file_stream, filename)
@@ -207,7 +202,7 @@ def analyze_document(file_stream, filename):
         return {"success": True, "summary": summary, "questions": questions}
 
     except Exception as e:
-        logger.error(f"Error in document analysis: {str(e)}")
+        logger.error("Error in document analysis: %s", e)
         return {
             "success": False,
             "message": f"An error occurred during document analysis: {str(e)}"
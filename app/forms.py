@@ -1,3 +1,4 @@
+from flask import current_app
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField, SelectMultipleField, HiddenField, IntegerField, widgets
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, Regexp
@@ -40,8 +41,7 @@ class RegistrationForm(FlaskForm):
         # Check if email domain is allowed
         if email.data:
             domain = email.data.split('@')[-1].lower()
-            allowed_domains = ['bt.com', 'thbs.com']
-            if domain not in allowed_domains:
+            if domain not in current_app.config['DOMAIN_ACCESS']:
                 raise ValidationError('Registration is only allowed for BT and THBS employees. Please use your company email address.')
             
 class TwoFactorForm(FlaskForm):
@@ -78,6 +78,7 @@ class CourseForm(FlaskForm):
     description = TextAreaField('Description', validators=[DataRequired()])
     cover_image_url = StringField('Cover Image URL', validators=[Length(max=500)])
     interests = MultiCheckboxField('Interests', coerce=int)
+    allowed_domains = StringField('Restrict to Email Domains', validators=[Length(max=500)])
     submit = SubmitField('Save Course')
 
 class LessonForm(FlaskForm):
@@ -0,0 +1,130 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes present on every LogRecord; anything else came from `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({})).keys()) | {'message', 'asctime', 'taskName'}
+
+_queue_handler = None
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as one JSON object per line, including `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Enqueue records unformatted; the listener's handlers format them.
+
+    The stock prepare() merges args into the message and renders the
+    traceback on the logging thread. Records here never leave the
+    process, so a shallow copy is enough. Arguments are still only
+    rendered when the listener gets to them, so log values rather than
+    objects a request goes on to mutate.
+    """
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+
+class DebugSampler(logging.Filter):
+    """Pass only a fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def _parse_levels(spec):
+    """Parse 'app.routes.admin=DEBUG,werkzeug=WARNING' into a dict"""
+    if isinstance(spec, dict):
+        return spec
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener(handlers):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_in_child():
+    # The writer thread does not survive fork (gunicorn preload), so each
+    # worker starts its own listener on a fresh queue
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(config):
+    """Route all logging through a queue drained by a background writer thread.
+
+    Request threads only copy and enqueue records (see DeferredQueueHandler);
+    message formatting, tracebacks and stream I/O happen on the listener
+    thread. Levels come from LOG_LEVEL and per-logger LOG_LEVELS,
+    and DEBUG records are sampled at LOG_DEBUG_SAMPLE_RATE.
+    """
+    global _queue_handler
+    root = logging.getLogger()
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    for name, level in _parse_levels(config.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _queue_handler is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if config.get('LOG_FORMAT', 'json') == 'json':
+        stream_handler.setFormatter(StructuredFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    _queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(DebugSampler(float(config.get('LOG_DEBUG_SAMPLE_RATE', 1.0))))
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _start_listener([stream_handler])
+    atexit.register(stop_logging)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
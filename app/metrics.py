@@ -0,0 +1,437 @@
+"""Prometheus text-format metrics without external dependencies.
+
+Recording goes to per-thread shards, so the request path never takes a
+lock once a thread has recorded its first sample; ``collect()`` sums the
+shards. Under gunicorn, set METRICS_DIR to a directory shared by the
+workers: each process periodically writes its snapshot there and
+``/metrics`` merges every snapshot, so any worker can answer a scrape.
+"""
+import os
+import hmac
+import json
+import time
+import ipaddress
+import logging
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from flask import request, g, current_app, abort, Response
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+_DEAD_FILE = '_dead.json'
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_registry = {}
+
+
+def _shard():
+    """This thread's storage: {metric name: {label values: value}}"""
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+        return shard
+
+
+def _reset_after_fork():
+    # Samples recorded in the parent belong to the parent
+    global _local
+    _local = threading.local()
+    _shards.clear()
+    _flusher['pid'] = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collector = None
+        _registry[name] = self
+
+    def _series(self):
+        shard = _shard()
+        series = shard.get(self.name)
+        if series is None:
+            series = shard[self.name] = {}
+        return series
+
+    def collect_with(self, function):
+        """Read values at collection time from ``function() -> [(label values, value)]``"""
+        self._collector = function
+        return function
+
+    def _merge(self, total, value):
+        return total + value
+
+    def collect(self):
+        merged = {}
+        with _shards_lock:
+            shards = list(_shards)
+        for shard in shards:
+            for labels, value in list(shard.get(self.name, {}).items()):
+                merged[labels] = self._merge(merged[labels], value) if labels in merged else self._copy(value)
+        if self._collector is not None:
+            for labels, value in self._collector():
+                merged[tuple(str(v) for v in labels)] = value
+        return merged
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        series = self._series()
+        series[labels] = series.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        series = self._series()
+        series[labels] = series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Bucket counts (non-cumulative, +Inf last) followed by the sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+
+    def observe(self, value, *labels):
+        series = self._series()
+        counts = series.get(labels)
+        if counts is None:
+            counts = series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def _copy(self, value):
+        return list(value)
+
+
+REQUEST_LATENCY = Histogram(
+    'lms_http_request_duration_seconds', 'HTTP request latency by endpoint and status',
+    ('endpoint', 'method', 'status'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge('lms_http_requests_in_progress', 'Requests being handled')
+DB_QUERY_LATENCY = Histogram(
+    'lms_db_query_duration_seconds', 'Time spent executing SQL statements', ('bind',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_POOL_CHECKOUTS = Counter('lms_db_pool_checkouts_total', 'Connections checked out of the pool', ('bind',))
+DB_POOL_CHECKED_OUT = Gauge('lms_db_pool_checked_out', 'Connections currently checked out', ('bind',))
+DB_POOL_OVERFLOW = Gauge('lms_db_pool_overflow', 'Connections open beyond pool_size', ('bind',))
+DB_POOL_SIZE = Gauge('lms_db_pool_size', 'Configured pool size', ('bind',))
+CACHE_REQUESTS = Counter('lms_cache_requests_total', 'Cache lookups by result', ('cache', 'result'))
+DOCUMENT_ANALYSIS_LATENCY = Histogram(
+    'lms_document_analysis_duration_seconds', 'Document analysis duration', ('outcome',),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+DOCUMENT_ANALYSIS_IN_PROGRESS = Gauge('lms_document_analysis_in_progress', 'Document analyses currently running')
+ADMISSION_REJECTIONS = Counter(
+    'lms_admission_rejections_total', 'Requests turned away by admission control', ('endpoint', 'reason'))
+PROCESS_MEMORY = Gauge('lms_process_resident_memory_bytes', 'Resident memory of each worker', ('pid',))
+
+
+@PROCESS_MEMORY.collect_with
+def _process_memory():
+    try:
+        with open('/proc/self/statm') as statm:
+            resident = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS where /proc is unavailable (kilobytes on Linux)
+        resident = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return [((os.getpid(),), resident)]
+
+
+# ---------------------------------------------------------------- snapshots
+
+def collect():
+    """This process's metrics as {name: {label values: value}}"""
+    return {name: metric.collect() for name, metric in _registry.items()}
+
+
+def _encode(snapshot):
+    return {name: [[list(labels), value] for labels, value in series.items()] for name, series in snapshot.items()}
+
+
+def _decode(data):
+    return {name: {tuple(labels): value for labels, value in series} for name, series in data.items()}
+
+
+def _merge_into(total, snapshot):
+    for name, series in snapshot.items():
+        metric = _registry.get(name)
+        if metric is None:
+            continue
+        target = total.setdefault(name, {})
+        for labels, value in series.items():
+            target[labels] = metric._merge(target[labels], value) if labels in target else metric._copy(value)
+
+
+def _read(path):
+    try:
+        with open(path) as handle:
+            return _decode(json.load(handle))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(path, snapshot):
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as handle:
+        json.dump(_encode(snapshot), handle, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def write_snapshot(directory):
+    """Write this process's snapshot to ``<directory>/<pid>.json``"""
+    _write(os.path.join(directory, f'{os.getpid()}.json'), collect())
+
+
+def collect_directory(directory):
+    """Merge every process snapshot in the directory, this process's live values included"""
+    write_snapshot(directory)
+    total = {}
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            _merge_into(total, _read(os.path.join(directory, name)))
+    return total
+
+
+def mark_process_dead(pid, directory):
+    """Fold a finished worker's counters and histograms into the shared dead-process file.
+
+    Gauges describe live processes only, so they are dropped. Call from
+    the gunicorn master's ``child_exit`` hook.
+    """
+    path = os.path.join(directory, f'{pid}.json')
+    snapshot = _read(path)
+    if not snapshot:
+        return
+    kept = {name: series for name, series in snapshot.items()
+            if name in _registry and _registry[name].kind != 'gauge'}
+    dead_path = os.path.join(directory, _DEAD_FILE)
+    total = _read(dead_path)
+    _merge_into(total, kept)
+    _write(dead_path, total)
+    os.remove(path)
+
+
+def clear_directory(directory):
+    """Remove snapshots left by a previous server run"""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+
+# ---------------------------------------------------------------- exposition
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition format for a snapshot"""
+    lines = []
+    for name, metric in _registry.items():
+        series = snapshot.get(name, {})
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, value in sorted(series.items()):
+            if metric.kind != 'histogram':
+                lines.append(f'{name}{_labels(metric.labelnames, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, float('inf')), value[:-1]):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                lines.append(f'{name}_bucket{_labels(metric.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(metric.labelnames, labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(metric.labelnames, labels)} {cumulative}')
+        if name == REQUEST_LATENCY.name:
+            # Request counts come from the histogram; nothing extra is recorded per request
+            lines.append('# HELP lms_http_requests_total HTTP requests by endpoint and status')
+            lines.append('# TYPE lms_http_requests_total counter')
+            for labels, value in sorted(series.items()):
+                total = sum(value[:-1])
+                lines.append(f'lms_http_requests_total{_labels(metric.labelnames, labels)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+# ---------------------------------------------------------------- Flask wiring
+
+_flusher = {'pid': None}
+
+
+def _start_flusher(directory, interval):
+    """Write this worker's snapshot every ``interval`` seconds from a daemon thread"""
+    _flusher['pid'] = os.getpid()
+
+    def run():
+        while _flusher['pid'] == os.getpid():
+            time.sleep(interval)
+            try:
+                write_snapshot(directory)
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+    REQUESTS_IN_PROGRESS.inc()
+    directory = current_app.config.get('METRICS_DIR')
+    if directory and _flusher['pid'] != os.getpid():
+        _start_flusher(directory, current_app.config['METRICS_FLUSH_SECONDS'])
+
+
+def _finish_request(status):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return
+    REQUESTS_IN_PROGRESS.dec()
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request.method, status)
+
+
+def _after_request(response):
+    _finish_request(str(response.status_code))
+    return response
+
+
+def _teardown_request(exc):
+    # Reached with the timer still set only when the view raised
+    if exc is not None:
+        _finish_request('500')
+
+
+@lru_cache(maxsize=8)
+def _networks(spec):
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(',') if item.strip())
+
+
+def _peer_address():
+    # The address of the connection itself, not one claimed in X-Forwarded-For
+    original = request.environ.get('werkzeug.proxy_fix.orig') or {}
+    return original.get('REMOTE_ADDR') or request.remote_addr
+
+
+def _scrape_allowed():
+    """A bearer METRICS_TOKEN or a peer in METRICS_ALLOWED_NETWORKS; else debug/testing only"""
+    config = current_app.config
+    token = config.get('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    networks = config.get('METRICS_ALLOWED_NETWORKS')
+    if networks:
+        try:
+            peer = ipaddress.ip_address(_peer_address())
+        except ValueError:
+            return False
+        return any(peer in network for network in _networks(networks))
+    if token:
+        return False
+    return current_app.debug or current_app.testing
+
+
+def metrics_view():
+    if not _scrape_allowed():
+        # Unconfigured deployments do not advertise the endpoint at all
+        abort(401 if current_app.config.get('METRICS_TOKEN') else 404)
+    directory = current_app.config.get('METRICS_DIR')
+    snapshot = collect_directory(directory) if directory else collect()
+    return Response(render(snapshot), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def _instrument_engine(bind, engine):
+    from sqlalchemy import event
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_started'].pop()
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, bind)
+
+    def handle_error(context):
+        stack = context.connection.info.get('metrics_started') if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(bind)
+
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    event.listen(engine, 'after_cursor_execute', after_execute)
+    event.listen(engine, 'handle_error', handle_error)
+    event.listen(engine.pool, 'checkout', checkout)
+
+
+def init_app(app):
+    """Time requests and SQL, and serve the metrics at METRICS_PATH"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    from . import db
+    engines = {(key or 'default'): engine for key, engine in db.engines.items()}
+    for bind, engine in engines.items():
+        _instrument_engine(bind, engine)
+
+    def pool_stats(read):
+        return lambda: [((bind,), read(engine.pool)) for bind, engine in engines.items()
+                        if hasattr(engine.pool, 'checkedout')]
+
+    DB_POOL_CHECKED_OUT.collect_with(pool_stats(lambda pool: pool.checkedout()))
+    DB_POOL_OVERFLOW.collect_with(pool_stats(lambda pool: max(pool.overflow(), 0)))
+    DB_POOL_SIZE.collect_with(pool_stats(lambda pool: pool.size()))
+
+    # First in line, so the timer covers the other request hooks
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics_view)
+    _networks(app.config.get('METRICS_ALLOWED_NETWORKS') or '')  # fail at startup on a bad network
+    if not (app.config.get('METRICS_TOKEN') or app.config.get('METRICS_ALLOWED_NETWORKS')):
+        logger.warning("Neither METRICS_TOKEN nor METRICS_ALLOWED_NETWORKS is set: %s answers 404 "
+                       "outside debug mode", app.config.get('METRICS_PATH', '/metrics'))
+    app.extensions['metrics'] = _registry
@@ -1,6 +1,7 @@
 
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy.orm import load_only, undefer
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db, login_manager
 
@@ -19,24 +20,27 @@ class User(UserMixin, db.Model):
     otp_secret = db.Column(db.String(32))
     is_2fa_enabled = db.Column(db.Boolean, default=False)
     access_level = db.Column(db.String(20), default='basic')  # basic, text_only, full_access
-    email_domain = db.Column(db.String(50))  # Store email domain for quick access
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    email_domain = db.Column(db.String(50), index=True)  # Store email domain for quick access
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     interests = db.relationship('Interest', 
                               secondary='user_interest',
                               primaryjoin="User.id==UserInterest.user_id",
                               secondaryjoin="Interest.id==UserInterest.interest_id",
-                              backref='users')
+                              backref=db.backref('users', passive_deletes=True),
+                              passive_deletes=True)
     courses = db.relationship('Course', 
                               secondary='user_course',
                               primaryjoin="User.id==UserCourse.user_id",
                               secondaryjoin="Course.id==UserCourse.course_id",
-                              backref='enrolled_users')
+                              backref=db.backref('enrolled_users', passive_deletes=True),
+                              passive_deletes=True)
     lesson_progress = db.relationship('UserLessonProgress',
                                    backref='user',
                                    lazy='dynamic',
-                                   cascade='all, delete-orphan')
+                                   cascade='all, delete-orphan',
+                                   passive_deletes=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -95,14 +99,12 @@ class User(UserMixin, db.Model):
                 Lesson.course_id.in_(course_ids)
             ).count()
         
-        completed_lessons = self.lesson_progress.filter(
-            UserLessonProgress.status == 'completed'
-        ).count()
-        
-        in_progress_lessons = self.lesson_progress.filter(
-            UserLessonProgress.status == 'in_progress'
-        ).count()
-        
+        # Summed from the per-course counters rather than recounting lessons
+        completed_lessons, in_progress_lessons = db.session.query(
+            db.func.coalesce(db.func.sum(UserCourseProgress.completed_lessons), 0),
+            db.func.coalesce(db.func.sum(UserCourseProgress.in_progress_lessons), 0)
+        ).filter(UserCourseProgress.user_id == self.id).one()
+
         return {
             'total_lessons': total_lessons,
             'completed_lessons': completed_lessons,
@@ -116,7 +118,7 @@ class User(UserMixin, db.Model):
     
     def get_bookmarked_lessons(self):
         """Get user's bookmarked lessons"""
-        return db.session.query(Lesson).join(UserBookmark).filter(
+        return Lesson.summary_query().join(UserBookmark).filter(
             UserBookmark.user_id == self.id
         ).all()
     
@@ -141,14 +143,15 @@ class Interest(db.Model):
     
     def __repr__(self):
         return f'<Interest {self.name}>'
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
     
     # Relationships
     courses = db.relationship('Course', 
                            secondary='course_interest',
                            primaryjoin="Interest.id==CourseInterest.interest_id",
                            secondaryjoin="Course.id==CourseInterest.course_id",
-                           backref='interests')
+                           backref=db.backref('interests', passive_deletes=True),
+                           passive_deletes=True)
     
     def __repr__(self):
         return f'<Interest {self.name}>'
@@ -156,65 +159,96 @@ class Interest(db.Model):
 
 class UserInterest(db.Model):
     __tablename__ = 'user_interest'
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
-    interest_id = db.Column(db.Integer, db.ForeignKey('interests.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    interest_id = db.Column(db.Integer, db.ForeignKey('interests.id', ondelete='CASCADE'), primary_key=True)
     access_granted = db.Column(db.Boolean, default=False)
     granted_at = db.Column(db.DateTime)
-    granted_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    granted_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
 
 
 class Course(db.Model):
     __tablename__ = 'courses'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
+    description = db.deferred(db.Column(db.Text))
     cover_image_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
     
-    # Relationships
-    lessons = db.relationship('Lesson', backref='course', lazy='dynamic', cascade='all, delete-orphan')
-    forum_topics = db.relationship('ForumTopic', backref='course', lazy='dynamic')
-    
-    def is_thbs_restricted(self):
-        """Check if this course is restricted to THBS domain users only"""
-        # Check if the course title contains "erlang-l3" (case-insensitive)
-        return 'erlang-l3' in self.title.lower()
-    
-    def user_can_access_course(self, user):
-        """Check if a user can access this course based on domain restrictions"""
-        if not user.is_authenticated or not user.is_approved:
-            return False
-            
-        # Admins can access everything
-        if user.is_admin:
-            return True
-            
-        # Check if this is a THBS-restricted course
-        if self.is_thbs_restricted():
-            # Only THBS domain users can access erlang-l3 courses
-            return user.email_domain == 'thbs.com'
-            
-        # For non-restricted courses, check regular interest-based access
-        return True  # Will be checked by existing interest-based logic
+    # Relationships; child rows are removed by ON DELETE CASCADE in the database
+    lessons = db.relationship('Lesson', backref='course', lazy='dynamic', cascade='all, delete-orphan',
+                              passive_deletes=True)
+    forum_topics = db.relationship('ForumTopic', backref='course', lazy='dynamic', passive_deletes=True)
     
+    @classmethod
+    def detail_query(cls):
+        """Course rows with the description, for cards, detail and edit pages"""
+        return cls.query.options(undefer(cls.description))
+
+    def _summary(self):
+        from .utils.catalog_cache import catalog_cache
+        return catalog_cache.course(self.id)
+
+    def is_restricted(self):
+        """Whether access rules on this course or its interests limit who can open it"""
+        summary = self._summary()
+        return summary is not None and summary.restricted
+
+    def restriction_label(self):
+        """Short badge text for a restricted course, e.g. 'THBS Only'"""
+        summary = self._summary()
+        domains = sorted(summary.allowed_domains) if summary else ()
+        if not domains:
+            return 'Restricted'
+        return '/'.join(domain.split('.')[0].upper() for domain in domains) + ' Only'
+
     def __repr__(self):
         return f'<Course {self.title}>'
 
 
 class CourseInterest(db.Model):
     __tablename__ = 'course_interest'
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
-    interest_id = db.Column(db.Integer, db.ForeignKey('interests.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    interest_id = db.Column(db.Integer, db.ForeignKey('interests.id', ondelete='CASCADE'), primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
+
+
+class CourseAccessRule(db.Model):
+    """Who may open a course: an email domain and/or access level, NULL matching any.
+
+    A rule targets one course or every course under one interest. Courses
+    without applicable rules are open to users granted one of their
+    interests; otherwise the user must also match at least one rule.
+    An interest rule with ``picker_only`` set only hides the interest on
+    the interests page from users it does not match; its courses stay
+    open to anyone granted the interest. Evaluated in SQL by
+    utils/access_rules.py.
+    """
+    __tablename__ = 'course_access_rule'
+    __table_args__ = (
+        db.CheckConstraint('(course_id IS NULL) <> (interest_id IS NULL)', name='ck_course_access_rule_target'),
+        db.Index('ix_course_access_rule_course', 'course_id', 'email_domain', 'access_level'),
+        db.Index('ix_course_access_rule_interest', 'interest_id', 'email_domain', 'access_level'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'))
+    interest_id = db.Column(db.Integer, db.ForeignKey('interests.id', ondelete='CASCADE'))
+    email_domain = db.Column(db.String(120))
+    access_level = db.Column(db.String(20))
+    picker_only = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        target = f'course_id={self.course_id}' if self.course_id else f'interest_id={self.interest_id}'
+        return f'<CourseAccessRule {target} domain={self.email_domain} level={self.access_level}>'
 
 
 class UserCourse(db.Model):
     __tablename__ = 'user_course'
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     completed = db.Column(db.Boolean, default=False)
     
@@ -226,17 +260,47 @@ class Lesson(db.Model):
     __tablename__ = 'lessons'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.deferred(db.Column(db.Text, nullable=False))
+    # Sanitized HTML rendered from content on save (see utils/lesson_render.py)
+    content_html = db.deferred(db.Column(db.Text))
+    content_hash = db.Column(db.String(64))
     content_type = db.Column(db.String(20), default='text')  # text, video, mixed
     video_url = db.Column(db.String(500))  # For video content
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship with user progress
-    user_progress = db.relationship('UserLessonProgress', backref='lesson', lazy='dynamic', cascade='all, delete-orphan')
-    
+    user_progress = db.relationship('UserLessonProgress', backref='lesson', lazy='dynamic',
+                                    cascade='all, delete-orphan', passive_deletes=True)
+    
+    @classmethod
+    def summary_query(cls):
+        """Lesson rows for list views; content stays in the database"""
+        return cls.query.options(load_only(
+            cls.id, cls.title, cls.content_type, cls.course_id,
+            cls.order, cls.created_at, cls.updated_at
+        ))
+
+    @classmethod
+    def detail_query(cls):
+        """Lesson rows for detail pages, with content in the same SELECT"""
+        return cls.query.options(undefer(cls.content))
+
+    @classmethod
+    def display_query(cls):
+        """Lesson rows for the lesson page, with rendered HTML but not the source"""
+        return cls.query.options(undefer(cls.content_html))
+
+    @property
+    def display_html(self):
+        """Stored HTML, rendered on the fly for lessons not yet backfilled"""
+        if self.content_html is not None:
+            return self.content_html
+        from .utils.lesson_render import render_lesson_html
+        return render_lesson_html(self.content)
+
     def can_view_content(self, user):
         """Check if user can view this lesson's content based on their access level"""
         if not user.is_authenticated:
@@ -260,32 +324,70 @@ class Lesson(db.Model):
 
 class UserLessonProgress(db.Model):
     __tablename__ = 'user_lesson_progress'
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='CASCADE'), primary_key=True)
     status = db.Column(db.String(20), default='not_started')  # not_started, in_progress, completed
     started_at = db.Column(db.DateTime)
-    completed_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime, index=True)
     last_interaction = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<UserLessonProgress user_id={self.user_id} lesson_id={self.lesson_id} status={self.status}>'
 
 
+class UserCourseProgress(db.Model):
+    """Per-user lesson counts for a course, kept in step with user_lesson_progress"""
+    __tablename__ = 'user_course_progress'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True,
+                          index=True)
+    completed_lessons = db.Column(db.Integer, nullable=False, default=0)
+    in_progress_lessons = db.Column(db.Integer, nullable=False, default=0)
+    total_lessons = db.Column(db.Integer, nullable=False, default=0)
+    last_activity_at = db.Column(db.DateTime)
+
+    @property
+    def completion_percentage(self):
+        return min(self.completed_lessons / self.total_lessons * 100, 100) if self.total_lessons else 0
+
+    @property
+    def is_complete(self):
+        return self.total_lessons > 0 and self.completed_lessons >= self.total_lessons
+
+    def __repr__(self):
+        return (f'<UserCourseProgress user_id={self.user_id} course_id={self.course_id} '
+                f'{self.completed_lessons}/{self.total_lessons}>')
+
+
 class ForumTopic(db.Model):
     __tablename__ = 'forum_topics'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    content = db.deferred(db.Column(db.Text, nullable=False))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))  # Null means general forum
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'))  # Null means general forum
     pinned = db.Column(db.Boolean, default=False)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('forum_topics', lazy='dynamic'))
-    replies = db.relationship('ForumReply', backref='topic', lazy='dynamic', cascade='all, delete-orphan')
-    
+    user = db.relationship('User', backref=db.backref('forum_topics', lazy='dynamic', passive_deletes=True))
+    replies = db.relationship('ForumReply', backref='topic', lazy='dynamic', cascade='all, delete-orphan',
+                              passive_deletes=True)
+    
+    @classmethod
+    def summary_query(cls):
+        """Topic rows for forum indexes; content stays in the database"""
+        return cls.query.options(load_only(
+            cls.id, cls.title, cls.pinned, cls.user_id, cls.course_id,
+            cls.created_at, cls.updated_at
+        ))
+
+    @classmethod
+    def detail_query(cls):
+        """Topic rows for the topic page, with content in the same SELECT"""
+        return cls.query.options(undefer(cls.content))
+
     def __repr__(self):
         return f'<ForumTopic {self.title}>'
 
@@ -293,15 +395,20 @@ class ForumTopic(db.Model):
 class ForumReply(db.Model):
     __tablename__ = 'forum_replies'
     id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, nullable=False)
+    content = db.deferred(db.Column(db.Text, nullable=False))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    topic_id = db.Column(db.Integer, db.ForeignKey('forum_topics.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('forum_topics.id', ondelete='CASCADE'), nullable=False)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('forum_replies', lazy='dynamic'))
+    user = db.relationship('User', backref=db.backref('forum_replies', lazy='dynamic', passive_deletes=True))
     
+    @classmethod
+    def detail_query(cls):
+        """Reply rows for the topic page, with content in the same SELECT"""
+        return cls.query.options(undefer(cls.content))
+
     def __repr__(self):
         return f'<ForumReply {self.id} by user {self.user_id}>'
 
@@ -309,17 +416,25 @@ class ForumReply(db.Model):
 class UserNote(db.Model):
     """User notes for lessons - interactive learning feature"""
     __tablename__ = 'user_notes'
+    __table_args__ = (
+        db.Index('ix_user_notes_user_lesson', 'user_id', 'lesson_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=False)
-    note_text = db.Column(db.Text, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='CASCADE'), nullable=False)
+    note_text = db.deferred(db.Column(db.Text, nullable=False))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('notes', lazy='dynamic'))
-    lesson = db.relationship('Lesson', backref=db.backref('notes', lazy='dynamic'))
+    user = db.relationship('User', backref=db.backref('notes', lazy='dynamic', passive_deletes=True))
+    lesson = db.relationship('Lesson', backref=db.backref('notes', lazy='dynamic', passive_deletes=True))
     
+    @classmethod
+    def detail_query(cls):
+        """Note rows for pages that display the note text"""
+        return cls.query.options(undefer(cls.note_text))
+
     def __repr__(self):
         return f'<UserNote {self.id} by user {self.user_id}>'
 
@@ -327,34 +442,187 @@ class UserNote(db.Model):
 class UserBookmark(db.Model):
     """User bookmarks for lessons - interactive learning feature"""
     __tablename__ = 'user_bookmarks'
+    __table_args__ = (
+        db.Index('ix_user_bookmarks_user_lesson', 'user_id', 'lesson_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('bookmarks', lazy='dynamic'))
-    lesson = db.relationship('Lesson', backref=db.backref('bookmarks', lazy='dynamic'))
+    user = db.relationship('User', backref=db.backref('bookmarks', lazy='dynamic', passive_deletes=True))
+    lesson = db.relationship('Lesson', backref=db.backref('bookmarks', lazy='dynamic', passive_deletes=True))
     
     def __repr__(self):
         return f'<UserBookmark {self.id} by user {self.user_id}>'
 
 
 class UserActivity(db.Model):
-    """Track user activities for enhanced dashboard"""
+    """Track user activities for enhanced dashboard (append-only; see utils/activity_log.py)"""
     __tablename__ = 'user_activities'
+    __table_args__ = (
+        db.Index('ix_user_activities_user_created', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     activity_type = db.Column(db.String(50), nullable=False)  # lesson_started, lesson_completed, note_added, etc.
-    activity_data = db.Column(db.Text)  # JSON data for the activity
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'))
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    activity_data = db.Column(db.JSON)  # Event payload, e.g. {"lesson_title": ...}
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='SET NULL'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('activities', lazy='dynamic'))
-    lesson = db.relationship('Lesson', backref=db.backref('activities', lazy='dynamic'))
-    course = db.relationship('Course', backref=db.backref('activities', lazy='dynamic'))
-    
+    user = db.relationship('User', backref=db.backref('activities', lazy='dynamic', passive_deletes=True))
+    lesson = db.relationship('Lesson', backref=db.backref('activities', lazy='dynamic', passive_deletes=True))
+    course = db.relationship('Course', backref=db.backref('activities', lazy='dynamic', passive_deletes=True))
+    
+    @property
+    def payload(self):
+        """Event payload as a dict (empty for events recorded without one)"""
+        return self.activity_data if isinstance(self.activity_data, dict) else {}
+
+    @property
+    def lesson_title(self):
+        """Lesson title captured with the event, falling back to the lesson row"""
+        return self.payload.get('lesson_title') or (self.lesson.title if self.lesson else None)
+
+    @property
+    def course_title(self):
+        """Course title captured with the event, falling back to the course row"""
+        return self.payload.get('course_title') or (self.course.title if self.course else None)
+
     def __repr__(self):
         return f'<UserActivity {self.activity_type} by user {self.user_id}>'
+
+
+class ClientEventReceipt(db.Model):
+    """Result of a batched learner event, kept so a retried event is not applied twice"""
+    __tablename__ = 'client_event_receipts'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    idempotency_key = db.Column(db.String(64), primary_key=True)
+    result = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ClientEventReceipt user_id={self.user_id} key={self.idempotency_key}>'
+
+
+class UserActivityArchive(db.Model):
+    """Raw activity events moved out of user_activities by the retention job"""
+    __tablename__ = 'user_activities_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    activity_type = db.Column(db.String(50), nullable=False)
+    activity_data = db.Column(db.JSON)
+    lesson_id = db.Column(db.Integer)
+    course_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserActivityArchive {self.activity_type} by user {self.user_id}>'
+
+
+class ActivityDailyUser(db.Model):
+    """Per-user daily event counts rolled up from pruned activity rows"""
+    __tablename__ = 'activity_daily_user'
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    activity_type = db.Column(db.String(50), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ActivityDailyUser {self.day} user={self.user_id} {self.activity_type}={self.event_count}>'
+
+
+class ActivityDailyCourse(db.Model):
+    """Per-course daily event counts rolled up from pruned activity rows"""
+    __tablename__ = 'activity_daily_course'
+    day = db.Column(db.Date, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    activity_type = db.Column(db.String(50), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ActivityDailyCourse {self.day} course={self.course_id} {self.activity_type}={self.event_count}>'
+
+
+class AnalyticsDailySignup(db.Model):
+    """New registrations per day and email domain"""
+    __tablename__ = 'analytics_daily_signups'
+    day = db.Column(db.Date, primary_key=True)
+    email_domain = db.Column(db.String(50), primary_key=True)
+    signup_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDailySignup {self.day} {self.email_domain}={self.signup_count}>'
+
+
+class AnalyticsDailyCourse(db.Model):
+    """Lesson completions per day and course"""
+    __tablename__ = 'analytics_daily_courses'
+    day = db.Column(db.Date, primary_key=True)
+    course_id = db.Column(db.Integer, primary_key=True)
+    lessons_completed = db.Column(db.Integer, nullable=False, default=0)
+    learner_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDailyCourse {self.day} course={self.course_id} completed={self.lessons_completed}>'
+
+
+class AnalyticsDailyInterest(db.Model):
+    """Lesson completions per day and interest, via course-interest mappings"""
+    __tablename__ = 'analytics_daily_interests'
+    day = db.Column(db.Date, primary_key=True)
+    interest_id = db.Column(db.Integer, primary_key=True)
+    lessons_completed = db.Column(db.Integer, nullable=False, default=0)
+    learner_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDailyInterest {self.day} interest={self.interest_id} completed={self.lessons_completed}>'
+
+
+class AnalyticsDailyDomain(db.Model):
+    """Active learners and activity events per day and email domain"""
+    __tablename__ = 'analytics_daily_domains'
+    day = db.Column(db.Date, primary_key=True)
+    email_domain = db.Column(db.String(50), primary_key=True)
+    active_learners = db.Column(db.Integer, nullable=False, default=0)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AnalyticsDailyDomain {self.day} {self.email_domain} learners={self.active_learners}>'
+
+
+class AnalyticsRollupState(db.Model):
+    """Watermark for each analytics rollup: the last day it was rebuilt through"""
+    __tablename__ = 'analytics_rollup_state'
+    name = db.Column(db.String(50), primary_key=True)
+    last_day = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AnalyticsRollupState {self.name} through {self.last_day}>'
+
+
+class SchemaVersion(db.Model):
+    """Schema version applied by `flask schema upgrade`"""
+    __tablename__ = 'schema_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.version}>'
+
+
+class CatalogVersion(db.Model):
+    """Shared version stamp for the per-worker catalog cache"""
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
@@ -0,0 +1,280 @@
+"""Profiles of slow requests, kept in a small on-disk ring buffer.
+
+A WSGI middleware registers each request's thread while it runs. A
+sampler thread records the stack of any request that has been running
+longer than PROFILE_THRESHOLD_MS, every PROFILE_INTERVAL_MS, and the
+collapsed stacks are saved when the request ends; requests under the
+threshold are never sampled, so they only pay for the registration.
+Requests carrying an ``X-Profile`` header signed with SECRET_KEY (issued
+on the admin profiles page) run under cProfile and are saved as pstats.
+Only one such request per process is profiled at a time (cProfile is
+process-wide from Python 3.12); others fall back to sampling.
+"""
+import io
+import os
+import re
+import sys
+import time
+import pstats
+import marshal
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from werkzeug.exceptions import HTTPException
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+_TOKEN_SALT = 'request-profile'
+_NAME = re.compile(r'^(?P<stamp>\d{8}T\d{12})-(?P<pid>\d+)-(?P<ms>\d+)ms-(?P<status>\d{3})-'
+                   r'(?P<method>[A-Z]+)-(?P<endpoint>[\w.]+)\.(?P<kind>collapsed|pstats)$')
+
+# thread ident -> _Request for requests in flight in this process
+_active = {}
+_sampler = {'pid': None}
+# Held by the request running under cProfile
+_profiling = threading.Lock()
+
+
+class _Request:
+    __slots__ = ('started', 'sample_after', 'samples', 'status')
+
+    def __init__(self, threshold):
+        self.started = time.perf_counter()
+        self.sample_after = self.started + threshold
+        self.samples = None
+        self.status = '000'
+
+
+def _frame_label(code):
+    path = code.co_filename.replace(os.sep, '/').rsplit('/', 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    """``outer;...;inner`` for a frame, the format flame graph tools read"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _start_sampler(interval):
+    _sampler['pid'] = os.getpid()
+
+    def run():
+        while _sampler['pid'] == os.getpid():
+            time.sleep(interval)
+            now = time.perf_counter()
+            slow = [(ident, request) for ident, request in list(_active.items())
+                    if now >= request.sample_after]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for ident, request in slow:
+                frame = frames.get(ident)
+                if frame is not None:
+                    if request.samples is None:
+                        request.samples = Counter()
+                    request.samples[_collapse(frame)] += 1
+            del frames
+
+    threading.Thread(target=run, name='request-sampler', daemon=True).start()
+
+
+class ProfilingMiddleware:
+    """Sample slow requests and cProfile requests with a signed X-Profile header"""
+
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self.threshold = app.config['PROFILE_THRESHOLD_MS'] / 1000
+        self.interval = app.config['PROFILE_INTERVAL_MS'] / 1000
+
+    def __call__(self, environ, start_response):
+        token = environ.get('HTTP_X_PROFILE')
+        if token and verify_token(self.app, token) and _profiling.acquire(blocking=False):
+            app_iter = self._profiled(environ, start_response)
+            if app_iter is not None:
+                return app_iter
+        if not self.threshold:
+            return self.wsgi_app(environ, start_response)
+        if _sampler['pid'] != os.getpid():
+            _start_sampler(self.interval)
+
+        ident = threading.get_ident()
+        request = _active[ident] = _Request(self.threshold)
+
+        def recording_start_response(status, headers, exc_info=None):
+            request.status = status[:3]
+            return start_response(status, headers, exc_info)
+
+        def finish():
+            if _active.get(ident) is request:
+                del _active[ident]
+            if request.samples:
+                elapsed = time.perf_counter() - request.started
+                self._save(environ, request.status, elapsed, 'collapsed', _collapsed_text(request.samples))
+
+        try:
+            app_iter = self.wsgi_app(environ, recording_start_response)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(app_iter, finish)
+
+    def _profiled(self, environ, start_response):
+        """Run the request under cProfile; None if another profiler is active"""
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        status = ['000']
+
+        def recording_start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        def finish():
+            try:
+                profile.disable()
+            finally:
+                _profiling.release()
+            profile.create_stats()
+            self._save(environ, status[0], time.perf_counter() - started, 'pstats', profile.stats)
+
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) holds the hook
+            _profiling.release()
+            return None
+        try:
+            app_iter = self.wsgi_app(environ, recording_start_response)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(app_iter, finish)
+
+    def _save(self, environ, status, elapsed, kind, data):
+        try:
+            save_profile(self.app, _endpoint(self.app, environ), environ.get('REQUEST_METHOD', 'GET'),
+                         status, elapsed, kind, data)
+        except OSError as e:
+            logger.warning("Could not save request profile: %s", e)
+
+
+def _endpoint(app, environ):
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        endpoint = 'unmatched'
+    return re.sub(r'[^\w.]', '_', endpoint)
+
+
+def _collapsed_text(samples):
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+# ---------------------------------------------------------------- storage
+
+def profile_dir(app):
+    directory = app.config['PROFILE_DIR']
+    return directory if os.path.isabs(directory) else os.path.join(app.instance_path, directory)
+
+
+def save_profile(app, endpoint, method, status, elapsed, kind, data):
+    """Write a profile and drop the oldest ones beyond PROFILE_KEEP"""
+    directory = profile_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    name = f'{stamp}-{os.getpid()}-{round(elapsed * 1000)}ms-{status}-{method}-{endpoint}.{kind}'
+    path = os.path.join(directory, name)
+    tmp = f'{path}.tmp'
+    if kind == 'pstats':
+        with open(tmp, 'wb') as handle:
+            marshal.dump(data, handle)
+    else:
+        with open(tmp, 'w') as handle:
+            handle.write(data)
+    os.replace(tmp, path)
+
+    names = sorted(name for name in os.listdir(directory) if _NAME.match(name))
+    for old in names[:-app.config['PROFILE_KEEP']]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass  # another worker pruned it first
+    logger.info("Saved %s profile of %s %s (%.0f ms)", kind, method, endpoint, elapsed * 1000)
+    return name
+
+
+def list_profiles(app):
+    """Saved profiles, newest first, as dicts parsed from their file names"""
+    directory = profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        match = _NAME.match(name)
+        if match:
+            info = match.groupdict()
+            info['name'] = name
+            info['recorded_at'] = datetime.strptime(info.pop('stamp'), '%Y%m%dT%H%M%S%f')
+            info['ms'] = int(info['ms'])
+            profiles.append(info)
+    return profiles
+
+
+def profile_path(app, name):
+    """Path of a saved profile, or None for unknown names"""
+    if not _NAME.match(name):
+        return None
+    path = os.path.join(profile_dir(app), name)
+    return path if os.path.isfile(path) else None
+
+
+def profile_report(path, limit=60):
+    """Readable summary: top stacks for samples, cumulative-time table for pstats"""
+    if path.endswith('.pstats'):
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+    with open(path) as handle:
+        lines = handle.read().splitlines()
+    total = sum(int(line.rsplit(' ', 1)[1]) for line in lines)
+    report = [f'{total} samples']
+    for line in lines[:limit]:
+        stack, count = line.rsplit(' ', 1)
+        frames = stack.split(';')
+        report.append(f'\n{int(count) / total:6.1%}  {frames[-1]}')
+        report.extend(f'          {frame}' for frame in reversed(frames[-12:-1]))
+    return '\n'.join(report)
+
+
+# ---------------------------------------------------------------- debug tokens
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=_TOKEN_SALT)
+
+
+def issue_token(app, user_id):
+    """A token for the X-Profile header, valid for PROFILE_TOKEN_MAX_AGE seconds"""
+    return _serializer(app).dumps(user_id)
+
+
+def verify_token(app, token):
+    try:
+        _serializer(app).loads(token, max_age=app.config['PROFILE_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return True
+
+
+def init_app(app):
+    """Wrap the WSGI app with the profiling middleware"""
+    if app.config.get('PROFILE_ENABLED', True):
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app)
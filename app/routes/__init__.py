@@ -0,0 +1,17 @@
+import importlib
+import time
+
+# Blueprint modules in registration order. Views keep heavy optional
+# dependencies (pyotp, qrcode, NLTK, PyPDF2) as function-level imports so
+# they load on first use rather than at worker boot.
+BLUEPRINT_MODULES = ('auth', 'learner', 'admin', 'forum', 'api', 'api_v1', 'documents')
+
+
+def register_routes(app):
+    """Import and register every blueprint, recording how long each took"""
+    timings = app.extensions.setdefault('startup_timings', {})
+    for name in BLUEPRINT_MODULES:
+        started = time.perf_counter()
+        module = importlib.import_module(f'.{name}', __name__)
+        app.register_blueprint(module.bp)
+        timings[f'routes.{name}'] = time.perf_counter() - started
@@ -0,0 +1,727 @@
+"""Administration routes for users, interests, courses and lessons"""
+import logging
+from flask import Blueprint, render_template, flash, redirect, url_for, request, abort, jsonify, send_file, current_app
+from flask_login import current_user, login_required
+from .. import db
+from ..db_routing import replica_reads
+from ..cache import cache, table_tag
+from ..models import User, Course, Lesson, Interest, UserInterest, CourseInterest
+from ..forms import CourseForm, LessonForm, InterestForm, UserInterestAccessForm
+from ..utils.course_helpers import get_user_interests_status
+from ..utils.admin_helpers import get_admin_stats, approve_user, reject_user, grant_interest_access, revoke_interest_access, set_user_video_access
+from ..utils.catalog_cache import catalog_cache
+from ..utils.association_sync import sync_association
+from ..utils.analytics import rollups_stale, dashboard_analytics
+from ..utils.user_directory import UserFilters, user_page, user_domains, ACCESS_LEVELS
+from ..utils.lesson_render import render_lesson
+from ..utils.course_progress import lessons_added, lesson_removed, sync_course_completion
+from ..utils.exports import EXPORTS, EXPORT_FORMATS, export_response
+from ..utils.access_rules import course_domains, set_course_domains
+from .. import profiling
+
+bp = Blueprint('admin', __name__)
+logger = logging.getLogger(__name__)
+
+
+@bp.route('/admin/users/pending')
+@login_required
+@replica_reads
+def admin_pending_users():
+    if not current_user.is_admin:
+        flash('You do not have permission to access the admin area.', 'danger')
+        return redirect(url_for('learner.index'))
+
+    pending_users, next_cursor = user_page(UserFilters(status='pending'))
+
+    # Get stats for dashboard cards
+    stats = get_admin_stats()
+
+    return render_template('admin/approve_users.html',
+                           title='Pending Users',
+                           pending_users=pending_users,
+                           next_cursor=next_cursor,
+                           **stats)
+
+
+@bp.route('/admin/users/approve', methods=['POST'])
+@login_required
+def admin_approve_user():
+    if not current_user.is_admin:
+        abort(403)
+
+    user_id = request.form.get('user_id')
+    action = request.form.get('action')
+    video_access = request.form.get('video_access')
+
+    if user_id and action:
+        try:
+            user_id = int(user_id)
+            if action == 'approve':
+                if approve_user(user_id, current_user.id):
+                    # Set video access if specified
+                    if video_access is not None:
+                        set_user_video_access(user_id, video_access == 'on')
+                    flash('User has been approved successfully.', 'success')
+                else:
+                    flash('Error approving user. User may not exist.', 'danger')
+            elif action == 'reject':
+                if reject_user(user_id):
+                    flash('User has been rejected and removed.', 'success')
+                else:
+                    flash('Error rejecting user. User may not exist.', 'danger')
+            else:
+                flash('Invalid action specified.', 'danger')
+        except ValueError:
+            flash('Invalid user ID format.', 'danger')
+    else:
+        flash('Missing required form data. Please try again.', 'danger')
+
+    return redirect(url_for('admin.admin_pending_users'))
+
+
+@bp.route('/admin/courses')
+@login_required
+@replica_reads
+def admin_courses():
+    if not current_user.is_admin:
+        flash('You do not have permission to access the admin area.', 'danger')
+        return redirect(url_for('learner.index'))
+
+    courses = Course.detail_query().all()
+
+    # Get stats for dashboard cards
+    stats = get_admin_stats()
+
+    return render_template('admin/content.html',
+                           title='Manage Courses',
+                           courses=courses,
+                           **stats)
+
+
+@bp.route('/admin/dashboard')
+@login_required
+@replica_reads
+def admin_dashboard():
+    if not current_user.is_admin:
+        flash('You do not have permission to access the admin area.', 'danger')
+        return redirect(url_for('learner.index'))
+
+    # Rollups are rebuilt by the scheduled `flask analytics rollup`, never here
+    analytics = cache.memoize('admin:dashboard_analytics', dashboard_analytics, tags=[
+        table_tag('analytics_rollup_state'), table_tag('courses'), table_tag('interests')
+    ])
+
+    return render_template('admin/dashboard.html', title='Admin Dashboard', analytics=analytics,
+                           analytics_stale=rollups_stale(analytics['as_of']), **get_admin_stats())
+
+
+@bp.route('/admin/users')
+@login_required
+@replica_reads
+def admin_users():
+    if not current_user.is_admin:
+        flash('You do not have permission to access the admin area.', 'danger')
+        return redirect(url_for('learner.index'))
+
+    filters = UserFilters.from_args(request.args)
+    users, next_cursor = user_page(filters, after=request.args.get('after', type=int))
+
+    # Get stats for dashboard cards
+    stats = get_admin_stats()
+
+    return render_template('admin/users.html',
+                           title='Manage Users',
+                           users=users,
+                           next_cursor=next_cursor,
+                           filters=filters,
+                           domains=user_domains(),
+                           access_levels=ACCESS_LEVELS,
+                           **stats)
+
+
+@bp.route('/admin/users/page')
+@login_required
+@replica_reads
+def admin_users_page():
+    """Next page of the user directory as rendered HTML plus the cursor after it"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+
+    if request.args.get('view') == 'pending':
+        filters = UserFilters(status='pending')
+        template = 'admin/_pending_user_cards.html'
+    else:
+        filters = UserFilters.from_args(request.args)
+        template = 'admin/_user_rows.html'
+    users, next_cursor = user_page(filters, after=request.args.get('after', type=int))
+    html = render_template(template, users=users, pending_users=users)
+    return jsonify({'html': html, 'next': next_cursor})
+
+
+@bp.route('/admin/export/<name>.<fmt>')
+@login_required
+@replica_reads
+def admin_export(name, fmt):
+    """Stream users, progress or activity as CSV or NDJSON, honouring directory filters"""
+    if not current_user.is_admin:
+        abort(403)
+    if name not in EXPORTS or fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    after = request.args.get('after')
+    logger.info("Admin %s exporting %s as %s (after=%s)", current_user.id, name, fmt, after)
+    try:
+        return export_response(name, fmt, UserFilters.from_args(request.args), after=after)
+    except ValueError:
+        abort(400)
+
+
+@bp.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """Slow-request profiles, plus a token for profiling a request on demand"""
+    if not current_user.is_admin:
+        abort(403)
+    return render_template('admin/profiles.html',
+                           title='Request Profiles',
+                           profiles=profiling.list_profiles(current_app),
+                           token=profiling.issue_token(current_app, current_user.id),
+                           header=profiling.HEADER)
+
+
+@bp.route('/admin/profiles/<name>')
+@login_required
+def admin_profile(name):
+    if not current_user.is_admin:
+        abort(403)
+    path = profiling.profile_path(current_app, name)
+    if path is None:
+        abort(404)
+    if request.args.get('download'):
+        return send_file(path, as_attachment=True, download_name=name)
+    return render_template('admin/profile.html', title='Request Profile', name=name,
+                           report=profiling.profile_report(path))
+
+
+@bp.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+@login_required
+def admin_delete_user(user_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    user = User.query.get_or_404(user_id)
+
+    # Prevent admin from deleting themselves
+    if user.id == current_user.id:
+        flash('You cannot delete your own account.', 'danger')
+        return redirect(url_for('admin.admin_users'))
+
+    # Prevent deleting other admin users
+    if user.is_admin:
+        flash('You cannot delete admin users.', 'danger')
+        return redirect(url_for('admin.admin_users'))
+
+    username = user.username
+    db.session.delete(user)
+    db.session.commit()
+    flash(f'User "{username}" has been deleted successfully.', 'success')
+    return redirect(url_for('admin.admin_users'))
+
+
+@bp.route('/admin/interests')
+@login_required
+@replica_reads
+def admin_interests():
+    if not current_user.is_admin:
+        flash('You do not have permission to access the admin area.', 'danger')
+        return redirect(url_for('learner.index'))
+
+    interests = catalog_cache.interests()
+
+    # Get stats for dashboard cards
+    stats = get_admin_stats()
+
+    return render_template('admin/interests.html',
+                           title='Manage Interests',
+                           interests=interests,
+                           **stats)
+
+
+# Admin routes for managing interests
+@bp.route('/admin/interests/add', methods=['GET', 'POST'])
+@login_required
+def admin_add_interest():
+    if not current_user.is_admin:
+        abort(403)
+
+    form = InterestForm()
+    if form.validate_on_submit():
+        interest = Interest(
+            name=form.name.data,
+            description=form.description.data,
+            created_by=current_user.id
+        )
+        db.session.add(interest)
+        db.session.commit()
+        flash('Interest created successfully!', 'success')
+        return redirect(url_for('admin.admin_interests'))
+
+    return render_template('admin/edit_interest.html', title='Add Interest', form=form)
+
+
+@bp.route('/admin/interests/<int:interest_id>/edit', methods=['GET', 'POST'])
+@login_required
+def admin_edit_interest(interest_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    interest = Interest.query.get_or_404(interest_id)
+    form = InterestForm()
+
+    if form.validate_on_submit():
+        interest.name = form.name.data
+        interest.description = form.description.data
+        db.session.commit()
+        flash('Interest updated successfully!', 'success')
+        return redirect(url_for('admin.admin_interests'))
+
+    form.name.data = interest.name
+    form.description.data = interest.description
+    return render_template('admin/edit_interest.html', title='Edit Interest', form=form, interest=interest)
+
+
+@bp.route('/admin/interests/<int:interest_id>/delete', methods=['POST'])
+@login_required
+def admin_delete_interest(interest_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    interest = Interest.query.get_or_404(interest_id)
+    db.session.delete(interest)
+    db.session.commit()
+    flash('Interest deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_interests'))
+
+
+@bp.route('/admin/users/<int:user_id>/interests')
+@login_required
+def admin_user_interests(user_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    user = User.query.get_or_404(user_id)
+    interests = catalog_cache.interests()
+    user_interests_status = get_user_interests_status(user_id)
+    form = UserInterestAccessForm()
+
+    logger.debug("User %s interests page - found %d total interests", user_id, len(interests))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Interest status data: %s",
+                     [(s['interest'].id, s['interest'].name, s['access_granted']) for s in user_interests_status])
+
+    return render_template('admin/user_interests.html',
+                           title=f'Manage Interests for {user.username}',
+                           user=user,
+                           interests=interests,
+                           interest_status=user_interests_status,
+                           form=form)
+
+
+@bp.route('/admin/user-interest/update', methods=['POST'])
+@login_required
+def admin_update_user_interest():
+    if not current_user.is_admin:
+        abort(403)
+
+    user_id_str = request.form.get('user_id')
+    interest_id = request.form.get('interest_id')
+    action = request.form.get('action')
+
+    # Store user_id for redirect
+    redirect_user_id = None
+
+    if user_id_str and interest_id and action:
+        try:
+            user_id = int(user_id_str)
+            redirect_user_id = user_id
+            interest_id = int(interest_id)
+
+            if action == 'grant':
+                if grant_interest_access(user_id, interest_id):
+                    flash('Interest access granted successfully.', 'success')
+                else:
+                    flash('Error granting interest access.', 'danger')
+            elif action == 'revoke':
+                if revoke_interest_access(user_id, interest_id):
+                    flash('Interest access revoked successfully.', 'success')
+                else:
+                    flash('Error revoking interest access.', 'danger')
+            else:
+                flash('Invalid action specified.', 'danger')
+        except ValueError:
+            flash('Invalid user or interest ID.', 'danger')
+            try:
+                redirect_user_id = int(user_id_str)
+            except:
+                redirect_user_id = None
+    else:
+        flash('Missing required form data.', 'danger')
+
+    # If we have a valid user_id, redirect to their interests page, otherwise to users list
+    if redirect_user_id:
+        return redirect(url_for('admin.admin_user_interests', user_id=redirect_user_id))
+    else:
+        return redirect(url_for('admin.admin_users'))
+
+
+# Admin course management routes
+@bp.route('/admin/courses/add', methods=['GET', 'POST'])
+@login_required
+def admin_add_course():
+    if not current_user.is_admin:
+        abort(403)
+
+    form = CourseForm()
+    interests = catalog_cache.interests()
+    form.interests.choices = [(i.id, i.name) for i in interests]
+
+    if form.validate_on_submit():
+        course = Course(
+            title=form.title.data,
+            description=form.description.data,
+            cover_image_url=form.cover_image_url.data,
+            created_by=current_user.id
+        )
+        db.session.add(course)
+        db.session.flush()  # Get the course ID
+
+        # Add course-interest relationships
+        for interest_id in form.interests.data:
+            course_interest = CourseInterest(
+                course_id=course.id,
+                interest_id=interest_id,
+                created_by=current_user.id
+            )
+            db.session.add(course_interest)
+
+        set_course_domains(course.id, (form.allowed_domains.data or '').split(','))
+        db.session.commit()
+        flash('Course created successfully!', 'success')
+        return redirect(url_for('admin.admin_courses'))
+
+    # Initialize interests data to empty list for new courses
+    if form.interests.data is None:
+        form.interests.data = []
+
+    return render_template('admin/edit_course.html', title='Add Course', form=form)
+
+
+@bp.route('/admin/courses/<int:course_id>/edit', methods=['GET', 'POST'])
+@login_required
+def admin_edit_course(course_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    course = Course.detail_query().get_or_404(course_id)
+    form = CourseForm()
+    interests = catalog_cache.interests()
+    form.interests.choices = [(i.id, i.name) for i in interests]
+
+    if form.validate_on_submit():
+        course.title = form.title.data
+        course.description = form.description.data
+        course.cover_image_url = form.cover_image_url.data
+
+        # Update course-interest relationships; unchanged mappings are left alone
+        sync_association(CourseInterest.course_id, course.id, CourseInterest.interest_id,
+                         form.interests.data, created_by=current_user.id)
+        set_course_domains(course.id, (form.allowed_domains.data or '').split(','))
+
+        db.session.commit()
+        flash('Course updated successfully!', 'success')
+        return redirect(url_for('admin.admin_courses'))
+
+    # Pre-populate form
+    form.title.data = course.title
+    form.description.data = course.description
+    form.cover_image_url.data = course.cover_image_url
+    form.allowed_domains.data = ', '.join(course_domains(course.id))
+
+    # Set selected interests
+    current_interests = [ci.interest_id for ci in CourseInterest.query.filter_by(course_id=course.id).all()]
+    form.interests.data = current_interests
+
+    return render_template('admin/edit_course.html', title='Edit Course', form=form, course=course)
+
+
+@bp.route('/admin/courses/<int:course_id>/delete', methods=['POST'])
+@login_required
+def admin_delete_course(course_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    course = Course.query.get_or_404(course_id)
+    db.session.delete(course)
+    db.session.commit()
+    flash('Course deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_courses'))
+
+
+# Admin lesson management routes
+@bp.route('/admin/courses/<int:course_id>/lessons')
+@login_required
+@replica_reads
+def admin_lessons(course_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    course = Course.query.get_or_404(course_id)
+    lessons = Lesson.summary_query().filter_by(course_id=course_id).order_by(Lesson.order).all()
+
+    return render_template('admin/lessons.html',
+                           title=f'Manage Lessons for {course.title}',
+                           course=course,
+                           lessons=lessons)
+
+
+@bp.route('/admin/courses/<int:course_id>/lessons/add', methods=['GET', 'POST'])
+@login_required
+def admin_add_lesson(course_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    course = Course.query.get_or_404(course_id)
+    form = LessonForm()
+
+    if form.validate_on_submit():
+        lesson = Lesson(
+            title=form.title.data,
+            content=form.content.data,
+            content_type=form.content_type.data,
+            video_url=form.video_url.data,
+            order=form.order.data,
+            course_id=course_id
+        )
+        render_lesson(lesson)
+        db.session.add(lesson)
+        lessons_added(course_id)
+        db.session.commit()
+        flash('Lesson created successfully!', 'success')
+        return redirect(url_for('admin.admin_lessons', course_id=course_id))
+
+    return render_template('admin/edit_lesson.html', title='Add Lesson', form=form, course=course)
+
+
+@bp.route('/admin/lessons/<int:lesson_id>/edit', methods=['GET', 'POST'])
+@login_required
+def admin_edit_lesson(lesson_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    lesson = Lesson.detail_query().get_or_404(lesson_id)
+    form = LessonForm()
+
+    if form.validate_on_submit():
+        lesson.title = form.title.data
+        lesson.content = form.content.data
+        lesson.content_type = form.content_type.data
+        lesson.video_url = form.video_url.data
+        lesson.order = form.order.data
+        render_lesson(lesson)
+        db.session.commit()
+        flash('Lesson updated successfully!', 'success')
+        return redirect(url_for('admin.admin_lessons', course_id=lesson.course_id))
+
+    # Pre-populate form
+    form.title.data = lesson.title
+    form.content.data = lesson.content
+    form.content_type.data = lesson.content_type
+    form.video_url.data = lesson.video_url
+    form.order.data = lesson.order
+
+    return render_template('admin/edit_lesson.html', title='Edit Lesson', form=form, lesson=lesson, course=lesson.course)
+
+
+@bp.route('/admin/lessons/<int:lesson_id>/delete', methods=['POST'])
+@login_required
+def admin_delete_lesson(lesson_id):
+    if not current_user.is_admin:
+        abort(403)
+
+    lesson = Lesson.query.get_or_404(lesson_id)
+    course_id = lesson.course_id
+    lesson_removed(lesson)
+    db.session.delete(lesson)
+    db.session.flush()
+    sync_course_completion(course_id)
+    db.session.commit()
+    flash('Lesson deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_lessons', course_id=course_id))
+
+
+# Admin interest requests management
+@bp.route('/admin/interest-requests')
+@login_required
+@replica_reads
+def admin_user_interest_requests():
+    if not current_user.is_admin:
+        abort(403)
+
+    # Get all user interests that are not yet granted access
+    pending_requests = db.session.query(UserInterest, User, Interest).join(
+        User, UserInterest.user_id == User.id
+    ).join(
+        Interest, UserInterest.interest_id == Interest.id
+    ).filter(UserInterest.access_granted == False).all()
+
+    # Convert to a list of objects with user and interest attributes
+    pending_list = []
+    for ui, user, interest in pending_requests:
+        pending_list.append({
+            'user': user,
+            'interest': interest,
+            'user_interest': ui
+        })
+
+    # Get stats for dashboard cards
+    stats = get_admin_stats()
+
+    return render_template('admin/user_interest_requests.html',
+                           title='User Interest Requests',
+                           pending_requests=pending_list,
+                           **stats)
+
+
+@bp.route('/admin/approve-interest-request', methods=['POST'])
+@login_required
+def admin_approve_interest_request():
+    if not current_user.is_admin:
+        abort(403)
+
+    user_id = request.form.get('user_id')
+    interest_id = request.form.get('interest_id')
+    action = request.form.get('action')
+
+    logger.debug("Interest request action - user_id: %s, interest_id: %s, action: %s", user_id, interest_id, action)
+
+    if not user_id or not interest_id or not action:
+        flash('Missing required form data. Please try again.', 'danger')
+        return redirect(url_for('admin.admin_user_interest_requests'))
+
+    try:
+        user_id = int(user_id)
+        interest_id = int(interest_id)
+
+        # Check if the user interest record exists
+        user_interest = UserInterest.query.filter_by(
+            user_id=user_id,
+            interest_id=interest_id,
+            access_granted=False
+        ).first()
+
+        if not user_interest:
+            flash('Interest request not found or already processed.', 'warning')
+            return redirect(url_for('admin.admin_user_interest_requests'))
+
+        if action == 'approve':
+            if grant_interest_access(user_id, interest_id):
+                # Get user and interest names for the flash message
+                user = User.query.get(user_id)
+                interest = Interest.query.get(interest_id)
+                flash(f'Interest access approved for {user.username} - {interest.name}.', 'success')
+            else:
+                flash('Error approving interest access.', 'danger')
+        elif action == 'reject':
+            # Get user and interest names for the flash message before deletion
+            user = User.query.get(user_id)
+            interest = Interest.query.get(interest_id)
+
+            db.session.delete(user_interest)
+            db.session.commit()
+            flash(f'Interest request rejected for {user.username} - {interest.name}.', 'success')
+        else:
+            flash('Invalid action specified.', 'danger')
+
+    except ValueError as e:
+        logger.warning("Invalid interest request IDs: %s", e)
+        flash('Invalid user or interest ID format.', 'danger')
+    except Exception:
+        logger.exception("Error processing interest request")
+        db.session.rollback()
+        flash('An error occurred while processing the request.', 'danger')
+
+    return redirect(url_for('admin.admin_user_interest_requests'))
+
+
+@bp.route('/admin/bulk-interest-requests', methods=['POST'])
+@login_required
+def admin_bulk_interest_requests():
+    if not current_user.is_admin:
+        abort(403)
+
+    selected_requests = request.form.getlist('selected_requests')
+    bulk_action = request.form.get('bulk_action')
+
+    logger.debug("Bulk interest action %s on requests: %s", bulk_action, selected_requests)
+
+    if not selected_requests:
+        flash('No requests selected. Please select at least one request.', 'warning')
+        return redirect(url_for('admin.admin_user_interest_requests'))
+
+    if not bulk_action:
+        flash('Invalid action specified.', 'warning')
+        return redirect(url_for('admin.admin_user_interest_requests'))
+
+    success_count = 0
+    error_count = 0
+
+    for request_id in selected_requests:
+        try:
+            # Handle individual interest request (format: user_id_interest_id)
+            parts = request_id.split('_')
+
+            if len(parts) == 2:
+                user_id, interest_id = int(parts[0]), int(parts[1])
+                user_interest = UserInterest.query.filter_by(
+                    user_id=user_id,
+                    interest_id=interest_id,
+                    access_granted=False
+                ).first()
+
+                if user_interest:
+                    if bulk_action == 'approve':
+                        if grant_interest_access(user_id, interest_id):
+                            success_count += 1
+                        else:
+                            error_count += 1
+                            logger.debug("Failed to approve interest request %s", request_id)
+                    elif bulk_action == 'reject':
+                        db.session.delete(user_interest)
+                        success_count += 1
+                else:
+                    error_count += 1
+                    logger.debug("Interest request not found: %s", request_id)
+            else:
+                error_count += 1
+                logger.debug("Invalid interest request id format: %s", request_id)
+
+        except (ValueError, AttributeError) as e:
+            error_count += 1
+            logger.debug("Error processing interest request %s: %s", request_id, e)
+
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Bulk interest request commit failed")
+        flash('Database error occurred. Please try again.', 'danger')
+        return redirect(url_for('admin.admin_user_interest_requests'))
+
+    logger.info("Bulk %s of interest requests: %d succeeded, %d failed", bulk_action, success_count, error_count)
+    if success_count > 0:
+        action_word = 'approved' if bulk_action == 'approve' else 'rejected'
+        flash(f'Successfully {action_word} {success_count} interest request(s).', 'success')
+    if error_count > 0:
+        flash(f'Failed to process {error_count} request(s).', 'warning')
+
+    return redirect(url_for('admin.admin_user_interest_requests'))
@@ -0,0 +1,209 @@
+"""JSON endpoints for bookmarks, lesson progress and notes"""
+from flask import Blueprint, request, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..db_routing import replica_reads
+from ..models import Lesson, UserLessonProgress, UserNote, UserBookmark
+from ..utils.course_helpers import user_can_access_course, accessible_course_ids
+from ..utils.learner_events import (mark_progress, mark_complete, set_bookmark, add_note,
+                                    ingest_events, EventBatchError)
+
+bp = Blueprint('api', __name__)
+
+# Upper bound on lesson ids per learner-state request
+LEARNER_STATE_MAX_LESSONS = 500
+
+
+# API endpoints for interactive learning features
+@bp.route('/api/toggle_bookmark/<int:lesson_id>', methods=['POST'])
+@login_required
+def api_toggle_bookmark(lesson_id):
+    lesson = Lesson.query.get_or_404(lesson_id)
+
+    # Check if user has access to this lesson
+    if not user_can_access_course(current_user, lesson.course):
+        return jsonify({'error': 'Access denied'}), 403
+
+    # Check if bookmark exists
+    bookmark = UserBookmark.query.filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson_id
+    ).first()
+
+    is_bookmarked = set_bookmark(current_user.id, lesson, bookmark) is not None
+
+    db.session.commit()
+    return jsonify({'success': True, 'is_bookmarked': is_bookmarked})
+
+
+@bp.route('/api/check_bookmark/<int:lesson_id>')
+@login_required
+def api_check_bookmark(lesson_id):
+    lesson = Lesson.query.get_or_404(lesson_id)
+
+    # Check if user has access to this lesson
+    if not user_can_access_course(current_user, lesson.course):
+        return jsonify({'error': 'Access denied'}), 403
+
+    bookmark = UserBookmark.query.filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson_id
+    ).first()
+
+    return jsonify({'is_bookmarked': bookmark is not None})
+
+
+@bp.route('/api/learner_state')
+@login_required
+@replica_reads
+def api_learner_state():
+    """Bookmark, progress and note-count state for many lessons in one request.
+
+    Takes ``?lesson_ids=1,2,3`` and answers with sparse maps: lessons that
+    are not bookmarked, not started or without notes are simply absent.
+    Lessons the user cannot access are left out of ``lesson_ids``.
+    """
+    try:
+        requested = {int(part) for part in request.args.get('lesson_ids', '').split(',') if part.strip()}
+    except ValueError:
+        return jsonify({'error': 'lesson_ids must be a comma-separated list of integers'}), 400
+    if len(requested) > LEARNER_STATE_MAX_LESSONS:
+        return jsonify({'error': f'At most {LEARNER_STATE_MAX_LESSONS} lessons per request'}), 400
+
+    lesson_courses = dict(db.session.execute(
+        select(Lesson.id, Lesson.course_id).where(Lesson.id.in_(requested))
+    ).all()) if requested else {}
+    allowed_courses = accessible_course_ids(current_user, lesson_courses.values())
+    lesson_ids = sorted(lesson_id for lesson_id, course_id in lesson_courses.items() if course_id in allowed_courses)
+    if not lesson_ids:
+        return jsonify({'lesson_ids': [], 'bookmarked': [], 'progress': {}, 'note_counts': {}})
+
+    bookmarked = db.session.execute(
+        select(UserBookmark.lesson_id).distinct()
+        .where(UserBookmark.user_id == current_user.id, UserBookmark.lesson_id.in_(lesson_ids))
+    ).scalars().all()
+    progress = db.session.execute(
+        select(UserLessonProgress.lesson_id, UserLessonProgress.status)
+        .where(UserLessonProgress.user_id == current_user.id, UserLessonProgress.lesson_id.in_(lesson_ids))
+    ).all()
+    note_counts = db.session.execute(
+        select(UserNote.lesson_id, func.count())
+        .where(UserNote.user_id == current_user.id, UserNote.lesson_id.in_(lesson_ids))
+        .group_by(UserNote.lesson_id)
+    ).all()
+
+    return jsonify({
+        'lesson_ids': lesson_ids,
+        'bookmarked': sorted(bookmarked),
+        'progress': {str(lesson_id): status for lesson_id, status in progress},
+        'note_counts': {str(lesson_id): count for lesson_id, count in note_counts},
+    })
+
+
+@bp.route('/api/events', methods=['POST'])
+@login_required
+def api_events():
+    """Apply a queued batch of progress, completion, bookmark and note events.
+
+    Body: ``{"events": [{"key", "type", "lesson_id", "at", ...}, ...]}``.
+    Responds with one result per event, in order; events replayed under a
+    key that was already applied are not applied again.
+    """
+    data = request.get_json(silent=True) or {}
+    for attempt in range(2):
+        try:
+            results = ingest_events(current_user, data.get('events'))
+            db.session.commit()
+            break
+        except EventBatchError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        except IntegrityError:
+            # A concurrent retry of the same batch committed first; the
+            # second pass answers from its receipts
+            db.session.rollback()
+            if attempt:
+                raise
+    return jsonify({'results': results})
+
+
+@bp.route('/api/mark_lesson_complete/<int:lesson_id>', methods=['POST'])
+@login_required
+def api_mark_lesson_complete(lesson_id):
+    lesson = Lesson.query.get_or_404(lesson_id)
+
+    # Check if user has access to this lesson
+    if not user_can_access_course(current_user, lesson.course):
+        return jsonify({'error': 'Access denied'}), 403
+
+    # Get or create progress record
+    progress = UserLessonProgress.query.filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson_id
+    ).first()
+
+    _, course_completed = mark_complete(current_user.id, lesson, progress)
+
+    db.session.commit()
+    return jsonify({'success': True, 'status': 'completed', 'course_completed': course_completed})
+
+
+@bp.route('/api/mark_lesson_progress/<int:lesson_id>', methods=['POST'])
+@login_required
+def api_mark_lesson_progress(lesson_id):
+    lesson = Lesson.query.get_or_404(lesson_id)
+
+    # Check if user has access to this lesson
+    if not user_can_access_course(current_user, lesson.course):
+        return jsonify({'error': 'Access denied'}), 403
+
+    data = request.get_json()
+    status = data.get('status', 'in_progress')
+
+    # Get or create progress record
+    progress = UserLessonProgress.query.filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson_id
+    ).first()
+
+    progress, course_completed = mark_progress(current_user.id, lesson, progress, status)
+
+    db.session.commit()
+    return jsonify({'success': True, 'status': progress.status, 'course_completed': course_completed})
+
+
+@bp.route('/api/save_note/<int:lesson_id>', methods=['POST'])
+@login_required
+def api_save_note(lesson_id):
+    lesson = Lesson.query.get_or_404(lesson_id)
+
+    # Check if user has access to this lesson
+    if not user_can_access_course(current_user, lesson.course):
+        return jsonify({'error': 'Access denied'}), 403
+
+    data = request.get_json()
+    note_text = data.get('note_text', '').strip()
+
+    if not note_text:
+        return jsonify({'error': 'Note text cannot be empty'}), 400
+
+    note = add_note(current_user.id, lesson, note_text)
+
+    db.session.commit()
+    return jsonify({'success': True, 'note_id': note.id})
+
+
+@bp.route('/api/delete_note/<int:note_id>', methods=['DELETE'])
+@login_required
+def api_delete_note(note_id):
+    note = UserNote.query.get_or_404(note_id)
+
+    # Check if user owns this note
+    if note.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    db.session.delete(note)
+    db.session.commit()
+    return jsonify({'success': True})
@@ -0,0 +1,244 @@
+"""Read-only JSON API (v1) for the catalog and the current user's progress.
+
+Every list endpoint takes ``?fields=`` (sparse fieldsets), ``?limit=`` and
+``?after=`` (the ``next`` cursor from the previous page). Only the requested
+columns are selected, rows are serialized straight from result tuples, and
+responses carry an ETag so unchanged pages revalidate with a 304.
+"""
+from flask import Blueprint, request, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import select, tuple_, func
+from werkzeug.exceptions import HTTPException, NotFound
+from .. import db
+from ..db_routing import replica_reads
+from ..models import Course, Lesson, UserLessonProgress, UserCourseProgress
+from ..utils.catalog_cache import catalog_cache
+from ..utils.course_helpers import accessible_course_ids
+from ..utils.access_rules import course_access_filter, course_page, visible_interests
+from ..utils.json_api import json_response, requested_fields, page_limit, int_cursor
+
+bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+INTEREST_FIELDS = ('id', 'name', 'description')
+
+COURSE_COLUMNS = {
+    'id': Course.id,
+    'title': Course.title,
+    'description': Course.description,
+    'cover_image_url': Course.cover_image_url,
+    'created_at': Course.created_at,
+    'updated_at': Course.updated_at,
+}
+# Filled from the catalog cache rather than selected
+COURSE_COMPUTED = {
+    'interest_ids': lambda row: sorted(catalog_cache.course(row.id).interest_ids),
+    'restricted': lambda row: catalog_cache.course(row.id).restricted,
+    'restricted_domains': lambda row: sorted(catalog_cache.course(row.id).allowed_domains),
+    # Kept for clients written before access rules were configurable
+    'thbs_restricted': lambda row: 'thbs.com' in catalog_cache.course(row.id).allowed_domains,
+}
+COURSE_FIELDS = (*COURSE_COLUMNS, *COURSE_COMPUTED)
+COURSE_DEFAULT_FIELDS = ('id', 'title', 'description', 'cover_image_url', 'updated_at', 'interest_ids')
+
+# Lessons without an order sort (and page) as order 0
+LESSON_ORDER = func.coalesce(Lesson.order, 0)
+
+LESSON_COLUMNS = {
+    'id': Lesson.id,
+    'course_id': Lesson.course_id,
+    'title': Lesson.title,
+    'order': LESSON_ORDER,
+    'content_type': Lesson.content_type,
+    'video_url': Lesson.video_url,
+    'content_html': Lesson.content_html,
+    'created_at': Lesson.created_at,
+    'updated_at': Lesson.updated_at,
+}
+LESSON_FIELDS = tuple(LESSON_COLUMNS)
+LESSON_LIST_FIELDS = ('id', 'title', 'order', 'content_type', 'updated_at')
+LESSON_DETAIL_FIELDS = ('id', 'course_id', 'title', 'order', 'content_type', 'video_url', 'content_html', 'updated_at')
+
+COURSE_PROGRESS_COLUMNS = {
+    'course_id': UserCourseProgress.course_id,
+    'completed_lessons': UserCourseProgress.completed_lessons,
+    'in_progress_lessons': UserCourseProgress.in_progress_lessons,
+    'total_lessons': UserCourseProgress.total_lessons,
+    'last_activity_at': UserCourseProgress.last_activity_at,
+}
+COURSE_PROGRESS_COMPUTED = {
+    'completed': lambda row: row.total_lessons > 0 and row.completed_lessons >= row.total_lessons,
+}
+COURSE_PROGRESS_FIELDS = (*COURSE_PROGRESS_COLUMNS, *COURSE_PROGRESS_COMPUTED)
+
+LESSON_PROGRESS_COLUMNS = {
+    'lesson_id': UserLessonProgress.lesson_id,
+    'course_id': Lesson.course_id,
+    'status': UserLessonProgress.status,
+    'started_at': UserLessonProgress.started_at,
+    'completed_at': UserLessonProgress.completed_at,
+    'last_interaction': UserLessonProgress.last_interaction,
+}
+
+
+def _records(rows, fields, columns, computed=None):
+    """Turn result tuples into dicts holding exactly the requested fields"""
+    computed = computed or {}
+    return [
+        {name: getattr(row, name) if name in columns else computed[name](row) for name in fields}
+        for row in rows
+    ]
+
+
+def _select(keys, fields, columns):
+    """SELECT the cursor/key columns plus whichever requested fields are columns"""
+    selected = dict(keys)
+    selected.update((name, columns[name]) for name in fields if name in columns)
+    return select(*(column.label(name) for name, column in selected.items()))
+
+
+def _page(rows, limit, cursor_of):
+    rows = list(rows)
+    next_cursor = cursor_of(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _check_course(course_id, message='Course not found'):
+    if course_id not in accessible_course_ids(current_user, [course_id]):
+        raise NotFound(message)
+
+
+def _mask_lesson_content(records, rows):
+    """Blank content the user's access level does not allow, as the lesson page does"""
+    can_text, can_video = current_user.can_view_text(), current_user.can_view_videos()
+    for record, row in zip(records, rows):
+        if row.content_type == 'mixed':
+            text_ok, video_ok = can_text, can_video
+        else:
+            text_ok = video_ok = {'text': can_text, 'video': can_video}.get(row.content_type, False)
+        if 'content_html' in record and not text_ok:
+            record['content_html'] = None
+        if 'video_url' in record and not video_ok:
+            record['video_url'] = None
+    return records
+
+
+@bp.errorhandler(HTTPException)
+def api_error(error):
+    return jsonify({'error': error.description, 'status': error.code}), error.code
+
+
+@bp.route('/interests')
+@login_required
+@replica_reads
+def interests():
+    fields = requested_fields(INTEREST_FIELDS, INTEREST_FIELDS)
+    after = int_cursor() or 0
+    limit = page_limit()
+    # Interest rows are already cached per worker as tuples
+    records = [interest for interest in visible_interests(current_user) if interest.id > after]
+    page, next_cursor = _page(records, limit, lambda interest: str(interest.id))
+    return json_response({'data': _records(page, fields, INTEREST_FIELDS), 'next': next_cursor})
+
+
+@bp.route('/courses')
+@login_required
+@replica_reads
+def courses():
+    fields = requested_fields(COURSE_FIELDS, COURSE_DEFAULT_FIELDS)
+    after = int_cursor() or 0
+    limit = page_limit()
+    # Access rules are applied in the WHERE clause, so the page is one query
+    rows = db.session.execute(course_page(
+        _select({'id': Course.id}, fields, COURSE_COLUMNS).where(course_access_filter(current_user)),
+        after=after, limit=limit + 1
+    )).all()
+    page, next_cursor = _page(rows, limit, lambda row: str(row.id))
+    return json_response({'data': _records(page, fields, COURSE_COLUMNS, COURSE_COMPUTED), 'next': next_cursor})
+
+
+@bp.route('/courses/<int:course_id>')
+@login_required
+@replica_reads
+def course(course_id):
+    fields = requested_fields(COURSE_FIELDS, COURSE_DEFAULT_FIELDS)
+    row = db.session.execute(
+        _select({'id': Course.id}, fields, COURSE_COLUMNS)
+        .where(Course.id == course_id, course_access_filter(current_user))
+    ).one_or_none()
+    if row is None:
+        raise NotFound('Course not found')
+    return json_response({'data': _records([row], fields, COURSE_COLUMNS, COURSE_COMPUTED)[0]})
+
+
+@bp.route('/courses/<int:course_id>/lessons')
+@login_required
+@replica_reads
+def course_lessons(course_id):
+    fields = requested_fields(LESSON_FIELDS, LESSON_LIST_FIELDS)
+    _check_course(course_id)
+    after = int_cursor(parts=2)
+    limit = page_limit()
+    query = (_select({'order': LESSON_ORDER, 'id': Lesson.id, 'content_type': Lesson.content_type},
+                     fields, LESSON_COLUMNS)
+             .where(Lesson.course_id == course_id))
+    if after:
+        query = query.where(tuple_(LESSON_ORDER, Lesson.id) > tuple_(*after))
+    rows = db.session.execute(query.order_by(LESSON_ORDER, Lesson.id).limit(limit + 1)).all()
+    page, next_cursor = _page(rows, limit, lambda row: f'{row.order}:{row.id}')
+    records = _mask_lesson_content(_records(page, fields, LESSON_COLUMNS), page)
+    return json_response({'data': records, 'next': next_cursor})
+
+
+@bp.route('/lessons/<int:lesson_id>')
+@login_required
+@replica_reads
+def lesson(lesson_id):
+    fields = requested_fields(LESSON_FIELDS, LESSON_DETAIL_FIELDS)
+    row = db.session.execute(
+        _select({'id': Lesson.id, 'course_id': Lesson.course_id, 'content_type': Lesson.content_type},
+                fields, LESSON_COLUMNS)
+        .where(Lesson.id == lesson_id)
+    ).one_or_none()
+    if row is None:
+        raise NotFound('Lesson not found')
+    _check_course(row.course_id, 'Lesson not found')
+    return json_response({'data': _mask_lesson_content(_records([row], fields, LESSON_COLUMNS), [row])[0]})
+
+
+@bp.route('/progress')
+@login_required
+@replica_reads
+def progress():
+    """The user's per-course counters"""
+    fields = requested_fields(COURSE_PROGRESS_FIELDS, COURSE_PROGRESS_FIELDS)
+    after = int_cursor() or 0
+    limit = page_limit()
+    keys = {'course_id': UserCourseProgress.course_id, 'completed_lessons': UserCourseProgress.completed_lessons,
+            'total_lessons': UserCourseProgress.total_lessons}
+    rows = db.session.execute(
+        _select(keys, fields, COURSE_PROGRESS_COLUMNS)
+        .where(UserCourseProgress.user_id == current_user.id, UserCourseProgress.course_id > after)
+        .order_by(UserCourseProgress.course_id).limit(limit + 1)
+    ).all()
+    page, next_cursor = _page(rows, limit, lambda row: str(row.course_id))
+    records = _records(page, fields, COURSE_PROGRESS_COLUMNS, COURSE_PROGRESS_COMPUTED)
+    return json_response({'data': records, 'next': next_cursor})
+
+
+@bp.route('/progress/lessons')
+@login_required
+@replica_reads
+def lesson_progress():
+    """The user's lesson statuses, optionally for one course (``?course_id=``)"""
+    fields = requested_fields(tuple(LESSON_PROGRESS_COLUMNS), tuple(LESSON_PROGRESS_COLUMNS))
+    after = int_cursor() or 0
+    limit = page_limit()
+    query = (_select({'lesson_id': UserLessonProgress.lesson_id}, fields, LESSON_PROGRESS_COLUMNS)
+             .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+             .where(UserLessonProgress.user_id == current_user.id, UserLessonProgress.lesson_id > after))
+    course_id = request.args.get('course_id', type=int)
+    if course_id is not None:
+        query = query.where(Lesson.course_id == course_id)
+    rows = db.session.execute(query.order_by(UserLessonProgress.lesson_id).limit(limit + 1)).all()
+    page, next_cursor = _page(rows, limit, lambda row: str(row.lesson_id))
+    return json_response({'data': _records(page, fields, LESSON_PROGRESS_COLUMNS), 'next': next_cursor})
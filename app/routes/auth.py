@@ -0,0 +1,164 @@
+"""Sign-in, registration and two-factor authentication routes"""
+from urllib.parse import urlparse
+from flask import Blueprint, render_template, flash, redirect, url_for, request, session
+from flask_login import login_user, logout_user, current_user, login_required
+from .. import db
+from ..models import User
+from ..forms import LoginForm, RegistrationForm, TwoFactorForm
+from ..utils.auth_helpers import generate_otp_secret, verify_totp, generate_qr_code
+
+bp = Blueprint('auth', __name__)
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('learner.index'))
+
+    if request.args.get('registration_complete'):
+        flash('Registration successful! Your account is pending approval from an administrator.', 'success')
+        session.pop('user_created', None)
+
+    form = LoginForm()
+
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+
+        if user is None or not user.check_password(form.password.data):
+            flash('Invalid email or password', 'danger')
+            return render_template('auth/login.html', title='Sign In', form=form)
+
+        if not user.is_approved:
+            flash('Your account is pending approval from an administrator.', 'warning')
+            return render_template('auth/login.html', title='Sign In', form=form)
+
+        # Special case for admin: bypass 2FA
+        if user.is_admin:
+            login_user(user, remember=form.remember_me.data)
+            next_page = request.args.get('next')
+            if not next_page or urlparse(next_page).netloc != '':
+                next_page = url_for('learner.index')
+            flash('Welcome, Administrator!', 'success')
+            return redirect(next_page)
+
+        # Check if user has 2FA configured
+        if not user.otp_secret:
+            flash('Your account is missing 2FA configuration. Please contact an administrator.', 'danger')
+            return render_template('auth/login.html', title='Sign In', form=form)
+
+        # Check if user has completed 2FA setup
+        if not user.is_2fa_enabled:
+            session['setup_user_id'] = user.id
+            flash('Please complete your two-factor authentication setup.', 'info')
+            return redirect(url_for('auth.setup_2fa'))
+
+        # Store user info in session for 2FA verification
+        session['user_id'] = user.id
+        session['remember_me'] = form.remember_me.data
+        return redirect(url_for('auth.two_factor_auth'))
+
+    return render_template('auth/login.html', title='Sign In', form=form)
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('learner.index'))
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('learner.index'))
+
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        user = User(username=form.username.data, email=form.email.data)
+        user.set_password(form.password.data)
+        user.set_access_based_on_domain()
+        db.session.add(user)
+        db.session.commit()
+
+        # Set up 2FA
+        user.otp_secret = generate_otp_secret()
+        db.session.commit()
+
+        # Store user ID in session for 2FA setup
+        session['setup_user_id'] = user.id
+        flash('Registration successful! Please set up two-factor authentication.', 'success')
+        return redirect(url_for('auth.setup_2fa'))
+
+    return render_template('auth/register.html', title='Register', form=form)
+
+
+@bp.route('/setup-2fa', methods=['GET', 'POST'])
+def setup_2fa():
+    if current_user.is_authenticated:
+        return redirect(url_for('learner.index'))
+
+    user_id = session.get('setup_user_id')
+    if not user_id:
+        flash('Invalid session. Please register again.', 'danger')
+        return redirect(url_for('auth.register'))
+
+    user = User.query.get(user_id)
+    if not user or not user.otp_secret:
+        flash('Invalid session. Please register again.', 'danger')
+        return redirect(url_for('auth.register'))
+
+    form = TwoFactorForm()
+
+    if form.validate_on_submit():
+        if verify_totp(user.otp_secret, form.token.data):
+            user.is_2fa_enabled = True
+            db.session.commit()
+            session.pop('setup_user_id', None)
+            flash('Two-factor authentication set up successfully! Your account is pending admin approval.', 'success')
+            return redirect(url_for('auth.login'))
+        else:
+            flash('Invalid authentication code. Please try again.', 'danger')
+
+    # Generate QR code for 2FA setup
+    qr_code = generate_qr_code(user.username, user.otp_secret)
+
+    return render_template('auth/two_factor_setup.html', 
+                           title='Set Up Two-Factor Authentication',
+                           form=form,
+                           qr_code=qr_code,
+                           username=user.username,
+                           secret=user.otp_secret)
+
+
+@bp.route('/two-factor', methods=['GET', 'POST'])
+def two_factor_auth():
+    if current_user.is_authenticated:
+        return redirect(url_for('learner.index'))
+
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Session expired. Please log in again.', 'warning')
+        return redirect(url_for('auth.login'))
+
+    user = User.query.get(user_id)
+    if not user or not user.otp_secret:
+        flash('Invalid session. Please log in again.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    form = TwoFactorForm()
+    if form.validate_on_submit():
+        if verify_totp(user.otp_secret, form.token.data):
+            login_user(user, remember=session.get('remember_me', False))
+            session.pop('user_id', None)
+            session.pop('remember_me', None)
+            flash('Login successful!', 'success')
+
+            next_page = request.args.get('next')
+            if not next_page or urlparse(next_page).netloc != '':
+                next_page = url_for('learner.index')
+            return redirect(next_page)
+        else:
+            flash('Invalid authentication code. Please try again.', 'danger')
+
+    return render_template('auth/two_factor.html', title='Two-Factor Authentication', form=form)
@@ -0,0 +1,38 @@
+"""Document analysis upload page"""
+import time
+from flask import Blueprint, render_template, request, jsonify
+from flask_login import login_required
+from ..metrics import DOCUMENT_ANALYSIS_LATENCY, DOCUMENT_ANALYSIS_IN_PROGRESS
+
+bp = Blueprint('documents', __name__)
+
+
+@bp.route('/document-analysis', methods=['GET', 'POST'])
+@login_required
+def document_analysis():
+    if request.method == 'POST':
+        # Handle file upload
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'})
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'})
+
+        # NLTK, PyPDF2 and python-docx load on the first upload only
+        from ..document_analysis import analyze_document
+
+        started = time.perf_counter()
+        outcome = 'error'
+        DOCUMENT_ANALYSIS_IN_PROGRESS.inc()
+        try:
+            result = analyze_document(file, file.filename)
+            outcome = 'error' if 'error' in result else 'ok'
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({'error': str(e)})
+        finally:
+            DOCUMENT_ANALYSIS_IN_PROGRESS.dec()
+            DOCUMENT_ANALYSIS_LATENCY.observe(time.perf_counter() - started, outcome)
+
+    return render_template('document_analysis.html', title='Document Analysis')
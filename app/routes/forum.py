@@ -0,0 +1,94 @@
+"""General and course discussion forum routes"""
+from flask import Blueprint, render_template, flash, redirect, url_for
+from flask_login import current_user, login_required
+from .. import db
+from ..db_routing import replica_reads
+from ..models import Course, ForumTopic, ForumReply
+from ..forms import ForumTopicForm, ForumReplyForm
+from ..utils.course_helpers import user_can_access_course
+
+bp = Blueprint('forum', __name__)
+
+
+@bp.route('/forum')
+@replica_reads
+def forum_index():
+    topics = ForumTopic.summary_query().filter_by(course_id=None).order_by(ForumTopic.created_at.desc()).all()
+    return render_template('forum/index.html', title='General Forum', topics=topics)
+
+
+# Forum routes
+@bp.route('/forum/new', methods=['GET', 'POST'])
+@login_required
+def forum_new_topic():
+    form = ForumTopicForm()
+
+    if form.validate_on_submit():
+        topic = ForumTopic(
+            title=form.title.data,
+            content=form.content.data,
+            course_id=form.course_id.data if form.course_id.data else None,
+            user_id=current_user.id
+        )
+        db.session.add(topic)
+        db.session.commit()
+        flash('Topic created successfully!', 'success')
+
+        if topic.course_id:
+            return redirect(url_for('forum.course_forum', course_id=topic.course_id))
+        else:
+            return redirect(url_for('forum.forum_index'))
+
+    return render_template('forum/new_topic.html', title='New Topic', form=form)
+
+
+@bp.route('/forum/topic/<int:topic_id>')
+@login_required
+@replica_reads
+def forum_topic(topic_id):
+    topic = ForumTopic.detail_query().get_or_404(topic_id)
+    replies = ForumReply.detail_query().filter_by(topic_id=topic_id).order_by(ForumReply.created_at).all()
+    form = ForumReplyForm()
+
+    return render_template('forum/topic.html',
+                           title=topic.title,
+                           topic=topic,
+                           replies=replies,
+                           form=form)
+
+
+@bp.route('/forum/topic/<int:topic_id>/reply', methods=['POST'])
+@login_required
+def forum_reply(topic_id):
+    topic = ForumTopic.query.get_or_404(topic_id)
+    form = ForumReplyForm()
+
+    if form.validate_on_submit():
+        reply = ForumReply(
+            content=form.content.data,
+            topic_id=topic_id,
+            user_id=current_user.id
+        )
+        db.session.add(reply)
+        db.session.commit()
+        flash('Reply posted successfully!', 'success')
+
+    return redirect(url_for('forum.forum_topic', topic_id=topic_id))
+
+
+@bp.route('/courses/<int:course_id>/forum')
+@login_required
+@replica_reads
+def course_forum(course_id):
+    course = Course.query.get_or_404(course_id)
+
+    if not user_can_access_course(current_user, course):
+        flash('You do not have access to this course forum.', 'danger')
+        return redirect(url_for('learner.user_dashboard'))
+
+    topics = ForumTopic.summary_query().filter_by(course_id=course_id).order_by(ForumTopic.created_at.desc()).all()
+
+    return render_template('forum/course_forum.html',
+                           title=f'{course.title} Forum',
+                           course=course,
+                           topics=topics)
@@ -0,0 +1,203 @@
+"""Learner-facing pages: dashboard, profile, interests, courses and lessons"""
+from flask import Blueprint, render_template, flash, redirect, url_for
+from flask_login import current_user, login_required
+from .. import db
+from ..db_routing import replica_reads
+from ..models import Course, Lesson, UserInterest, UserLessonProgress, UserNote
+from ..forms import InterestSelectionForm, ProfileForm
+from ..utils.course_helpers import get_user_accessible_courses, get_recommended_courses, user_can_access_course, get_user_interests_status
+from ..utils.access_rules import visible_interests
+from ..utils.association_sync import sync_association
+from ..utils.course_progress import course_progress
+
+bp = Blueprint('learner', __name__)
+
+
+@bp.route('/')
+@replica_reads
+def index():
+    if current_user.is_authenticated:
+        if current_user.is_admin:
+            return redirect(url_for('admin.admin_dashboard'))
+        return redirect(url_for('learner.user_dashboard'))
+
+    return render_template('index.html', title='Welcome to Erlang Systems LMS')
+
+
+@bp.route('/user/dashboard')
+@login_required
+@replica_reads
+def user_dashboard():
+    if not current_user.is_approved:
+        flash('Your account is pending approval.', 'warning')
+        return redirect(url_for('auth.logout'))
+
+    if current_user.is_admin:
+        return redirect(url_for('admin.admin_dashboard'))
+
+    # Get user's interests and available courses
+    user_interests = get_user_interests_status(current_user.id)
+
+    # Get courses that the user can access
+    available_courses = get_user_accessible_courses(current_user)
+
+    # Get user's progress statistics
+    progress_stats = current_user.get_progress_stats()
+
+    # Get user's recent activities
+    recent_activities = current_user.get_recent_activity()
+
+    # Get user's bookmarked lessons
+    bookmarked_lessons = current_user.get_bookmarked_lessons()
+
+    # Get current lesson (in progress)
+    current_lesson = current_user.get_current_lesson()
+
+    # Get recommended courses
+    recommended_courses = get_recommended_courses(current_user)
+
+    # Per-course progress bars read the maintained counters
+    progress_by_course = course_progress(current_user.id, [course.id for course in available_courses])
+
+    return render_template('user/dashboard.html',
+                           title='Dashboard',
+                           courses=available_courses,
+                           user_interests=user_interests,
+                           progress_stats=progress_stats,
+                           recent_activities=recent_activities,
+                           bookmarked_lessons=bookmarked_lessons,
+                           current_lesson=current_lesson,
+                           recommended_courses=recommended_courses,
+                           progress_by_course=progress_by_course)
+
+
+@bp.route('/profile', methods=['GET', 'POST'])
+@login_required
+def profile():
+    form = ProfileForm()
+    if form.validate_on_submit():
+        if form.new_password.data:
+            if form.current_password.data and current_user.check_password(form.current_password.data):
+                current_user.set_password(form.new_password.data)
+                flash('Password updated successfully!', 'success')
+            else:
+                flash('Current password is incorrect.', 'danger')
+                return render_template('user/profile.html', title='Profile', form=form)
+
+        db.session.commit()
+        flash('Profile updated successfully!', 'success')
+        return redirect(url_for('learner.profile'))
+
+    # Pre-populate form with current user data
+    form.username.data = current_user.username
+    form.email.data = current_user.email
+
+    return render_template('user/profile.html', title='Profile', form=form)
+
+
+@bp.route('/user/interests', methods=['GET', 'POST'])
+@login_required
+def user_interests():
+    if not current_user.is_approved:
+        flash('Your account is pending approval.', 'warning')
+        return redirect(url_for('auth.logout'))
+
+    form = InterestSelectionForm()
+    # Interests whose access rules exclude this user are not offered
+    all_interests = visible_interests(current_user)
+
+    form.interests.choices = [(i.id, i.name) for i in all_interests]
+
+    if form.validate_on_submit():
+        # Handle form submission - create pending interest requests
+        selected_interest_ids = form.interests.data
+
+        # New selections become pending requests; kept ones retain their access.
+        # Interests hidden from this user were not offered, so theirs are kept too
+        added, _ = sync_association(UserInterest.user_id, current_user.id, UserInterest.interest_id,
+                                    selected_interest_ids, scope=[i.id for i in all_interests],
+                                    access_granted=False)
+        db.session.commit()
+        if added:
+            flash('Your interest selections have been updated and are pending admin approval.', 'success')
+        else:
+            flash('Your interest selections have been updated.', 'success')
+        return redirect(url_for('learner.user_interests'))
+
+    # Pre-populate form with current selections
+    user_interests_status = get_user_interests_status(current_user.id)
+    current_selections = [ui['interest'].id for ui in user_interests_status if ui.get('selected', False)]
+    form.interests.data = current_selections
+
+    return render_template('user/interests.html',
+                           title='My Interests',
+                           form=form,
+                           interests=all_interests,
+                           user_interests=user_interests_status)
+
+
+@bp.route('/courses/<int:course_id>')
+@login_required
+@replica_reads
+def view_course(course_id):
+    course = Course.detail_query().get_or_404(course_id)
+
+    if not user_can_access_course(current_user, course):
+        flash('You do not have access to this course.', 'danger')
+        return redirect(url_for('learner.user_dashboard'))
+
+    lessons = Lesson.summary_query().filter_by(course_id=course.id).order_by(Lesson.order).all()
+    progress = course_progress(current_user.id, [course.id]).get(course.id)
+
+    return render_template('user/course.html',
+                           title=course.title,
+                           course=course,
+                           lessons=lessons,
+                           progress=progress)
+
+
+@bp.route('/lessons/<int:lesson_id>')
+@login_required
+@replica_reads
+def view_lesson(lesson_id):
+    lesson = Lesson.display_query().get_or_404(lesson_id)
+
+    if not user_can_access_course(current_user, lesson.course):
+        flash('You do not have access to this lesson.', 'danger')
+        return redirect(url_for('learner.user_dashboard'))
+
+    # Get previous and next lessons for navigation
+    prev_lesson = Lesson.summary_query().filter(
+        Lesson.course_id == lesson.course_id,
+        Lesson.order < lesson.order
+    ).order_by(Lesson.order.desc()).first()
+
+    next_lesson = Lesson.summary_query().filter(
+        Lesson.course_id == lesson.course_id,
+        Lesson.order > lesson.order
+    ).order_by(Lesson.order.asc()).first()
+
+    # Check if user can view content based on access level
+    can_view_content = lesson.can_view_content(current_user)
+
+    # Get user's lesson progress
+    lesson_progress = UserLessonProgress.query.filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson.id
+    ).first()
+
+    # Get user's notes for this lesson
+    user_notes = UserNote.detail_query().filter_by(
+        user_id=current_user.id,
+        lesson_id=lesson.id
+    ).order_by(UserNote.created_at.desc()).all()
+
+    return render_template('user/lesson.html',
+                           title=lesson.title,
+                           lesson=lesson,
+                           course=lesson.course,
+                           prev_lesson=prev_lesson,
+                           next_lesson=next_lesson,
+                           can_view_content=can_view_content,
+                           lesson_progress=lesson_progress,
+                           user_notes=user_notes)
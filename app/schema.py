@@ -0,0 +1,312 @@
+import re
+import json
+import logging
+from datetime import datetime
+import click
+from sqlalchemy import select, text, inspect
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from . import db
+
+logger = logging.getLogger(__name__)
+
+
+def _create_missing_tables():
+    """Create any model table that does not exist yet"""
+    db.create_all()
+
+
+def _activity_log_tables():
+    """JSON activity payloads, archive and daily rollup tables"""
+    from .models import UserActivity
+    db.create_all()
+    for index in UserActivity.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    # Earlier releases concatenated payload strings by hand; re-encode any
+    # row that is not valid JSON before the column is treated as JSON
+    rows = db.session.execute(
+        text("SELECT id, activity_data FROM user_activities WHERE activity_data IS NOT NULL")
+    ).all()
+    for activity_id, raw in rows:
+        if not isinstance(raw, str):
+            continue
+        try:
+            json.loads(raw)
+            continue
+        except ValueError:
+            pass
+        match = re.match(r'\{"lesson_title": "(.*)"\}$', raw, re.S)
+        payload = {'lesson_title': match.group(1)} if match else {'legacy_text': raw}
+        db.session.execute(
+            text("UPDATE user_activities SET activity_data = :data WHERE id = :id"),
+            {'data': json.dumps(payload), 'id': activity_id}
+        )
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text(
+            "ALTER TABLE user_activities ALTER COLUMN activity_data TYPE JSON USING activity_data::json"
+        ))
+    db.session.commit()
+
+
+def _analytics_rollup_tables():
+    """Daily analytics rollups and the timestamp indexes they scan"""
+    from .models import User, UserLessonProgress
+    db.create_all()
+    for model in (User, UserLessonProgress):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _user_directory_indexes():
+    """Index users.email_domain for the admin directory filters"""
+    from .models import User
+    for index in User.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def _add_column(table, column):
+    """ALTER TABLE ... ADD COLUMN for a model column missing from the database"""
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def _lesson_rendered_html():
+    """Stored HTML rendering and source hash on lessons"""
+    from .models import Lesson
+    for name in ('content_html', 'content_hash'):
+        _add_column(Lesson.__table__, Lesson.__table__.c[name])
+
+
+def _foreign_keys_out_of_date(inspector, table):
+    """True when a model foreign key's ON DELETE differs from the database"""
+    stored = {
+        (tuple(fk['constrained_columns']), fk['referred_table']): (fk.get('options') or {}).get('ondelete')
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+    for fk in table.foreign_key_constraints:
+        key = (tuple(fk.column_keys), fk.referred_table.name)
+        if (stored.get(key) or '').upper() != (fk.ondelete or '').upper():
+            return True
+    return False
+
+
+def _rebuild_sqlite_table(connection, table):
+    # SQLite cannot alter constraints: copy rows into a freshly created table
+    old_name = f'{table.name}__old'
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    columns = ', '.join(f'"{c.name}"' for c in table.columns if c.name in existing)
+    for index in inspect(connection).get_indexes(table.name):
+        connection.exec_driver_sql(f'DROP INDEX IF EXISTS "{index["name"]}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"')
+    table.create(connection)
+    connection.exec_driver_sql(
+        f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'
+    )
+    connection.exec_driver_sql(f'DROP TABLE "{old_name}"')
+
+
+def _replace_postgresql_foreign_keys(connection, table):
+    for fk in inspect(connection).get_foreign_keys(table.name):
+        connection.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT {fk["name"]}'))
+    for fk in table.foreign_key_constraints:
+        columns = ', '.join(fk.column_keys)
+        referred = ', '.join(element.column.name for element in fk.elements)
+        action = f' ON DELETE {fk.ondelete}' if fk.ondelete else ''
+        connection.execute(text(
+            f'ALTER TABLE {table.name} ADD FOREIGN KEY ({columns}) '
+            f'REFERENCES {fk.referred_table.name} ({referred}){action}'
+        ))
+
+
+def _cascading_foreign_keys():
+    """ON DELETE CASCADE / SET NULL on user, course and lesson foreign keys"""
+    db.session.commit()
+    inspector = inspect(db.engine)
+    stale = [table for table in db.metadata.sorted_tables
+             if table.foreign_key_constraints and inspector.has_table(table.name)
+             and _foreign_keys_out_of_date(inspector, table)]
+    if not stale:
+        return
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as connection:
+            # Must be switched off outside a transaction, or the rebuild
+            # would cascade deletes while dropping the old tables
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.exec_driver_sql('PRAGMA legacy_alter_table=ON')
+            connection.commit()
+            try:
+                with connection.begin():
+                    for table in stale:
+                        _rebuild_sqlite_table(connection, table)
+                orphans = connection.exec_driver_sql('PRAGMA foreign_key_check').all()
+                if orphans:
+                    logger.warning("%d rows reference missing parents after the rebuild", len(orphans))
+            finally:
+                connection.exec_driver_sql('PRAGMA legacy_alter_table=OFF')
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+    else:
+        with db.engine.begin() as connection:
+            for table in stale:
+                _replace_postgresql_foreign_keys(connection, table)
+
+
+def _user_course_progress():
+    """Per-user course progress counters, backfilled from lesson progress"""
+    from .utils.course_progress import reconcile_progress
+    db.create_all()
+    reconcile_progress()
+
+
+def _learner_state_indexes():
+    """(user_id, lesson_id) indexes behind the batched learner-state endpoint"""
+    from .models import UserNote, UserBookmark
+    for model in (UserNote, UserBookmark):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _client_event_receipts():
+    """Idempotency receipts for batched learner events"""
+    db.create_all()
+
+
+def _course_access_rules():
+    """Course access rule table, seeded from the old title and interest-name checks"""
+    from .utils.access_rules import seed_legacy_rules
+    db.create_all()
+    seed_legacy_rules()
+
+
+def _catalog_version_row():
+    """Seed the catalog version stamp so commits only ever UPDATE it"""
+    from .models import CatalogVersion
+    CatalogVersion.__table__.create(db.engine, checkfirst=True)
+    if db.session.get(CatalogVersion, 1) is None:
+        db.session.add(CatalogVersion(id=1, version=0))
+        db.session.commit()
+
+
+def _picker_only_access_rules():
+    """Picker-only interest rules; the seeded "Fun" rule becomes one again"""
+    from sqlalchemy import update
+    from .models import CourseAccessRule, Interest
+    _add_column(CourseAccessRule.__table__, CourseAccessRule.__table__.c.picker_only)
+    db.session.execute(update(CourseAccessRule).where(CourseAccessRule.picker_only.is_(None))
+                       .values(picker_only=False))
+    # Migration 10 closed Fun's courses to non-THBS users, where the old
+    # check only left the interest out of their picker
+    fun = select(Interest.id).where(Interest.name == 'Fun').scalar_subquery()
+    db.session.execute(update(CourseAccessRule).where(
+        CourseAccessRule.interest_id.in_(fun),
+        CourseAccessRule.email_domain == 'thbs.com',
+        CourseAccessRule.access_level.is_(None)
+    ).values(picker_only=True))
+    db.session.commit()
+
+
+# Ordered schema migrations: (version, description, function).
+# Append a new entry whenever a model gains a table or column, and keep
+# each function safe to run against a database created by db.create_all().
+MIGRATIONS = [
+    (1, 'Baseline tables', _create_missing_tables),
+    (2, 'Activity log JSON payloads, archive and rollups', _activity_log_tables),
+    (3, 'Daily analytics rollup tables', _analytics_rollup_tables),
+    (4, 'User directory filter indexes', _user_directory_indexes),
+    (5, 'Rendered lesson HTML', _lesson_rendered_html),
+    (6, 'Cascading deletes on foreign keys', _cascading_foreign_keys),
+    (7, 'User course progress counters', _user_course_progress),
+    (8, 'Learner state lookup indexes', _learner_state_indexes),
+    (9, 'Learner event idempotency receipts', _client_event_receipts),
+    (10, 'Course access rules', _course_access_rules),
+    (11, 'Catalog version stamp row', _catalog_version_row),
+    (12, 'Picker-only interest access rules', _picker_only_access_rules),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_stored_version():
+    """Return the schema version recorded in the database, or 0 if none"""
+    from .models import SchemaVersion
+    try:
+        version = db.session.execute(
+            select(SchemaVersion.version).where(SchemaVersion.id == 1)
+        ).scalar()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return 0
+    return version or 0
+
+
+def upgrade_schema():
+    """Apply pending migrations and record the new schema version"""
+    from .models import SchemaVersion
+    current = get_stored_version()
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Applying schema migration %s: %s", version, description)
+        migrate()
+        applied.append(version)
+
+    if applied:
+        SchemaVersion.__table__.create(db.engine, checkfirst=True)
+        record = db.session.get(SchemaVersion, 1) or SchemaVersion(id=1)
+        record.version = SCHEMA_VERSION
+        record.applied_at = datetime.utcnow()
+        db.session.add(record)
+        db.session.commit()
+    return applied
+
+
+def check_schema(app):
+    """Verify the stored schema version once at startup, without running DDL"""
+    if app.config.get('SCHEMA_AUTO_UPGRADE'):
+        applied = upgrade_schema()
+        if applied:
+            logger.info("Applied schema migrations: %s", applied)
+        return True
+
+    stored = get_stored_version()
+    if stored < SCHEMA_VERSION:
+        logger.error(
+            "Database schema is at version %s, application expects %s. "
+            "Run 'flask --app main schema upgrade' before serving traffic.",
+            stored, SCHEMA_VERSION
+        )
+        return False
+    if stored > SCHEMA_VERSION:
+        logger.warning("Database schema version %s is newer than this release (%s)", stored, SCHEMA_VERSION)
+    return True
+
+
+@click.group('schema')
+def schema_cli():
+    """Inspect and migrate the database schema"""
+
+
+@schema_cli.command('status')
+def schema_status():
+    """Show the stored and expected schema versions"""
+    click.echo(f"Stored schema version: {get_stored_version()}")
+    click.echo(f"Expected schema version: {SCHEMA_VERSION}")
+
+
+@schema_cli.command('upgrade')
+def schema_upgrade():
+    """Apply pending schema migrations"""
+    applied = upgrade_schema()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("Schema is up to date.")
+
+
+def register_cli(app):
+    """Register schema management commands on the Flask CLI"""
+    app.cli.add_command(schema_cli)
@@ -0,0 +1,41 @@
+import sys
+import time
+from contextlib import contextmanager
+import click
+from flask import current_app
+
+# Optional libraries that should stay unloaded until a request needs them
+HEAVY_MODULES = ('nltk', 'PyPDF2', 'docx', 'pyotp', 'qrcode', 'PIL')
+
+
+@contextmanager
+def timed(app, label):
+    """Record the wall-clock time of a startup phase under app.extensions"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        app.extensions.setdefault('startup_timings', {})[label] = time.perf_counter() - started
+
+
+def startup_report(app):
+    """Return the startup phase timings and which heavy modules are loaded"""
+    timings = app.extensions.get('startup_timings', {})
+    lines = ["Startup timings:"]
+    for label, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"  {label:<24} {seconds * 1000:8.1f} ms")
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    lines.append(f"Heavy modules loaded at startup: {', '.join(loaded) or 'none'}")
+    return lines
+
+
+@click.command('startup-report')
+def startup_report_command():
+    """Print how long each create_app phase took"""
+    for line in startup_report(current_app):
+        click.echo(line)
+
+
+def register_startup_report(app):
+    """Register the startup-report CLI command"""
+    app.cli.add_command(startup_report_command)
@@ -0,0 +1,105 @@
+// Queues learner events (progress, completion, bookmarks, notes) and sends
+// them to /api/events in batches: every few seconds, when the page is
+// hidden, or straight away for actions the user is waiting on.
+
+const LearnerEvents = (function() {
+    const ENDPOINT = '/api/events';
+    const FLUSH_INTERVAL = 5000;
+    const MAX_BATCH = 100;
+    let queue = [];
+    let inFlight = null;
+    let urgent = false;
+
+    function newKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    // Queue an event; the promise resolves with its result once sent
+    function push(type, lessonId, fields = {}) {
+        const event = Object.assign({key: newKey(), type: type, lesson_id: lessonId, at: Date.now()}, fields);
+        return new Promise((resolve, reject) => {
+            queue.push({event: event, resolve: resolve, reject: reject});
+        });
+    }
+
+    // Queue an event and send the queue now
+    function send(type, lessonId, fields = {}) {
+        const result = push(type, lessonId, fields);
+        urgent = true;
+        flush();
+        return result;
+    }
+
+    // The page's CSRF token, as main.js sends it
+    function csrfToken() {
+        const input = document.querySelector('input[name="csrf_token"]');
+        return input ? input.value : '';
+    }
+
+    function flush(keepalive = false) {
+        if (inFlight || queue.length === 0) {
+            return inFlight;
+        }
+        const batch = queue.splice(0, MAX_BATCH);
+        urgent = false;
+        inFlight = fetch(ENDPOINT, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken(),
+            },
+            body: JSON.stringify({events: batch.map(item => item.event)}),
+            keepalive: keepalive,
+        })
+        .then(response => {
+            if (response.status >= 500) {
+                throw new Error(`Event batch failed with status ${response.status}`);
+            }
+            if (!response.ok) {
+                // Sending the same batch again would fail the same way
+                const error = new Error(`Event batch rejected with status ${response.status}`);
+                batch.forEach(item => item.reject(error));
+                console.error('Error:', error);
+                return;
+            }
+            return response.json().then(data => {
+                batch.forEach((item, index) => {
+                    const result = data.results[index];
+                    if (result.ok) {
+                        item.resolve(result);
+                    } else {
+                        item.reject(new Error(result.error));
+                    }
+                });
+            });
+        })
+        .catch(error => {
+            // Network errors and 5xx: re-queue with the same keys; the server
+            // ignores events it already applied
+            queue = batch.concat(queue);
+            urgent = false;
+            console.error('Error:', error);
+        })
+        .finally(() => {
+            inFlight = null;
+            // An action queued while this batch was in flight is sent now
+            if (urgent) {
+                flush();
+            }
+        });
+        return inFlight;
+    }
+
+    setInterval(flush, FLUSH_INTERVAL);
+    window.addEventListener('pagehide', () => flush(true));
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flush(true);
+        }
+    });
+
+    return {push: push, send: send, flush: flush};
+})();
@@ -0,0 +1,58 @@
+import os
+import logging
+import click
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+
+def init_template_cache(app):
+    """Persist compiled Jinja templates so new workers skip compilation"""
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if not cache_dir:
+        return
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.join(app.instance_path, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning("Template bytecode cache disabled, cannot create %s: %s", cache_dir, e)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def compile_templates(app):
+    """Load every HTML template once, filling the in-memory and bytecode caches"""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+@click.group('templates')
+def templates_cli():
+    """Manage the compiled template cache"""
+
+
+@templates_cli.command('precompile')
+def templates_precompile():
+    """Compile all templates into the bytecode cache (run at deploy time)"""
+    count = compile_templates(current_app)
+    click.echo(f"Compiled {count} templates.")
+
+
+@templates_cli.command('clear')
+def templates_clear():
+    """Remove all cached template bytecode"""
+    cache = current_app.jinja_env.bytecode_cache
+    if cache is None:
+        click.echo("Template bytecode cache is not enabled.")
+        return
+    cache.clear()
+    click.echo("Template bytecode cache cleared.")
+
+
+def register_template_cli(app):
+    """Register template cache commands on the Flask CLI"""
+    app.cli.add_command(templates_cli)
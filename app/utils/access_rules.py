@@ -0,0 +1,210 @@
+"""Course access rules as SQL conditions.
+
+Rules live in ``course_access_rule`` (see CourseAccessRule). A course is
+open to an approved user who has been granted one of its interests,
+unless rules target the course or one of its interests; then the user's
+email domain and access level must also match at least one of those
+rules. Interest rules marked ``picker_only`` are left out of that check
+and only hide the interest on the interests page. Admins skip the rules.
+``course_access_filter`` builds that as a ``WHERE`` clause over
+``courses``, so listings are filtered, ordered and paginated by the
+database.
+"""
+import click
+from sqlalchemy import select, exists, func, and_, or_, not_, true, false, delete, insert
+from .. import db
+from ..models import Course, CourseInterest, CourseAccessRule, Interest, UserInterest
+from .catalog_cache import catalog_cache
+from .user_directory import ACCESS_LEVELS
+
+
+def _matches_user(user):
+    return and_(
+        or_(CourseAccessRule.email_domain.is_(None), CourseAccessRule.email_domain == user.email_domain),
+        or_(CourseAccessRule.access_level.is_(None), CourseAccessRule.access_level == user.access_level),
+    )
+
+
+def _course_rule_exists(*conditions):
+    """EXISTS over the rules on Course.id itself or on any of its interests"""
+    on_course = exists().where(CourseAccessRule.course_id == Course.id, *conditions)
+    on_interest = exists().where(
+        CourseInterest.course_id == Course.id,
+        CourseAccessRule.interest_id == CourseInterest.interest_id,
+        # NULL on rows that predate the column (migration 12 backfills them)
+        CourseAccessRule.picker_only.is_not(True),
+        *conditions
+    )
+    return or_(on_course, on_interest)
+
+
+def rules_allow(user):
+    """Condition: Course has no applicable rules, or one of them matches the user"""
+    if user.is_admin:
+        return true()
+    return or_(not_(_course_rule_exists()), _course_rule_exists(_matches_user(user)))
+
+
+def interest_granted(user):
+    """Condition: the user has been granted one of Course's interests"""
+    return exists().where(
+        CourseInterest.course_id == Course.id,
+        UserInterest.interest_id == CourseInterest.interest_id,
+        UserInterest.user_id == user.id,
+        UserInterest.access_granted.is_(True)
+    )
+
+
+def course_access_filter(user):
+    """WHERE clause limiting ``courses`` rows to those the user can open"""
+    if not user.is_authenticated or not user.is_approved:
+        return false()
+    if user.is_admin:
+        return true()
+    return and_(interest_granted(user), rules_allow(user))
+
+
+def course_page(query, after=None, limit=None):
+    """Keyset page of a course query ordered by id: pass the last id seen as ``after``"""
+    if after:
+        query = query.where(Course.id > after)
+    query = query.order_by(Course.id)
+    return query.limit(limit) if limit else query
+
+
+def rule_matches(rule, user):
+    """Python counterpart of the SQL match, for cached AccessRuleRecords"""
+    return ((rule.email_domain is None or rule.email_domain == user.email_domain)
+            and (rule.access_level is None or rule.access_level == user.access_level))
+
+
+def visible_interests(user):
+    """Cached interests the user may see and request; interest rules hide the rest"""
+    interests = catalog_cache.interests()
+    if user.is_admin:
+        return list(interests)
+    rules = catalog_cache.interest_rules()
+    return [
+        interest for interest in interests
+        if not rules.get(interest.id) or any(rule_matches(rule, user) for rule in rules[interest.id])
+    ]
+
+
+def course_domains(course_id):
+    """Email domains of the course's own domain-only rules"""
+    return sorted(db.session.execute(
+        select(CourseAccessRule.email_domain).where(
+            CourseAccessRule.course_id == course_id,
+            CourseAccessRule.email_domain.is_not(None),
+            CourseAccessRule.access_level.is_(None)
+        )
+    ).scalars())
+
+
+def set_course_domains(course_id, domains):
+    """Make the course's domain-only rules match ``domains``; the caller commits.
+
+    Rules that also name an access level are managed with ``flask access``
+    and left alone.
+    """
+    selected = {domain.strip().lower() for domain in domains if domain.strip()}
+    current = set(course_domains(course_id))
+    removed = current - selected
+    if removed:
+        db.session.execute(
+            delete(CourseAccessRule).where(
+                CourseAccessRule.course_id == course_id,
+                CourseAccessRule.email_domain.in_(removed),
+                CourseAccessRule.access_level.is_(None)
+            ).execution_options(synchronize_session=False)
+        )
+    added = selected - current
+    if added:
+        db.session.execute(insert(CourseAccessRule), [
+            {'course_id': course_id, 'email_domain': domain} for domain in sorted(added)
+        ])
+    return added, removed
+
+
+def seed_legacy_rules():
+    """Rules equivalent to the old hard-coded checks.
+
+    Courses with "erlang-l3" in the title were THBS-only. The "Fun"
+    interest was only left out of other users' interest picker, so its
+    rule is ``picker_only`` and does not close its courses.
+    """
+    restricted = db.session.execute(
+        select(Course.id).where(func.lower(Course.title).contains('erlang-l3'))
+    ).scalars().all()
+    fun = db.session.execute(select(Interest.id).where(Interest.name == 'Fun')).scalars().all()
+    existing = set(db.session.execute(
+        select(CourseAccessRule.course_id, CourseAccessRule.interest_id, CourseAccessRule.email_domain)
+    ).all())
+    rows = [{'course_id': course_id, 'interest_id': None, 'email_domain': 'thbs.com', 'picker_only': False}
+            for course_id in restricted]
+    rows += [{'course_id': None, 'interest_id': interest_id, 'email_domain': 'thbs.com', 'picker_only': True}
+             for interest_id in fun]
+    rows = [row for row in rows if (row['course_id'], row['interest_id'], row['email_domain']) not in existing]
+    if rows:
+        db.session.execute(insert(CourseAccessRule), rows)
+    db.session.commit()
+    return len(rows)
+
+
+@click.group('access')
+def access_cli():
+    """Manage course access rules"""
+
+
+@access_cli.command('list')
+def list_rules_command():
+    """Show every access rule"""
+    for rule in CourseAccessRule.query.order_by(CourseAccessRule.id):
+        target = f'course {rule.course_id}' if rule.course_id else f'interest {rule.interest_id}'
+        scope = '  (interest picker only)' if rule.picker_only else ''
+        click.echo(f"{rule.id:>5}  {target:<14} domain={rule.email_domain or '*'} level={rule.access_level or '*'}{scope}")
+
+
+@access_cli.command('seed')
+def seed_rules_command():
+    """Add the legacy THBS rules for courses and interests created since"""
+    click.echo(f'Added {seed_legacy_rules()} rule(s)')
+
+
+@access_cli.command('add')
+@click.option('--course', 'course_id', type=int, help='Course the rule applies to')
+@click.option('--interest', 'interest_id', type=int, help='Interest whose courses the rule applies to')
+@click.option('--domain', help='Allowed email domain (any when omitted)')
+@click.option('--level', type=click.Choice(ACCESS_LEVELS),
+              help='Allowed access level (any when omitted)')
+@click.option('--picker-only', is_flag=True,
+              help='Only hide the interest from other users when they pick interests; its courses stay open')
+def add_rule_command(course_id, interest_id, domain, level, picker_only):
+    """Allow a domain and/or access level into a course or an interest's courses"""
+    if (course_id is None) == (interest_id is None):
+        raise click.UsageError('Give exactly one of --course or --interest')
+    if picker_only and interest_id is None:
+        raise click.UsageError('--picker-only applies to --interest rules')
+    rule = CourseAccessRule(course_id=course_id, interest_id=interest_id,
+                            email_domain=domain.lower() if domain else None, access_level=level,
+                            picker_only=picker_only)
+    db.session.add(rule)
+    db.session.commit()
+    click.echo(f'Added rule {rule.id}')
+
+
+@access_cli.command('remove')
+@click.argument('rule_id', type=int)
+def remove_rule_command(rule_id):
+    """Delete an access rule"""
+    rule = db.session.get(CourseAccessRule, rule_id)
+    if rule is None:
+        raise click.ClickException(f'No rule {rule_id}')
+    db.session.delete(rule)
+    db.session.commit()
+    click.echo(f'Removed rule {rule_id}')
+
+
+def register_access_cli(app):
+    """Register the access rule commands on the Flask CLI"""
+    app.cli.add_command(access_cli)
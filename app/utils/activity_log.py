@@ -0,0 +1,130 @@
+import logging
+from datetime import date, datetime, time, timedelta
+import click
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+from .. import db
+from ..models import UserActivity, UserActivityArchive, ActivityDailyUser, ActivityDailyCourse
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_COLUMNS = ('id', 'user_id', 'activity_type', 'activity_data', 'lesson_id', 'course_id', 'created_at')
+
+
+def record_activity(user_id, activity_type, lesson=None, course_id=None, **data):
+    """Append an activity event to the session; the caller commits.
+
+    Extra keyword arguments become the JSON payload. When a lesson is
+    given its id, course and title are recorded with the event.
+    """
+    if lesson is not None:
+        data.setdefault('lesson_title', lesson.title)
+        course_id = course_id or lesson.course_id
+    activity = UserActivity(
+        user_id=user_id,
+        activity_type=activity_type,
+        lesson_id=lesson.id if lesson is not None else None,
+        course_id=course_id,
+        activity_data=data or None
+    )
+    db.session.add(activity)
+    return activity
+
+
+def prune_activity(retention_days, archive=True):
+    """Roll events older than the retention window into daily aggregates, then delete them.
+
+    Works one calendar day at a time, each in its own transaction, so a
+    large backlog never holds long locks. Returns (days, events) processed.
+    """
+    cutoff = datetime.combine(date.today() - timedelta(days=retention_days), time.min)
+    days = 0
+    events = 0
+    while True:
+        oldest = db.session.execute(
+            select(func.min(UserActivity.created_at)).where(UserActivity.created_at < cutoff)
+        ).scalar()
+        if oldest is None:
+            break
+        day_start = datetime.combine(oldest.date(), time.min)
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        events += _roll_up_window(day_start, day_end, archive)
+        db.session.commit()
+        days += 1
+    if days:
+        logger.info("Pruned %d activity events across %d days (archive=%s)", events, days, archive)
+    return days, events
+
+
+def _roll_up_window(start, end, archive):
+    in_window = (UserActivity.created_at >= start) & (UserActivity.created_at < end)
+    day = start.date()
+
+    user_counts = db.session.execute(
+        select(UserActivity.user_id, UserActivity.activity_type, func.count())
+        .where(in_window)
+        .group_by(UserActivity.user_id, UserActivity.activity_type)
+    ).all()
+    existing = {
+        (row.user_id, row.activity_type): row
+        for row in ActivityDailyUser.query.filter_by(day=day)
+    }
+    for user_id, activity_type, count in user_counts:
+        row = existing.get((user_id, activity_type))
+        if row is None:
+            db.session.add(ActivityDailyUser(day=day, user_id=user_id,
+                                             activity_type=activity_type, event_count=count))
+        else:
+            row.event_count += count
+
+    course_counts = db.session.execute(
+        select(UserActivity.course_id, UserActivity.activity_type,
+               func.count(), func.count(func.distinct(UserActivity.user_id)))
+        .where(in_window, UserActivity.course_id.isnot(None))
+        .group_by(UserActivity.course_id, UserActivity.activity_type)
+    ).all()
+    existing = {
+        (row.course_id, row.activity_type): row
+        for row in ActivityDailyCourse.query.filter_by(day=day)
+    }
+    for course_id, activity_type, count, users in course_counts:
+        row = existing.get((course_id, activity_type))
+        if row is None:
+            db.session.add(ActivityDailyCourse(day=day, course_id=course_id, activity_type=activity_type,
+                                               event_count=count, user_count=users))
+        else:
+            row.event_count += count
+            row.user_count += users
+
+    if archive:
+        columns = [getattr(UserActivity, name) for name in _ARCHIVE_COLUMNS]
+        db.session.execute(
+            insert(UserActivityArchive).from_select(list(_ARCHIVE_COLUMNS), select(*columns).where(in_window))
+        )
+    result = db.session.execute(
+        delete(UserActivity).where(in_window).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+@click.group('activity')
+def activity_cli():
+    """Maintain the user activity log"""
+
+
+@activity_cli.command('prune')
+@click.option('--days', type=int, default=None, help='Retention window in days (default ACTIVITY_RETENTION_DAYS).')
+@click.option('--archive/--no-archive', default=None, help='Copy pruned events to user_activities_archive.')
+def activity_prune(days, archive):
+    """Roll old activity into daily aggregates and remove it from the live table"""
+    if days is None:
+        days = current_app.config['ACTIVITY_RETENTION_DAYS']
+    if archive is None:
+        archive = current_app.config['ACTIVITY_ARCHIVE']
+    day_count, events = prune_activity(days, archive=archive)
+    click.echo(f"Rolled up {events} events from {day_count} days older than {days} days.")
+
+
+def register_activity_cli(app):
+    """Register activity log maintenance commands on the Flask CLI"""
+    app.cli.add_command(activity_cli)
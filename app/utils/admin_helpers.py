@@ -1,9 +1,22 @@
+import logging
 from ..models import User, UserInterest
 from .. import db
 
-def get_pending_users():
-    """Get users pending approval"""
-    return User.query.filter_by(is_approved=False, is_admin=False).all()
+logger = logging.getLogger(__name__)
+
+def get_admin_stats():
+    """Counts shown in the stat cards at the top of admin pages"""
+    from .catalog_cache import catalog_cache
+    from ..cache import cache, table_tag
+    user_counts = cache.memoize('admin:user_counts', lambda: {
+        'pending_users_count': User.query.filter_by(is_approved=False, is_admin=False).count(),
+        'users_count': User.query.filter_by(is_admin=False).count(),
+    }, tags=[table_tag(User.__tablename__)])
+    return {
+        **user_counts,
+        'courses_count': len(catalog_cache.courses()),
+        'interests_count': len(catalog_cache.interests())
+    }
 
 def approve_user(user_id, approved_by_id=None):
     """Approve a user"""
@@ -39,9 +52,6 @@ def grant_interest_access(user_id, interest_id):
     """Grant a user access to content related to an interest"""
     from flask_login import current_user
     from datetime import datetime
-    import logging
-    
-    logger = logging.getLogger(__name__)
     
     try:
         user_interest = UserInterest.query.filter_by(
@@ -61,19 +71,15 @@ def grant_interest_access(user_id, interest_id):
         user_interest.granted_by = current_user.id
         
         db.session.commit()
-        logger.info(f"Granted interest {interest_id} access to user {user_id}")
+        logger.info("Granted interest %s access to user %s", interest_id, user_id)
         return True
     except Exception as e:
-        logger.error(f"Error granting interest access: {str(e)}")
+        logger.error("Error granting interest access: %s", e)
         db.session.rollback()
         return False
 
 def revoke_interest_access(user_id, interest_id):
     """Revoke user access to an interest"""
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    
     try:
         user_interest = UserInterest.query.filter_by(
             user_id=user_id, 
@@ -83,10 +89,10 @@ def revoke_interest_access(user_id, interest_id):
         if user_interest:
             user_interest.access_granted = False
             db.session.commit()
-            logger.info(f"Revoked interest {interest_id} access from user {user_id}")
+            logger.info("Revoked interest %s access from user %s", interest_id, user_id)
             return True
         return False
     except Exception as e:
-        logger.error(f"Error revoking interest access: {str(e)}")
+        logger.error("Error revoking interest access: %s", e)
         db.session.rollback()
         return False
\ No newline at end of file
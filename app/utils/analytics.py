@@ -0,0 +1,195 @@
+import logging
+from datetime import date, datetime, time, timedelta
+import click
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+from .. import db
+from ..models import (User, Lesson, UserLessonProgress, UserActivity, CourseInterest,
+                      AnalyticsDailySignup, AnalyticsDailyCourse, AnalyticsDailyInterest,
+                      AnalyticsDailyDomain, AnalyticsRollupState)
+from .catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _signups(since):
+    day = func.date(User.created_at)
+    domain = func.coalesce(User.email_domain, '')
+    query = (select(day, domain, func.count())
+             .where(User.created_at.isnot(None), User.is_admin.is_(False))
+             .group_by(day, domain))
+    return query.where(User.created_at >= since) if since else query
+
+
+def _course_completions(since):
+    day = func.date(UserLessonProgress.completed_at)
+    query = (select(day, Lesson.course_id, func.count(), func.count(func.distinct(UserLessonProgress.user_id)))
+             .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+             .where(UserLessonProgress.completed_at.isnot(None))
+             .group_by(day, Lesson.course_id))
+    return query.where(UserLessonProgress.completed_at >= since) if since else query
+
+
+def _interest_completions(since):
+    day = func.date(UserLessonProgress.completed_at)
+    query = (select(day, CourseInterest.interest_id, func.count(),
+                    func.count(func.distinct(UserLessonProgress.user_id)))
+             .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+             .join(CourseInterest, CourseInterest.course_id == Lesson.course_id)
+             .where(UserLessonProgress.completed_at.isnot(None))
+             .group_by(day, CourseInterest.interest_id))
+    return query.where(UserLessonProgress.completed_at >= since) if since else query
+
+
+def _domain_activity(since):
+    day = func.date(UserActivity.created_at)
+    domain = func.coalesce(User.email_domain, '')
+    query = (select(day, domain, func.count(func.distinct(UserActivity.user_id)), func.count())
+             .join(User, User.id == UserActivity.user_id)
+             .where(UserActivity.created_at.isnot(None))
+             .group_by(day, domain))
+    return query.where(UserActivity.created_at >= since) if since else query
+
+
+# name -> (rollup model, target columns, source timestamp, select builder)
+ROLLUPS = {
+    'signups': (AnalyticsDailySignup, ('day', 'email_domain', 'signup_count'),
+                User.created_at, _signups),
+    'course_completions': (AnalyticsDailyCourse, ('day', 'course_id', 'lessons_completed', 'learner_count'),
+                           UserLessonProgress.completed_at, _course_completions),
+    'interest_completions': (AnalyticsDailyInterest, ('day', 'interest_id', 'lessons_completed', 'learner_count'),
+                             UserLessonProgress.completed_at, _interest_completions),
+    'domain_activity': (AnalyticsDailyDomain, ('day', 'email_domain', 'active_learners', 'event_count'),
+                        UserActivity.created_at, _domain_activity),
+}
+
+
+def run_rollups(full=False, lookback_days=None):
+    """Rebuild daily aggregates from each rollup's watermark through today.
+
+    Days from the watermark (less a lookback for late writes) onwards are
+    deleted and recomputed with one INSERT ... SELECT per rollup, so only
+    recent rows of the source tables are scanned. A full rebuild starts at
+    the oldest source row instead; days whose source rows were already
+    pruned keep their aggregates. Run from `flask analytics rollup` on a
+    schedule; requests only read the tables. Returns {name: first day rebuilt}.
+    """
+    if lookback_days is None:
+        lookback_days = current_app.config['ANALYTICS_LOOKBACK_DAYS']
+    today = date.today()
+    rebuilt = {}
+    for name, (model, columns, source_column, build) in ROLLUPS.items():
+        # Overlapping runs (a slow cron job and the next one) take turns per rollup
+        state = db.session.get(AnalyticsRollupState, name, with_for_update=True)
+        if state is None:
+            state = AnalyticsRollupState(name=name)
+            db.session.add(state)
+        if full or state.last_day is None:
+            oldest = db.session.execute(select(func.min(source_column))).scalar()
+            start = oldest.date() if oldest else today
+        else:
+            start = min(state.last_day, today) - timedelta(days=lookback_days)
+
+        db.session.execute(delete(model).where(model.day >= start))
+        db.session.execute(
+            insert(model).from_select(list(columns), build(datetime.combine(start, time.min)))
+        )
+        state.last_day = today
+        state.updated_at = datetime.utcnow()
+        db.session.commit()
+        rebuilt[name] = start
+    logger.info("Analytics rollups rebuilt from %s", rebuilt)
+    return rebuilt
+
+
+def rollups_stale(as_of):
+    """Whether rollups last rebuilt at ``as_of`` are older than ANALYTICS_REFRESH_SECONDS"""
+    max_age = timedelta(seconds=current_app.config['ANALYTICS_REFRESH_SECONDS'])
+    return as_of is None or datetime.utcnow() - as_of > max_age
+
+
+def dashboard_analytics(days=30):
+    """Summaries for the admin dashboard, read from the rollup tables only"""
+    since = date.today() - timedelta(days=days - 1)
+
+    signups_by_day = db.session.execute(
+        select(AnalyticsDailySignup.day, func.sum(AnalyticsDailySignup.signup_count))
+        .where(AnalyticsDailySignup.day >= since)
+        .group_by(AnalyticsDailySignup.day)
+        .order_by(AnalyticsDailySignup.day)
+    ).all()
+
+    users_by_domain = dict(db.session.execute(
+        select(AnalyticsDailySignup.email_domain, func.sum(AnalyticsDailySignup.signup_count))
+        .group_by(AnalyticsDailySignup.email_domain)
+    ).all())
+    activity_by_domain = db.session.execute(
+        select(AnalyticsDailyDomain.email_domain,
+               func.sum(AnalyticsDailyDomain.active_learners),
+               func.sum(AnalyticsDailyDomain.event_count))
+        .where(AnalyticsDailyDomain.day >= since)
+        .group_by(AnalyticsDailyDomain.email_domain)
+    ).all()
+    activity_by_domain = {domain: (learner_days, events) for domain, learner_days, events in activity_by_domain}
+    domains = [
+        {
+            'domain': domain or 'unknown',
+            'users': users_by_domain.get(domain, 0),
+            'learner_days': activity_by_domain.get(domain, (0, 0))[0],
+            'events': activity_by_domain.get(domain, (0, 0))[1],
+        }
+        for domain in sorted(set(users_by_domain) | set(activity_by_domain))
+    ]
+
+    courses = catalog_cache.courses()
+    course_rows = db.session.execute(
+        select(AnalyticsDailyCourse.course_id, func.sum(AnalyticsDailyCourse.lessons_completed))
+        .where(AnalyticsDailyCourse.day >= since)
+        .group_by(AnalyticsDailyCourse.course_id)
+        .order_by(func.sum(AnalyticsDailyCourse.lessons_completed).desc())
+    ).all()
+    completions_by_course = [
+        (courses[course_id].title, completed) for course_id, completed in course_rows if course_id in courses
+    ]
+
+    interest_names = {interest.id: interest.name for interest in catalog_cache.interests()}
+    interest_rows = db.session.execute(
+        select(AnalyticsDailyInterest.interest_id, func.sum(AnalyticsDailyInterest.lessons_completed))
+        .where(AnalyticsDailyInterest.day >= since)
+        .group_by(AnalyticsDailyInterest.interest_id)
+        .order_by(func.sum(AnalyticsDailyInterest.lessons_completed).desc())
+    ).all()
+    completions_by_interest = [
+        (interest_names[interest_id], completed)
+        for interest_id, completed in interest_rows if interest_id in interest_names
+    ]
+
+    as_of = db.session.execute(select(func.min(AnalyticsRollupState.updated_at))).scalar()
+    return {
+        'days': days,
+        'as_of': as_of,
+        'signups_by_day': signups_by_day,
+        'domains': domains,
+        'completions_by_course': completions_by_course,
+        'completions_by_interest': completions_by_interest,
+    }
+
+
+@click.group('analytics')
+def analytics_cli():
+    """Maintain the admin dashboard analytics rollups"""
+
+
+@analytics_cli.command('rollup')
+@click.option('--full', is_flag=True, help='Rebuild from the oldest source row instead of the watermark.')
+@click.option('--lookback', type=int, default=None, help='Days before the watermark to recompute (default ANALYTICS_LOOKBACK_DAYS).')
+def analytics_rollup(full, lookback):
+    """Bring the daily analytics tables up to date"""
+    rebuilt = run_rollups(full=full, lookback_days=lookback)
+    for name, start in rebuilt.items():
+        click.echo(f"{name}: rebuilt from {start}")
+
+
+def register_analytics_cli(app):
+    """Register analytics rollup commands on the Flask CLI"""
+    app.cli.add_command(analytics_cli)
@@ -0,0 +1,39 @@
+from sqlalchemy import select, insert, delete
+from .. import db
+
+
+def sync_association(owner_column, owner_id, target_column, selected_ids, scope=None, **new_row_values):
+    """Make the association rows of one owner match a selection; the caller commits.
+
+    Computes the set difference against the stored rows and applies it as
+    at most one DELETE and one multi-row INSERT. Rows present in both are
+    not touched, so their other columns (grant state, timestamps) survive
+    and nothing is written, or invalidated, when the selection is unchanged.
+    When ``scope`` is given, only targets in it are added or removed;
+    rows for other targets (ones the form did not offer) are kept.
+    ``new_row_values`` are extra column values for inserted rows.
+    Returns (added ids, removed ids).
+    """
+    model = owner_column.class_
+    current = set(db.session.execute(
+        select(target_column).where(owner_column == owner_id)
+    ).scalars())
+    selected = {int(target_id) for target_id in selected_ids}
+    if scope is not None:
+        scope = set(scope)
+        current &= scope
+        selected &= scope
+    added = selected - current
+    removed = current - selected
+
+    if removed:
+        db.session.execute(
+            delete(model).where(owner_column == owner_id, target_column.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    if added:
+        db.session.execute(insert(model), [
+            {owner_column.key: owner_id, target_column.key: target_id, **new_row_values}
+            for target_id in sorted(added)
+        ])
+    return added, removed
@@ -1,15 +1,21 @@
-import pyotp
-import qrcode
 import io
 import base64
+import logging
 from ..config import Config
 
+logger = logging.getLogger(__name__)
+
+# pyotp and qrcode are imported inside the helpers so they only load in
+# workers that actually serve registration or 2FA requests
+
 def generate_otp_secret():
     """Generate a new OTP secret for 2FA"""
+    import pyotp
     return pyotp.random_base32()
 
 def verify_totp(secret, token):
     """Verify a TOTP token"""
+    import pyotp
     try:
         totp = pyotp.TOTP(secret)
         return totp.verify(token, valid_window=1)
@@ -18,6 +24,8 @@ def verify_totp(secret, token):
 
 def generate_qr_code(username, secret):
     """Generate QR code for 2FA setup"""
+    import pyotp
+    import qrcode
     try:
         totp_uri = pyotp.totp.TOTP(secret).provisioning_uri(
             name=username,
@@ -37,7 +45,7 @@ def generate_qr_code(username, secret):
         
         return img_str
     except Exception as e:
-        print(f"Error generating QR code: {e}")
+        logger.error("Error generating QR code: %s", e)
         return None
 
 def get_domain_access_info(email):
@@ -0,0 +1,232 @@
+import logging
+import threading
+from dataclasses import dataclass, field, replace
+from flask import g, has_app_context
+from sqlalchemy import event, select, update
+from .. import db
+from ..models import Interest, Course, CourseInterest, CourseAccessRule, CatalogVersion
+from ..metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Models whose changes invalidate the catalog
+CATALOG_MODELS = (Interest, Course, CourseInterest, CourseAccessRule)
+CATALOG_TABLES = frozenset(model.__tablename__ for model in CATALOG_MODELS)
+
+
+@dataclass(frozen=True, slots=True)
+class InterestRecord:
+    """Read-only snapshot of an Interest row"""
+    id: int
+    name: str
+    description: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class AccessRuleRecord:
+    """Read-only snapshot of a CourseAccessRule row"""
+    id: int
+    course_id: int | None
+    interest_id: int | None
+    email_domain: str | None
+    access_level: str | None
+    picker_only: bool
+
+
+@dataclass(frozen=True, slots=True)
+class CourseSummary:
+    """Read-only snapshot of a course header, its interest mapping and access rules"""
+    id: int
+    title: str
+    interest_ids: frozenset[int]
+    # Rules on the course itself and on its interests, except picker-only ones
+    rules: tuple[AccessRuleRecord, ...]
+
+    @property
+    def restricted(self):
+        return bool(self.rules)
+
+    @property
+    def allowed_domains(self):
+        return frozenset(rule.email_domain for rule in self.rules if rule.email_domain)
+
+
+@dataclass(frozen=True, slots=True)
+class _CatalogState:
+    """Everything one load produced; swapped in as a whole so readers never mix loads"""
+    version: int | None = None
+    interests: tuple[InterestRecord, ...] = ()
+    courses: dict = field(default_factory=dict)
+    interest_rules: dict = field(default_factory=dict)
+
+
+class CatalogCache:
+    """Read-through, per-process cache of interests and course headers.
+
+    Every worker keeps its own copy and compares it against the shared
+    version stamp in the ``catalog_version`` table once per request.
+    Commits touching interests, courses or course-interest mappings bump
+    that stamp in the same transaction, so all workers reload on their
+    next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _CatalogState()
+
+    def init_app(self, app):
+        app.extensions['catalog_cache'] = self
+        if not event.contains(db.session, 'before_commit', _bump_version_if_dirty):
+            event.listen(db.session, 'before_flush', _track_flush)
+            event.listen(db.session, 'do_orm_execute', _track_bulk_statement)
+            event.listen(db.session, 'before_commit', _bump_version_if_dirty)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', _clear_dirty_flag)
+
+    def interests(self):
+        """Return all interests as a tuple of InterestRecord ordered by id"""
+        return self._current().interests
+
+    def interest_choices(self, exclude_names=()):
+        """Return (id, name) pairs suitable for a SelectMultipleField"""
+        return [(i.id, i.name) for i in self.interests() if i.name not in exclude_names]
+
+    def courses(self):
+        """Return a mapping of course id to CourseSummary"""
+        return self._current().courses
+
+    def course(self, course_id):
+        """Return the CourseSummary for a course id, or None"""
+        return self.courses().get(course_id)
+
+    def interest_rules(self):
+        """Return a mapping of interest id to the access rules targeting it"""
+        return self._current().interest_rules
+
+    def invalidate(self):
+        """Drop this worker's copy; the next read reloads from the database"""
+        with self._lock:
+            # Readers keep the old data until the reload replaces it
+            self._state = replace(self._state, version=None)
+
+    def _after_commit(self, session):
+        if session.info.pop('catalog_dirty', False):
+            self.invalidate()
+            if has_app_context():
+                g.pop('catalog_version', None)
+
+    def _current(self):
+        """The loaded state, reloaded first if the shared version moved on"""
+        version = _shared_version()
+        state = self._state
+        if version == state.version:
+            CACHE_REQUESTS.inc('catalog', 'hit')
+            return state
+        CACHE_REQUESTS.inc('catalog', 'miss')
+        with self._lock:
+            if version != self._state.version:
+                self._state = self._load(version)
+            return self._state
+
+    def _load(self, version):
+        interest_rows = db.session.execute(
+            select(Interest.id, Interest.name, Interest.description).order_by(Interest.id)
+        ).all()
+        mapping_rows = db.session.execute(
+            select(CourseInterest.course_id, CourseInterest.interest_id)
+        ).all()
+        course_rows = db.session.execute(
+            select(Course.id, Course.title).order_by(Course.id)
+        ).all()
+        rule_rows = db.session.execute(
+            select(CourseAccessRule.id, CourseAccessRule.course_id, CourseAccessRule.interest_id,
+                   CourseAccessRule.email_domain, CourseAccessRule.access_level,
+                   CourseAccessRule.picker_only).order_by(CourseAccessRule.id)
+        ).all()
+
+        interest_ids_by_course = {}
+        for course_id, interest_id in mapping_rows:
+            interest_ids_by_course.setdefault(course_id, set()).add(interest_id)
+
+        rules_by_course, rules_by_interest = {}, {}
+        for *columns, picker_only in rule_rows:
+            rule = AccessRuleRecord(*columns, picker_only=bool(picker_only))
+            if rule.course_id is not None:
+                rules_by_course.setdefault(rule.course_id, []).append(rule)
+            else:
+                rules_by_interest.setdefault(rule.interest_id, []).append(rule)
+
+        def course_rules(course_id, interest_ids):
+            rules = list(rules_by_course.get(course_id, ()))
+            for interest_id in sorted(interest_ids):
+                rules.extend(rule for rule in rules_by_interest.get(interest_id, ()) if not rule.picker_only)
+            return tuple(rules)
+
+        courses = {}
+        for course_id, title in course_rows:
+            interest_ids = frozenset(interest_ids_by_course.get(course_id, ()))
+            courses[course_id] = CourseSummary(
+                id=course_id,
+                title=title,
+                interest_ids=interest_ids,
+                rules=course_rules(course_id, interest_ids)
+            )
+        return _CatalogState(
+            version=version,
+            interests=tuple(InterestRecord(*row) for row in interest_rows),
+            courses=courses,
+            interest_rules={interest_id: tuple(rules) for interest_id, rules in rules_by_interest.items()},
+        )
+
+
+def _shared_version():
+    """Read the shared version stamp, at most once per request"""
+    if 'catalog_version' not in g:
+        g.catalog_version = db.session.execute(
+            select(CatalogVersion.version).where(CatalogVersion.id == 1)
+        ).scalar() or 0
+    return g.catalog_version
+
+
+def _track_flush(session, flush_context, instances):
+    if session.info.get('catalog_dirty'):
+        return
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info['catalog_dirty'] = True
+            return
+    # session.dirty also lists objects whose attributes were set to their current value
+    for obj in session.dirty:
+        if isinstance(obj, CATALOG_MODELS) and session.is_modified(obj, include_collections=False):
+            session.info['catalog_dirty'] = True
+            return
+
+
+def _track_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and table.name in CATALOG_TABLES:
+        orm_execute_state.session.info['catalog_dirty'] = True
+
+
+def _bump_version_if_dirty(session):
+    # Objects still pending here are flushed after this hook runs
+    _track_flush(session, None, None)
+    if not session.info.get('catalog_dirty'):
+        return
+    # The stamp row is seeded by schema migration 11
+    result = session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        logger.warning("catalog_version has no row; run 'flask schema upgrade' so workers see catalog changes")
+
+
+def _clear_dirty_flag(session):
+    session.info.pop('catalog_dirty', None)
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,219 @@
+import logging
+from datetime import datetime
+import click
+from sqlalchemy import select, update, func, case, exists
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import User, Lesson, UserCourse, UserLessonProgress, UserCourseProgress
+
+logger = logging.getLogger(__name__)
+
+# Lesson statuses with a counter column on user_course_progress
+COUNTED_STATUSES = {
+    'completed': 'completed_lessons',
+    'in_progress': 'in_progress_lessons',
+}
+
+
+def _status_count(status):
+    return func.coalesce(func.sum(case((UserLessonProgress.status == status, 1), else_=0)), 0)
+
+
+def _insert_counters(user_id, course_id, at):
+    """Create a counter row from the user's existing progress in the course"""
+    completed, in_progress = db.session.execute(
+        select(_status_count('completed'), _status_count('in_progress'))
+        .select_from(UserLessonProgress)
+        .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+        .where(UserLessonProgress.user_id == user_id, Lesson.course_id == course_id)
+    ).one()
+    total = db.session.execute(select(func.count()).where(Lesson.course_id == course_id)).scalar()
+    db.session.add(UserCourseProgress(
+        user_id=user_id, course_id=course_id, completed_lessons=completed,
+        in_progress_lessons=in_progress, total_lessons=total, last_activity_at=at
+    ))
+
+
+def record_status_change(user_id, course_id, old_status, new_status, at=None):
+    """Apply one lesson's status change to the user's counters for its course.
+
+    Runs in the caller's transaction, so the counters commit or roll back
+    together with the user_lesson_progress row. Returns the course
+    completion flag after the change.
+    """
+    at = at or datetime.utcnow()
+    deltas = {}
+    if old_status in COUNTED_STATUSES:
+        deltas[COUNTED_STATUSES[old_status]] = -1
+    if new_status in COUNTED_STATUSES:
+        column = COUNTED_STATUSES[new_status]
+        deltas[column] = deltas.get(column, 0) + 1
+    values = {name: getattr(UserCourseProgress, name) + delta for name, delta in deltas.items() if delta}
+    statement = (update(UserCourseProgress)
+                 .where(UserCourseProgress.user_id == user_id, UserCourseProgress.course_id == course_id)
+                 .values(last_activity_at=at, **values)
+                 .execution_options(synchronize_session=False))
+
+    if db.session.execute(statement).rowcount == 0:
+        # First progress in this course: count what is already there,
+        # including the caller's pending change
+        db.session.flush()
+        try:
+            with db.session.begin_nested():
+                _insert_counters(user_id, course_id, at)
+        except IntegrityError:
+            # Another request created the row first; apply the delta to it
+            db.session.execute(statement)
+    return _sync_enrollment(user_id, course_id)
+
+
+def _sync_enrollment(user_id, course_id):
+    """Create or update the user_course row and its completed flag"""
+    completed, total = db.session.execute(
+        select(UserCourseProgress.completed_lessons, UserCourseProgress.total_lessons)
+        .where(UserCourseProgress.user_id == user_id, UserCourseProgress.course_id == course_id)
+    ).one()
+    done = total > 0 and completed >= total
+    enrollment = db.session.get(UserCourse, (user_id, course_id))
+    if enrollment is None:
+        db.session.add(UserCourse(user_id=user_id, course_id=course_id, completed=done))
+    elif bool(enrollment.completed) != done:
+        enrollment.completed = done
+    return done
+
+
+def sync_course_completion(course_id=None, user_ids=None):
+    """Recompute user_course.completed from the counters in one UPDATE"""
+    complete = exists().where(
+        UserCourseProgress.user_id == UserCourse.user_id,
+        UserCourseProgress.course_id == UserCourse.course_id,
+        UserCourseProgress.total_lessons > 0,
+        UserCourseProgress.completed_lessons >= UserCourseProgress.total_lessons,
+    )
+    statement = update(UserCourse).values(completed=complete).execution_options(synchronize_session=False)
+    if course_id is not None:
+        statement = statement.where(UserCourse.course_id == course_id)
+    if user_ids is not None:
+        statement = statement.where(UserCourse.user_id.in_(user_ids))
+    db.session.execute(statement)
+
+
+def lessons_added(course_id, count=1):
+    """Raise the course's lesson total for every learner with counters in it"""
+    db.session.execute(
+        update(UserCourseProgress)
+        .where(UserCourseProgress.course_id == course_id)
+        .values(total_lessons=UserCourseProgress.total_lessons + count)
+        .execution_options(synchronize_session=False)
+    )
+    sync_course_completion(course_id)
+
+
+def lesson_removed(lesson):
+    """Take a lesson out of its course's counters; call before deleting it.
+
+    The lesson's progress rows are removed by the database cascade, so each
+    learner's counters drop by whatever status they had on it.
+    """
+    def removed(status):
+        return (select(func.count())
+                .where(UserLessonProgress.lesson_id == lesson.id,
+                       UserLessonProgress.user_id == UserCourseProgress.user_id,
+                       UserLessonProgress.status == status)
+                .scalar_subquery())
+
+    db.session.execute(
+        update(UserCourseProgress)
+        .where(UserCourseProgress.course_id == lesson.course_id)
+        .values(total_lessons=UserCourseProgress.total_lessons - 1,
+                completed_lessons=UserCourseProgress.completed_lessons - removed('completed'),
+                in_progress_lessons=UserCourseProgress.in_progress_lessons - removed('in_progress'))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def course_progress(user_id, course_ids):
+    """Return {course_id: UserCourseProgress} for the courses the user has started"""
+    if not course_ids:
+        return {}
+    rows = UserCourseProgress.query.filter(
+        UserCourseProgress.user_id == user_id,
+        UserCourseProgress.course_id.in_(list(course_ids))
+    ).all()
+    return {row.course_id: row for row in rows}
+
+
+def reconcile_progress(batch_size=500):
+    """Recount the counters from user_lesson_progress in user-id batches.
+
+    Missing rows are created and drifted counts corrected; each batch is
+    committed on its own. Returns the number of rows repaired.
+    """
+    repaired = 0
+    last_user_id = 0
+    totals = dict(db.session.execute(select(Lesson.course_id, func.count()).group_by(Lesson.course_id)).all())
+    while True:
+        user_ids = db.session.execute(
+            select(User.id).where(User.id > last_user_id).order_by(User.id).limit(batch_size)
+        ).scalars().all()
+        if not user_ids:
+            break
+        source = {
+            (user_id, course_id): (completed, in_progress, last_activity)
+            for user_id, course_id, completed, in_progress, last_activity in db.session.execute(
+                select(UserLessonProgress.user_id, Lesson.course_id, _status_count('completed'),
+                       _status_count('in_progress'), func.max(UserLessonProgress.last_interaction))
+                .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+                .where(UserLessonProgress.user_id.in_(user_ids))
+                .group_by(UserLessonProgress.user_id, Lesson.course_id)
+            )
+        }
+        stored = {
+            (row.user_id, row.course_id): row
+            for row in UserCourseProgress.query.filter(UserCourseProgress.user_id.in_(user_ids))
+        }
+        enrolled = set(db.session.execute(
+            select(UserCourse.user_id, UserCourse.course_id).where(UserCourse.user_id.in_(user_ids))
+        ).all())
+
+        for key in source.keys() | stored.keys():
+            completed, in_progress, last_activity = source.get(key, (0, 0, None))
+            expected = (completed, in_progress, totals.get(key[1], 0))
+            row = stored.get(key)
+            if row is None:
+                db.session.add(UserCourseProgress(
+                    user_id=key[0], course_id=key[1], completed_lessons=expected[0],
+                    in_progress_lessons=expected[1], total_lessons=expected[2], last_activity_at=last_activity
+                ))
+            elif (row.completed_lessons, row.in_progress_lessons, row.total_lessons) != expected:
+                row.completed_lessons, row.in_progress_lessons, row.total_lessons = expected
+            else:
+                continue
+            repaired += 1
+        for user_id, course_id in source.keys() - enrolled:
+            db.session.add(UserCourse(user_id=user_id, course_id=course_id))
+        db.session.flush()
+        sync_course_completion(user_ids=user_ids)
+        db.session.commit()
+        last_user_id = user_ids[-1]
+    if repaired:
+        logger.warning("Repaired %d user course progress rows", repaired)
+    return repaired
+
+
+@click.group('progress')
+def progress_cli():
+    """Maintain the per-course progress counters"""
+
+
+@progress_cli.command('reconcile')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Users recounted per transaction.')
+def progress_reconcile(batch_size):
+    """Recount course progress counters and fix any drift"""
+    repaired = reconcile_progress(batch_size=batch_size)
+    click.echo(f"Repaired {repaired} course progress rows.")
+
+
+def register_progress_cli(app):
+    """Register course progress commands on the Flask CLI"""
+    app.cli.add_command(progress_cli)
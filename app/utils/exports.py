@@ -0,0 +1,102 @@
+import io
+import csv
+import json
+from datetime import datetime
+from flask import Response, stream_with_context
+from sqlalchemy import select, tuple_
+from .. import db
+from ..models import User, Lesson, UserLessonProgress, UserActivity
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+BATCH_SIZE = 1000
+
+
+def _users(filters, after):
+    query = select(User.id, User.username, User.email, User.email_domain, User.access_level,
+                   User.is_approved, User.is_2fa_enabled, User.created_at).where(*filters.conditions())
+    if after:
+        query = query.where(User.id > int(after))
+    return query.order_by(User.id), lambda row: str(row.id)
+
+
+def _progress(filters, after):
+    query = (select(UserLessonProgress.user_id, User.username, User.email, UserLessonProgress.lesson_id,
+                    Lesson.title.label('lesson_title'), Lesson.course_id, UserLessonProgress.status,
+                    UserLessonProgress.started_at, UserLessonProgress.completed_at,
+                    UserLessonProgress.last_interaction)
+             .join(User, User.id == UserLessonProgress.user_id)
+             .join(Lesson, Lesson.id == UserLessonProgress.lesson_id)
+             .where(*filters.conditions()))
+    if after:
+        user_id, _, lesson_id = after.partition(':')
+        query = query.where(tuple_(UserLessonProgress.user_id, UserLessonProgress.lesson_id)
+                            > tuple_(int(user_id), int(lesson_id or 0)))
+    query = query.order_by(UserLessonProgress.user_id, UserLessonProgress.lesson_id)
+    return query, lambda row: f'{row.user_id}:{row.lesson_id}'
+
+
+def _activity(filters, after):
+    query = (select(UserActivity.id, UserActivity.user_id, User.username, UserActivity.activity_type,
+                    UserActivity.lesson_id, UserActivity.course_id, UserActivity.created_at,
+                    UserActivity.activity_data)
+             .join(User, User.id == UserActivity.user_id)
+             .where(*filters.conditions()))
+    if after:
+        query = query.where(UserActivity.id > int(after))
+    return query.order_by(UserActivity.id), lambda row: str(row.id)
+
+
+# name -> builder(filters, after) returning (ordered select, row -> resume cursor)
+EXPORTS = {
+    'users': _users,
+    'progress': _progress,
+    'activity': _activity,
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _stream(query, cursor_of, fmt):
+    """Yield the export one batch at a time from a server-side cursor.
+
+    Every row carries a ``cursor`` column; passing the last one received
+    back as ``after`` resumes an interrupted export where it stopped.
+    """
+    result = db.session.execute(query.execution_options(yield_per=BATCH_SIZE))
+    columns = list(result.keys()) + ['cursor']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    try:
+        for batch in result.partitions():
+            for row in batch:
+                values = [_value(value) for value in row] + [cursor_of(row)]
+                if writer:
+                    writer.writerow([json.dumps(v) if isinstance(v, (dict, list)) else v for v in values])
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values)), default=str))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if writer and buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        result.close()
+
+
+def export_response(name, fmt, filters, after=None):
+    """Stream one of EXPORTS as CSV or NDJSON without loading it into memory"""
+    query, cursor_of = EXPORTS[name](filters, after)
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(_stream(query, cursor_of, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,71 @@
+import json
+import hashlib
+from datetime import date, datetime
+from flask import current_app, request
+from werkzeug.exceptions import BadRequest
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Serialize to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """JSON response with a body-hash ETag; a matching If-None-Match gets a 304"""
+    body = dumps(payload)
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+        # Per-user content: clients revalidate every time, shared caches never store it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        response.make_conditional(request)
+    return response
+
+
+def requested_fields(available, default):
+    """Field names from ``?fields=a,b``, in the order given, or ``default``"""
+    raw = request.args.get('fields')
+    if not raw:
+        return tuple(default)
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown) or raw}. "
+                         f"Available: {', '.join(available)}")
+    return fields
+
+
+def page_limit():
+    """``?limit=`` clamped to API_MAX_PAGE_SIZE, defaulting to API_PAGE_SIZE"""
+    limit = request.args.get('limit', type=int) or current_app.config['API_PAGE_SIZE']
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def int_cursor(parts=1):
+    """Decode ``?after=`` as ``parts`` colon-separated integers, or None"""
+    raw = request.args.get('after')
+    if not raw:
+        return None
+    try:
+        values = tuple(int(value) for value in raw.split(':'))
+    except ValueError:
+        values = ()
+    if len(values) != parts:
+        raise BadRequest('Invalid cursor')
+    return values if parts > 1 else values[0]
@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import select, delete
+from .. import db
+from ..models import Lesson, UserLessonProgress, UserNote, UserBookmark, ClientEventReceipt
+from .activity_log import record_activity
+from .course_helpers import accessible_course_ids
+from .course_progress import record_status_change
+
+EVENT_TYPES = ('progress', 'complete', 'bookmark', 'note')
+PROGRESS_STATUSES = ('not_started', 'in_progress')
+# Client clocks are trusted only this far into the past
+MAX_EVENT_AGE = timedelta(days=1)
+
+
+class EventBatchError(ValueError):
+    """The batch as a whole is malformed"""
+
+
+def mark_progress(user_id, lesson, progress, status='in_progress', at=None):
+    """Record a progress status for a lesson; completed lessons keep their status.
+
+    ``progress`` is the user's existing row for the lesson, or None. Returns
+    (progress row, course completed flag).
+    """
+    at = at or datetime.utcnow()
+    old_status = progress.status if progress else None
+    if not progress:
+        progress = UserLessonProgress(
+            user_id=user_id,
+            lesson_id=lesson.id,
+            status=status,
+            started_at=at if status == 'in_progress' else None,
+            last_interaction=at
+        )
+        db.session.add(progress)
+
+        # Log activity for first time starting
+        if status == 'in_progress':
+            record_activity(user_id, 'lesson_started', lesson=lesson)
+    elif progress.status != 'completed':
+        progress.status = status
+        progress.last_interaction = at
+        if status == 'in_progress' and not progress.started_at:
+            progress.started_at = at
+
+    course_completed = record_status_change(user_id, lesson.course_id, old_status, progress.status, at=at)
+    return progress, course_completed
+
+
+def mark_complete(user_id, lesson, progress, at=None):
+    """Mark a lesson completed; returns (progress row, course completed flag)"""
+    at = at or datetime.utcnow()
+    old_status = progress.status if progress else None
+    if not progress:
+        progress = UserLessonProgress(
+            user_id=user_id,
+            lesson_id=lesson.id,
+            status='completed',
+            started_at=at,
+            completed_at=at
+        )
+        db.session.add(progress)
+    else:
+        progress.status = 'completed'
+        progress.completed_at = at
+
+    course_completed = record_status_change(user_id, lesson.course_id, old_status, 'completed', at=at)
+    record_activity(user_id, 'lesson_completed', lesson=lesson)
+    return progress, course_completed
+
+
+def set_bookmark(user_id, lesson, bookmark, wanted=None):
+    """Add or remove a bookmark; ``wanted=None`` toggles. Returns the bookmark row or None."""
+    if wanted is None:
+        wanted = bookmark is None
+    if bookmark is not None and not wanted:
+        db.session.delete(bookmark)
+        record_activity(user_id, 'bookmark_removed', lesson=lesson)
+        return None
+    if bookmark is None and wanted:
+        bookmark = UserBookmark(user_id=user_id, lesson_id=lesson.id)
+        db.session.add(bookmark)
+        record_activity(user_id, 'bookmark_added', lesson=lesson)
+    return bookmark
+
+
+def add_note(user_id, lesson, note_text):
+    """Add a note to a lesson; the caller commits"""
+    note = UserNote(user_id=user_id, lesson_id=lesson.id, note_text=note_text)
+    db.session.add(note)
+    record_activity(user_id, 'note_added', lesson=lesson)
+    return note
+
+
+def _event_time(raw, now):
+    """Client timestamp (epoch milliseconds or ISO 8601) clamped to the accepted window"""
+    if raw is None:
+        return now
+    try:
+        if isinstance(raw, (int, float)):
+            at = datetime.fromtimestamp(raw / 1000, timezone.utc).replace(tzinfo=None)
+        else:
+            at = datetime.fromisoformat(str(raw).replace('Z', '+00:00'))
+            if at.tzinfo is not None:
+                at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        return now
+    return min(max(at, now - MAX_EVENT_AGE), now)
+
+
+def _validate(events, batch_max):
+    if not isinstance(events, list):
+        raise EventBatchError('events must be a list')
+    if len(events) > batch_max:
+        raise EventBatchError(f'At most {batch_max} events per request')
+    keys = set()
+    for event in events:
+        if not isinstance(event, dict):
+            raise EventBatchError('each event must be an object')
+        key = event.get('key')
+        if not isinstance(key, str) or not 0 < len(key) <= 64:
+            raise EventBatchError('each event needs a key of 1-64 characters')
+        if key in keys:
+            raise EventBatchError(f'duplicate key in batch: {key}')
+        keys.add(key)
+
+
+def _lesson_id(event):
+    lesson_id = event.get('lesson_id')
+    return lesson_id if isinstance(lesson_id, int) and not isinstance(lesson_id, bool) else None
+
+
+def ingest_events(user, events):
+    """Apply an ordered batch of learner events in one transaction.
+
+    Each event is ``{"key", "type", "lesson_id", "at", ...}`` where ``key``
+    is a client-generated idempotency key. Events already applied under the
+    same key return their stored result with ``"duplicate": true``. Access
+    is checked once per distinct course, and lessons, progress rows and
+    bookmarks are loaded up front. Returns one result dict per event, in
+    order; the caller commits.
+    """
+    _validate(events, current_app.config['EVENT_BATCH_MAX'])
+    if not events:
+        return []
+    now = datetime.utcnow()
+
+    # Receipts past the retention window are dropped as the user's batches arrive
+    retention = timedelta(hours=current_app.config['EVENT_RECEIPT_HOURS'])
+    db.session.execute(
+        delete(ClientEventReceipt)
+        .where(ClientEventReceipt.user_id == user.id, ClientEventReceipt.created_at < now - retention)
+        .execution_options(synchronize_session=False)
+    )
+    receipts = dict(db.session.execute(
+        select(ClientEventReceipt.idempotency_key, ClientEventReceipt.result)
+        .where(ClientEventReceipt.user_id == user.id,
+               ClientEventReceipt.idempotency_key.in_([event['key'] for event in events]))
+    ).all())
+
+    lesson_ids = {_lesson_id(event) for event in events} - {None}
+    lessons = {
+        lesson.id: lesson
+        for lesson in (Lesson.summary_query().filter(Lesson.id.in_(lesson_ids)).all() if lesson_ids else ())
+    }
+    allowed_courses = accessible_course_ids(user, {lesson.course_id for lesson in lessons.values()})
+    progress_rows = {
+        row.lesson_id: row for row in UserLessonProgress.query.filter(
+            UserLessonProgress.user_id == user.id, UserLessonProgress.lesson_id.in_(list(lessons))
+        )
+    } if lessons else {}
+    bookmarks = {
+        row.lesson_id: row for row in UserBookmark.query.filter(
+            UserBookmark.user_id == user.id, UserBookmark.lesson_id.in_(list(lessons))
+        )
+    } if lessons else {}
+
+    results = []
+    for event in events:
+        key = event['key']
+        if key in receipts:
+            results.append(dict(receipts[key], duplicate=True))
+            continue
+        lesson = lessons.get(_lesson_id(event))
+        if event.get('type') not in EVENT_TYPES:
+            result = {'key': key, 'ok': False, 'error': 'unknown event type'}
+        elif lesson is None:
+            result = {'key': key, 'ok': False, 'error': 'lesson not found'}
+        elif lesson.course_id not in allowed_courses:
+            result = {'key': key, 'ok': False, 'error': 'access denied'}
+        else:
+            result = _apply(user.id, event, lesson, _event_time(event.get('at'), now), progress_rows, bookmarks)
+        if result['ok']:
+            # Rejected events are not stored, so a corrected retry can reuse the key
+            db.session.add(ClientEventReceipt(user_id=user.id, idempotency_key=key, result=result, created_at=now))
+        results.append(result)
+    return results
+
+
+def _apply(user_id, event, lesson, at, progress_rows, bookmarks):
+    key = event['key']
+    event_type = event['type']
+    if event_type == 'progress':
+        status = event.get('status', 'in_progress')
+        if status not in PROGRESS_STATUSES:
+            return {'key': key, 'ok': False, 'error': 'invalid status'}
+        progress, course_completed = mark_progress(user_id, lesson, progress_rows.get(lesson.id), status, at)
+        progress_rows[lesson.id] = progress
+        return {'key': key, 'ok': True, 'status': progress.status, 'course_completed': course_completed}
+
+    if event_type == 'complete':
+        progress, course_completed = mark_complete(user_id, lesson, progress_rows.get(lesson.id), at)
+        progress_rows[lesson.id] = progress
+        return {'key': key, 'ok': True, 'status': 'completed', 'course_completed': course_completed}
+
+    if event_type == 'bookmark':
+        wanted = event.get('bookmarked')
+        if wanted is not None and not isinstance(wanted, bool):
+            return {'key': key, 'ok': False, 'error': 'bookmarked must be true or false'}
+        bookmarks[lesson.id] = set_bookmark(user_id, lesson, bookmarks.get(lesson.id), wanted)
+        return {'key': key, 'ok': True, 'is_bookmarked': bookmarks[lesson.id] is not None}
+
+    note_text = event.get('note_text')
+    note_text = note_text.strip() if isinstance(note_text, str) else ''
+    if not note_text:
+        return {'key': key, 'ok': False, 'error': 'Note text cannot be empty'}
+    note = add_note(user_id, lesson, note_text)
+    db.session.flush()
+    return {'key': key, 'ok': True, 'note_id': note.id}
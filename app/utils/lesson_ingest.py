@@ -0,0 +1,170 @@
+import io
+import os
+import re
+import logging
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import click
+from sqlalchemy import select, insert, func
+from .. import db
+from ..models import Course, Lesson
+from .lesson_render import render_lesson_html, content_hash, backfill_rendered
+from .course_progress import lessons_added
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+DEFAULT_MAX_CHARS = 8000
+
+
+def collect_documents(source):
+    """Return (name, payload) pairs for the supported files in a zip or directory.
+
+    Files are ordered by their relative path, which becomes the lesson
+    order. A payload is the file's bytes for zip members and its path for
+    directory entries, so large directories are read inside the workers.
+    """
+    documents = []
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    documents.append((info.filename, archive.read(info)))
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for filename in files:
+                if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    documents.append((os.path.relpath(path, source), path))
+    else:
+        raise ValueError(f"{source} is neither a zip file nor a directory")
+    return sorted(documents, key=lambda document: document[0])
+
+
+def _extract(document):
+    """Process-pool worker: extract and summarise one document"""
+    from ..document_analysis import extract_text, generate_summary
+    name, payload = document
+    if isinstance(payload, str):
+        with open(payload, 'rb') as handle:
+            payload = handle.read()
+    text = extract_text(io.BytesIO(payload), name)
+    if not text or not text.strip():
+        return name, None, None
+    return name, text, generate_summary(text)
+
+
+def split_sections(text, max_chars=DEFAULT_MAX_CHARS):
+    """Split text into chunks of at most max_chars, breaking between paragraphs"""
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    sections = []
+    current = ''
+    for paragraph in paragraphs:
+        while len(paragraph) > max_chars:
+            if current:
+                sections.append(current)
+                current = ''
+            sections.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            sections.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _title_for(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    # Leading sequence numbers only set the order ("01_intro.pdf")
+    stem = re.sub(r'^\d+[\s._-]*', '', stem) or stem
+    return re.sub(r'[_-]+', ' ', stem).strip().title() or 'Untitled'
+
+
+def ingest_documents(course_id, source, workers=None, max_chars=DEFAULT_MAX_CHARS, progress=None):
+    """Turn a zip or directory of documents into ordered lessons for a course.
+
+    Text extraction and summaries run in a process pool; the resulting
+    lessons are appended after the course's existing lessons with one
+    bulk INSERT in a single transaction. ``progress(done, total, name)`` is
+    called as each document finishes. Returns (lessons created, skipped names).
+    """
+    if db.session.get(Course, course_id) is None:
+        raise ValueError(f"Course {course_id} does not exist")
+
+    documents = collect_documents(source)
+    order = db.session.execute(
+        select(func.coalesce(func.max(Lesson.order), 0)).where(Lesson.course_id == course_id)
+    ).scalar()
+    rows = []
+    skipped = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, so lesson order follows file order
+        for done, (name, text, summary) in enumerate(pool.map(_extract, documents), start=1):
+            if text is None:
+                skipped.append(name)
+            else:
+                title = _title_for(name)
+                sections = split_sections(text, max_chars)
+                for part, section in enumerate(sections, start=1):
+                    order += 1
+                    content = f"Summary: {summary}\n\n{section}" if part == 1 else section
+                    rows.append({
+                        'title': title if len(sections) == 1 else f"{title} (Part {part})",
+                        'content': content,
+                        'content_html': render_lesson_html(content),
+                        'content_hash': content_hash(content),
+                        'content_type': 'text',
+                        'course_id': course_id,
+                        'order': order,
+                    })
+            if progress:
+                progress(done, len(documents), name)
+
+    if rows:
+        db.session.execute(insert(Lesson), rows)
+        lessons_added(course_id, len(rows))
+        db.session.commit()
+    logger.info("Ingested %d lessons into course %s from %d documents (%d skipped)",
+                len(rows), course_id, len(documents), len(skipped))
+    return len(rows), skipped
+
+
+@click.group('lessons')
+def lessons_cli():
+    """Bulk lesson management"""
+
+
+@lessons_cli.command('ingest')
+@click.argument('course_id', type=int)
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--workers', type=int, default=None, help='Extraction processes (default: CPU count).')
+@click.option('--max-chars', type=int, default=DEFAULT_MAX_CHARS, help='Maximum characters per lesson.')
+def lessons_ingest(course_id, source, workers, max_chars):
+    """Create lessons for COURSE_ID from a zip or directory of PDF, DOCX and TXT files"""
+    def report(done, total, name):
+        click.echo(f"[{done}/{total}] {name}")
+
+    try:
+        created, skipped = ingest_documents(course_id, source, workers=workers,
+                                            max_chars=max_chars, progress=report)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for name in skipped:
+        click.echo(f"Skipped (no extractable text): {name}")
+    click.echo(f"Created {created} lessons.")
+
+
+@lessons_cli.command('render')
+@click.option('--batch-size', type=int, default=200, help='Lessons per transaction.')
+@click.option('--all', 'rerender_all', is_flag=True, help='Also re-render lessons whose source or renderer changed.')
+def lessons_render(batch_size, rerender_all):
+    """Backfill the stored HTML rendering of lesson content"""
+    updated = backfill_rendered(batch_size=batch_size, rerender_all=rerender_all)
+    click.echo(f"Rendered {updated} lessons.")
+
+
+def register_lessons_cli(app):
+    """Register bulk lesson commands on the Flask CLI"""
+    app.cli.add_command(lessons_cli)
@@ -0,0 +1,194 @@
+import re
+import hashlib
+import logging
+from html import escape
+from html.parser import HTMLParser
+from sqlalchemy import select, update, or_
+from .. import db
+from ..models import Lesson
+
+logger = logging.getLogger(__name__)
+
+# Bump when the renderer's output changes so `flask lessons render --all`
+# can tell stale rows from current ones by their hash
+RENDER_VERSION = 1
+
+ALLOWED_TAGS = frozenset({
+    'a', 'b', 'blockquote', 'br', 'code', 'div', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 'span', 'strong', 'sub', 'sup', 'table',
+    'tbody', 'td', 'th', 'thead', 'tr', 'u', 'ul',
+})
+VOID_TAGS = frozenset({'br', 'hr', 'img'})
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = frozenset({'script', 'style', 'iframe', 'object', 'embed', 'template'})
+ALLOWED_ATTRS = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+SAFE_URL = re.compile(r'^(https?:|mailto:|/|#|[^:]*$)', re.I)
+TOC_TAGS = ('h2', 'h3')
+
+
+def content_hash(source):
+    """Hash of the lesson source and renderer version"""
+    return hashlib.sha256(f"{RENDER_VERSION}:{source or ''}".encode('utf-8')).hexdigest()
+
+
+def _slug(text, used):
+    base = re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'section'
+    slug = base
+    counter = 2
+    while slug in used:
+        slug = f"{base}-{counter}"
+        counter += 1
+    used.add(slug)
+    return slug
+
+
+class _Sanitizer(HTMLParser):
+    """Allowlist HTML sanitizer that also anchors headings for the table of contents"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+        self.headings = []
+        self._heading = None
+        self._slugs = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_ATTRS.get(tag, ()) or value is None:
+                continue
+            if name in ('href', 'src') and not SAFE_URL.match(value.strip()):
+                continue
+            kept.append(f' {name}="{escape(value, quote=True)}"')
+        if tag in TOC_TAGS:
+            # The id is filled in when the heading closes and its text is known
+            self._heading = (tag, len(self.out), [])
+        self.out.append(f"<{tag}{''.join(kept)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open_tags and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.out.append(f"</{current}>")
+            if self._heading and current == self._heading[0]:
+                self._close_heading()
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        if self._heading:
+            self._heading[2].append(data)
+        self.out.append(escape(data, quote=False))
+
+    def _close_heading(self):
+        tag, position, parts = self._heading
+        self._heading = None
+        text = ' '.join(''.join(parts).split())
+        if not text:
+            return
+        slug = _slug(text, self._slugs)
+        self.out[position] = self.out[position].replace(f"<{tag}", f'<{tag} id="{slug}"', 1)
+        self.headings.append((tag, slug, text))
+
+    def result(self):
+        while self.open_tags:
+            self.out.append(f"</{self.open_tags.pop()}>")
+        return ''.join(self.out)
+
+
+def _text_to_html(text):
+    """Plain-text lessons: blank lines separate paragraphs, '#' lines are headings"""
+    blocks = []
+    for block in re.split(r'\n\s*\n', text.strip()):
+        heading = re.match(r'^(#{1,3})\s+(.+)$', block.strip())
+        if heading and '\n' not in block.strip():
+            level = len(heading.group(1)) + 1
+            blocks.append(f"<h{level}>{escape(heading.group(2))}</h{level}>")
+        elif block.strip():
+            blocks.append('<p>' + '<br>'.join(escape(line) for line in block.strip().splitlines()) + '</p>')
+    return '\n'.join(blocks)
+
+
+def render_lesson_html(source):
+    """Return sanitized HTML for lesson source, with a table of contents when it has sections"""
+    if not source or not source.strip():
+        return ''
+    if not re.search(r'<[a-zA-Z][^>]*>', source):
+        source = _text_to_html(source)
+    parser = _Sanitizer()
+    parser.feed(source)
+    parser.close()
+    body = parser.result()
+    if len(parser.headings) < 2:
+        return body
+    items = ''.join(
+        f'<li class="toc-{tag}"><a href="#{slug}">{escape(text)}</a></li>'
+        for tag, slug, text in parser.headings
+    )
+    return f'<nav class="lesson-toc"><h5>Contents</h5><ul>{items}</ul></nav>\n{body}'
+
+
+def render_lesson(lesson):
+    """Refresh a lesson's stored HTML if its source changed since the last render"""
+    digest = content_hash(lesson.content)
+    if lesson.content_hash != digest:
+        lesson.content_html = render_lesson_html(lesson.content)
+        lesson.content_hash = digest
+
+
+def backfill_rendered(batch_size=200, rerender_all=False):
+    """Render lessons in id-ordered batches, committing after each batch.
+
+    By default only lessons that were never rendered are processed;
+    ``rerender_all`` also revisits rows whose hash no longer matches the
+    source or renderer version. Returns the number of lessons updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        query = (select(Lesson.id, Lesson.content, Lesson.content_hash, Lesson.updated_at)
+                 .where(Lesson.id > last_id))
+        if not rerender_all:
+            query = query.where(or_(Lesson.content_hash.is_(None), Lesson.content_html.is_(None)))
+        rows = db.session.execute(query.order_by(Lesson.id).limit(batch_size)).all()
+        if not rows:
+            break
+        # updated_at is passed through so a backfill does not look like an edit
+        changes = [
+            {'id': lesson_id, 'content_html': render_lesson_html(content),
+             'content_hash': content_hash(content), 'updated_at': updated_at}
+            for lesson_id, content, stored_hash, updated_at in rows
+            if not rerender_all or stored_hash != content_hash(content)
+        ]
+        if changes:
+            db.session.execute(update(Lesson), changes)
+        db.session.commit()
+        updated += len(changes)
+        last_id = rows[-1].id
+    logger.info("Rendered HTML for %d lessons", updated)
+    return updated
@@ -0,0 +1,96 @@
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import select, or_
+from .. import db
+from ..models import User
+
+ACCESS_LEVELS = ('basic', 'text_only', 'full_access')
+STATUSES = ('approved', 'pending')
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _prefix(column, term):
+    # A half-open range rather than LIKE, so the btree index on the column
+    # is used regardless of the database's LIKE collation rules
+    return (column >= term) & (column < term + '\uffff')
+
+
+@dataclass(frozen=True, slots=True)
+class UserFilters:
+    """Server-side filters for the admin user directory"""
+    q: str = ''
+    domain: str = ''
+    access_level: str = ''
+    status: str = ''
+    created_from: date | None = None
+    created_to: date | None = None
+
+    @classmethod
+    def from_args(cls, args, **overrides):
+        """Build filters from request query arguments, ignoring invalid values"""
+        access_level = args.get('access_level', '')
+        status = args.get('status', '')
+        values = {
+            'q': args.get('q', '').strip(),
+            'domain': args.get('domain', '').strip().lower(),
+            'access_level': access_level if access_level in ACCESS_LEVELS else '',
+            'status': status if status in STATUSES else '',
+            'created_from': _parse_date(args.get('created_from')),
+            'created_to': _parse_date(args.get('created_to')),
+        }
+        values.update(overrides)
+        return cls(**values)
+
+    def to_args(self):
+        """Non-empty filters as query arguments for url_for"""
+        return {key: (value.isoformat() if isinstance(value, date) else value)
+                for key, value in asdict(self).items() if value}
+
+    def conditions(self):
+        conditions = [User.is_admin.is_(False)]
+        if self.q:
+            conditions.append(or_(_prefix(User.username, self.q), _prefix(User.email, self.q)))
+        if self.domain:
+            conditions.append(User.email_domain == self.domain)
+        if self.access_level:
+            conditions.append(User.access_level == self.access_level)
+        if self.status:
+            conditions.append(User.is_approved.is_(self.status == 'approved'))
+        if self.created_from:
+            conditions.append(User.created_at >= datetime.combine(self.created_from, time.min))
+        if self.created_to:
+            conditions.append(User.created_at < datetime.combine(self.created_to + timedelta(days=1), time.min))
+        return conditions
+
+
+def user_page(filters, after=None, limit=None):
+    """Return (users, next_cursor) for one page of the directory, newest first.
+
+    Pages are keyed on the user id rather than an OFFSET, so fetching a
+    later page costs the same as the first. ``next_cursor`` is None on the
+    last page.
+    """
+    limit = limit or current_app.config['ADMIN_USERS_PAGE_SIZE']
+    query = select(User).where(*filters.conditions())
+    if after:
+        query = query.where(User.id < after)
+    users = db.session.execute(query.order_by(User.id.desc()).limit(limit + 1)).scalars().all()
+    if len(users) > limit:
+        return users[:limit], users[limit - 1].id
+    return users, None
+
+
+def user_domains():
+    """Distinct email domains of non-admin users, for the domain filter"""
+    return db.session.execute(
+        select(User.email_domain).distinct()
+        .where(User.is_admin.is_(False), User.email_domain.isnot(None))
+        .order_by(User.email_domain)
+    ).scalars().all()
@@ -5,6 +5,7 @@ Create test courses to demonstrate domain-specific access control
 import os
 from app import create_app
 from app.models import db, User, Course, Interest, CourseInterest
+from app.utils.access_rules import seed_legacy_rules
 
 def create_test_courses():
     """Create test courses including THBS-restricted ones"""
@@ -74,6 +75,9 @@ def create_test_courses():
         
         db.session.commit()
         
+        # Restrict the new erlang-l3 courses to THBS users
+        seed_legacy_rules()
+        
         print(f"✓ Created {len(courses)} test courses:")
         print(f"  - Regular course: {regular_course.title}")
         print(f"  - THBS-restricted courses:")
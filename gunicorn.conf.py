@@ -0,0 +1,42 @@
+import os
+
+# Set PRELOAD_APP=1 to import the app (models, routes, templates) once in
+# the master process; workers then share that memory copy-on-write.
+preload_app = os.environ.get('PRELOAD_APP') == '1'
+
+# Threads per worker; the app sizes its PostgreSQL pool from this and
+# WEB_CONCURRENCY (gunicorn's default worker count)
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+
+# Shared snapshot directory for /metrics when several workers run
+metrics_dir = os.environ.get('METRICS_DIR')
+
+
+def on_starting(server):
+    """Drop metric snapshots left by a previous run"""
+    if metrics_dir:
+        from app import metrics
+        metrics.clear_directory(metrics_dir)
+
+
+def post_fork(server, worker):
+    """Pass the real worker and thread counts to the app; drop inherited connections"""
+    # -w / --threads override the environment; the app sizes its database
+    # pool and admission slots from these
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    os.environ['GUNICORN_THREADS'] = str(server.cfg.threads)
+    if not preload_app:
+        return
+    from main import app
+    from app import db
+    app.config.update(WEB_CONCURRENCY=server.cfg.workers, GUNICORN_THREADS=server.cfg.threads)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Keep a finished worker's request counts in the merged metrics"""
+    if metrics_dir:
+        from app import metrics
+        metrics.mark_process_dead(worker.pid, metrics_dir)
@@ -1,5 +1,7 @@
 from app import create_app, db
+from app.schema import upgrade_schema
 from app.models import Interest, Course, Lesson, CourseInterest, User
+from app.utils.access_rules import seed_legacy_rules
 from datetime import datetime
 
 def create_interests(admin_id):
@@ -182,6 +184,9 @@ def create_sample_courses():
         db.session.commit()
         print("Successfully created courses and lessons!")
 
+        # Migration 10 only seeded rules for rows that existed back then
+        print(f"Added {seed_legacy_rules()} THBS access rule(s)")
+
         # Verify created courses
         courses = Course.query.all()
         print(f"Total courses in database: {len(courses)}")
@@ -195,5 +200,6 @@ def create_sample_courses():
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
+        upgrade_schema()
         create_sample_courses()
         print("Database setup complete.")
\ No newline at end of file
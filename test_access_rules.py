@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import select, update
+from app import create_app, db
+from app.config import Config
+from app.models import User, Interest, Course, CourseInterest, CourseAccessRule, UserInterest
+from app.schema import _picker_only_access_rules
+from app.utils.access_rules import seed_legacy_rules, visible_interests
+from app.utils.course_helpers import accessible_course_ids
+from setup_db import create_sample_courses
+
+
+class AccessRulesTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/rules.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        self.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.engine.dispose)
+
+        self.bt = User(username='bter', email='x@bt.com', email_domain='bt.com', is_approved=True,
+                       access_level='text_only')
+        self.bt.set_password('Btuser123')
+        self.erlang = Interest(name='Erlang', description='e')
+        self.fun = Interest(name='Fun', description='f')
+        db.session.add_all([self.bt, self.erlang, self.fun])
+        db.session.flush()
+        self.shared = Course(title='Games in Erlang', description='s')
+        self.fun_only = Course(title='Games', description='g')
+        db.session.add_all([self.shared, self.fun_only])
+        db.session.flush()
+        db.session.add_all([
+            CourseInterest(course_id=self.shared.id, interest_id=self.erlang.id),
+            CourseInterest(course_id=self.shared.id, interest_id=self.fun.id),
+            CourseInterest(course_id=self.fun_only.id, interest_id=self.fun.id),
+            UserInterest(user_id=self.bt.id, interest_id=self.erlang.id, access_granted=True),
+            UserInterest(user_id=self.bt.id, interest_id=self.fun.id, access_granted=True),
+        ])
+        db.session.commit()
+        seed_legacy_rules()
+
+    def test_seeded_fun_rule_only_hides_the_interest(self):
+        self.assertNotIn('Fun', [interest.name for interest in visible_interests(self.bt)])
+        # As before the rules existed, granted Fun courses stay open
+        self.assertEqual(accessible_course_ids(self.bt, [self.shared.id, self.fun_only.id]),
+                         {self.shared.id, self.fun_only.id})
+
+    def test_interest_rule_closes_its_courses(self):
+        db.session.add(CourseAccessRule(interest_id=self.erlang.id, email_domain='thbs.com'))
+        db.session.commit()
+        self.assertEqual(accessible_course_ids(self.bt, [self.shared.id, self.fun_only.id]), {self.fun_only.id})
+
+    def test_migration_turns_the_legacy_fun_rule_picker_only(self):
+        db.session.execute(update(CourseAccessRule).values(picker_only=False))
+        db.session.commit()
+        self.assertEqual(accessible_course_ids(self.bt, [self.fun_only.id]), set())
+        _picker_only_access_rules()
+        self.assertEqual(accessible_course_ids(self.bt, [self.fun_only.id]), {self.fun_only.id})
+
+    def test_saving_interests_keeps_hidden_selections(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.bt.id)
+            session['_fresh'] = True
+        response = client.post('/user/interests', data={'interests': [self.erlang.id]})
+        self.assertEqual(response.status_code, 302)
+        granted = db.session.execute(
+            select(UserInterest.interest_id, UserInterest.access_granted).where(UserInterest.user_id == self.bt.id)
+        ).all()
+        self.assertEqual(sorted(granted), sorted([(self.erlang.id, True), (self.fun.id, True)]))
+
+
+class FreshInstallTestCase(unittest.TestCase):
+    """Schema upgrade on an empty database, then the sample data from setup_db.py"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/fresh.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.engine.dispose)
+
+    def test_sample_data_gets_the_legacy_rules(self):
+        admin = User(username='admin', email='admin@thbs.com', email_domain='thbs.com', is_admin=True,
+                     is_approved=True)
+        admin.set_password('Admin1234')
+        bt = User(username='bter', email='x@bt.com', email_domain='bt.com', is_approved=True)
+        bt.set_password('Btuser123')
+        db.session.add_all([admin, bt])
+        db.session.commit()
+
+        create_sample_courses()
+
+        fun = Interest.query.filter_by(name='Fun').one()
+        rule = CourseAccessRule.query.filter_by(interest_id=fun.id).one()
+        self.assertEqual((rule.email_domain, rule.picker_only), ('thbs.com', True))
+        self.assertNotIn('Fun', [interest.name for interest in visible_interests(bt)])
+
+
+if __name__ == '__main__':
+    unittest.main()
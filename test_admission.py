@@ -0,0 +1,140 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import admission, create_app, db
+from app.cache import cache, MemoryBackend, FilesystemBackend
+from app.config import Config
+
+
+class AdmissionCountersContract:
+    """Rate windows and slot leases must clean up after themselves"""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        previous = cache.backend
+        cache.backend = self.make_backend()
+        self.addCleanup(setattr, cache, 'backend', previous)
+
+    def test_rate_limit_resets_after_the_window(self):
+        self.assertIsNone(admission._over_rate('login', '10.0.0.1', 2, 0.05))
+        self.assertIsNone(admission._over_rate('login', '10.0.0.1', 2, 0.05))
+        self.assertIsNotNone(admission._over_rate('login', '10.0.0.1', 2, 0.05))
+        self.assertIsNone(admission._over_rate('login', '10.0.0.2', 2, 0.05))
+        time.sleep(0.11)
+        self.assertIsNone(admission._over_rate('login', '10.0.0.1', 2, 0.05))
+
+    def test_rate_limit_keys_expire(self):
+        window = int(time.time() // 0.05)
+        admission._over_rate('login', '10.0.0.1', 2, 0.05)
+        # The window may have rolled over between reading the clock and counting
+        keys = [f'adm:rate:login:10.0.0.1:{window}', f'adm:rate:login:10.0.0.1:{window + 1}']
+        self.assertEqual(sum(map(cache.counter, keys)), 1)
+        time.sleep(0.16)
+        self.assertEqual(sum(map(cache.counter, keys)), 0)
+
+    def test_released_slot_is_free_again(self):
+        slots = admission._Slots('export', 1, 60)
+        key = slots.acquire()
+        self.assertIsNotNone(key)
+        self.assertIsNone(slots.acquire())
+        slots.release(key)
+        self.assertIsNotNone(slots.acquire())
+
+    def test_slot_of_a_dead_worker_is_freed_when_its_lease_lapses(self):
+        slots = admission._Slots('export', 1, 0.05)
+        key = slots.acquire()  # never released
+        self.assertIsNone(slots.acquire())
+        time.sleep(0.11)
+        self.assertIsNotNone(slots.acquire())
+        time.sleep(0.16)
+        self.assertEqual(cache.counter(key), 0)
+
+
+class MemoryAdmissionTestCase(AdmissionCountersContract, unittest.TestCase):
+    def make_backend(self):
+        return MemoryBackend()
+
+
+class FilesystemAdmissionTestCase(AdmissionCountersContract, unittest.TestCase):
+    def make_backend(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        return FilesystemBackend(self.directory)
+
+    def test_no_files_are_left_behind(self):
+        for n in range(20):
+            admission._over_rate('login', f'10.0.0.{n}', 5, 0.05)
+        slots = admission._Slots('export', 5, 0.05)
+        slots.release(slots.acquire())
+        time.sleep(0.16)
+        cache.backend.sweep()
+        self.assertEqual([name for name in os.listdir(self.directory) if not name.startswith('.')], [])
+
+
+class PoolSizeTestCase(unittest.TestCase):
+    def setUp(self):
+        previous = cache.backend
+        self.addCleanup(setattr, cache, 'backend', previous)
+        self.config = {'ADMISSION_EXPENSIVE_SLOTS': 0, 'WEB_CONCURRENCY': 4, 'GUNICORN_THREADS': 8}
+
+    def test_memory_backend_counts_one_worker(self):
+        cache.backend = MemoryBackend()
+        self.assertEqual(admission._pool_size(self.config), 4)
+
+    def test_shared_backend_counts_every_worker(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        cache.backend = FilesystemBackend(directory)
+        self.assertEqual(admission._pool_size(self.config), 16)
+        self.config['ADMISSION_EXPENSIVE_SLOTS'] = 3
+        self.assertEqual(admission._pool_size(self.config), 3)
+
+
+class RejectionTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        limits = {
+            'auth.login': {'methods': ('POST',), 'per_ip': (2, 60)},
+            'auth.two_factor_auth': {'methods': ('POST',)},
+        }
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/admission.db',
+                                 SCHEMA_AUTO_UPGRADE=True, ADMISSION_LIMITS=limits,
+                                 ADMISSION_EXPENSIVE_SLOTS=1):
+            self.app = create_app()
+        self.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        self.addCleanup(self.dispose, self.app)
+        self.client = self.app.test_client()
+
+    @staticmethod
+    def dispose(app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def test_rate_limited_request_gets_429(self):
+        form = {'email': 'nobody@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertNotEqual(self.client.post('/login', data=form).status_code, 429)
+        response = self.client.post('/login', data=form)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertNotEqual(self.client.get('/login').status_code, 429)
+
+    def test_full_pool_gets_503(self):
+        pool = admission._Slots(admission._POOL, 1, self.app.config['ADMISSION_LEASE_SECONDS'])
+        key = pool.acquire()
+        response = self.client.post('/two-factor', data={'token': '000000'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        pool.release(key)
+        self.assertNotEqual(self.client.post('/two-factor', data={'token': '000000'}).status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.config import Config
+from app.models import User, Interest, Course, CourseInterest, Lesson, UserInterest
+
+
+class ApiV1TestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/api.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.addCleanup(self.dispose, self.app)
+        # No app context stays pushed: requests must not share flask_login's user on g
+        with self.app.app_context():
+            interest = Interest(name='Erlang', description='e')
+            full = User(username='full', email='f@example.com', is_approved=True, access_level='full_access')
+            text = User(username='text', email='t@example.com', is_approved=True, access_level='text_only')
+            for user in (full, text):
+                user.set_password('Learner123')
+            courses = [Course(title=f'Course {n}', description=f'about {n}') for n in range(3)]
+            db.session.add_all([interest, full, text, *courses])
+            db.session.flush()
+            # Lessons without an order page as order 0, ahead of order 0 itself by id
+            lessons = [
+                Lesson(title=title, content=title, content_html=f'<p>{title}</p>', content_type=kind,
+                       video_url='https://video.example/v' if kind != 'text' else None, order=order,
+                       course_id=courses[0].id)
+                for title, kind, order in [('b', 'text', 2), ('none-1', 'video', None), ('a', 'mixed', 1),
+                                           ('none-2', 'text', None), ('zero', 'text', 0)]
+            ]
+            db.session.add_all(lessons)
+            db.session.add_all([CourseInterest(course_id=c.id, interest_id=interest.id) for c in courses])
+            db.session.add_all([UserInterest(user_id=user.id, interest_id=interest.id, access_granted=True)
+                                for user in (full, text)])
+            db.session.commit()
+            self.full, self.text = full.id, text.id
+            self.course_ids = [course.id for course in courses]
+            self.lesson_ids = {lesson.title: lesson.id for lesson in lessons}
+
+    @staticmethod
+    def dispose(app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    def pages(self, client, url):
+        """Follow ``next`` cursors; returns the records and the cursors seen"""
+        records, cursors, after = [], [], None
+        while True:
+            response = client.get(url, query_string={'limit': 2, **({'after': after} if after else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            self.assertLessEqual(len(body['data']), 2)
+            records += body['data']
+            after = body['next']
+            if after is None:
+                return records, cursors
+            cursors.append(after)
+
+    def test_course_pages_follow_the_id_cursor(self):
+        records, cursors = self.pages(self.client(self.full), '/api/v1/courses')
+        self.assertEqual([record['id'] for record in records], self.course_ids)
+        self.assertEqual(cursors, [str(self.course_ids[1])])
+
+    def test_lesson_pages_treat_null_order_as_zero(self):
+        records, cursors = self.pages(self.client(self.full), f'/api/v1/courses/{self.course_ids[0]}/lessons')
+        self.assertEqual([record['title'] for record in records], ['none-1', 'none-2', 'zero', 'a', 'b'])
+        self.assertEqual([record['order'] for record in records], [0, 0, 0, 1, 2])
+        self.assertEqual(cursors, [f"0:{self.lesson_ids['none-2']}", f"1:{self.lesson_ids['a']}"])
+
+    def test_fields_select_exactly_the_requested_keys(self):
+        client = self.client(self.full)
+        response = client.get('/api/v1/courses', query_string={'fields': 'title,id'})
+        self.assertEqual(list(response.get_json()['data'][0]), ['title', 'id'])
+
+        for fields in ('id,password_hash', ' , '):
+            response = client.get('/api/v1/courses', query_string={'fields': fields})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Unknown fields', response.get_json()['error'])
+        self.assertEqual(client.get('/api/v1/courses', query_string={'after': 'x'}).status_code, 400)
+        lessons_url = f'/api/v1/courses/{self.course_ids[0]}/lessons'
+        self.assertEqual(client.get(lessons_url, query_string={'after': '3'}).status_code, 400)
+
+    def test_matching_etag_gets_304(self):
+        client = self.client(self.full)
+        response = client.get('/api/v1/courses')
+        etag = response.headers['ETag']
+        self.assertEqual(client.get('/api/v1/courses', headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(client.get('/api/v1/courses', headers={'If-None-Match': '"stale"'}).status_code, 200)
+        # A different page is a different body
+        other = client.get('/api/v1/courses', query_string={'fields': 'id'}, headers={'If-None-Match': etag})
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+
+    def test_content_is_masked_by_access_level(self):
+        fields = {'fields': 'title,content_type,content_html,video_url'}
+        url = f'/api/v1/courses/{self.course_ids[0]}/lessons'
+        full = {r['title']: r for r in self.client(self.full).get(url, query_string=fields).get_json()['data']}
+        text = {r['title']: r for r in self.client(self.text).get(url, query_string=fields).get_json()['data']}
+
+        self.assertEqual(full['none-1']['video_url'], 'https://video.example/v')
+        self.assertEqual(full['a']['content_html'], '<p>a</p>')
+        # text_only: text lessons intact, video-only lessons blank, mixed lessons lose the video
+        self.assertEqual(text['zero']['content_html'], '<p>zero</p>')
+        self.assertEqual((text['none-1']['content_html'], text['none-1']['video_url']), (None, None))
+        self.assertEqual((text['a']['content_html'], text['a']['video_url']), ('<p>a</p>', None))
+
+        detail = self.client(self.text).get(f"/api/v1/lessons/{self.lesson_ids['none-1']}").get_json()['data']
+        self.assertEqual((detail['content_html'], detail['video_url']), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
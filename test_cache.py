@@ -0,0 +1,265 @@
+import os
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import socketserver
+
+from unittest import mock
+
+from sqlalchemy import update
+from app import create_app, db
+from app.cache import Cache, MemoryBackend, FilesystemBackend, RedisBackend, cache, table_tag
+from app.config import Config
+from app.models import User
+
+
+class _RespStandIn(socketserver.ThreadingTCPServer):
+    """Tiny in-memory server speaking enough of the Redis protocol for the cache"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _RespHandler)
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        """Drop key if its expiry has passed, as Redis does lazily"""
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        data, expires, lock = server.data, server.expires, server.lock
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with lock:
+                if command == b'GET':
+                    reply = self._bulk(server.live(args[1]))
+                elif command == b'MGET':
+                    reply = b'*%d\r\n' % (len(args) - 1) + b''.join(self._bulk(server.live(k)) for k in args[1:])
+                elif command == b'SET':
+                    data[args[1]] = args[2]
+                    expires.pop(args[1], None)
+                    if len(args) > 4 and args[3].upper() == b'PX':
+                        expires[args[1]] = time.monotonic() + int(args[4]) / 1000
+                    reply = b'+OK\r\n'
+                elif command == b'DEL':
+                    removed = sum(1 for k in args[1:] if data.pop(k, None) is not None)
+                    reply = b':%d\r\n' % removed
+                elif command == b'INCRBY':
+                    value = int(server.live(args[1]) or b'0') + int(args[2])
+                    data[args[1]] = str(value).encode()
+                    reply = b':%d\r\n' % value
+                elif command == b'PEXPIRE':
+                    found = server.live(args[1]) is not None
+                    if found:
+                        expires[args[1]] = time.monotonic() + int(args[2]) / 1000
+                    reply = b':%d\r\n' % found
+                elif command == b'SCAN':
+                    prefix = args[3].rstrip(b'*')
+                    keys = [k for k in data if k.startswith(prefix)]
+                    reply = b'*2\r\n$1\r\n0\r\n*%d\r\n' % len(keys) + b''.join(self._bulk(k) for k in keys)
+                else:
+                    reply = b'+OK\r\n'
+            self.wfile.write(reply)
+
+
+class CacheContract:
+    """Behaviour every backend must provide"""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.cache = Cache()
+        self.cache.backend = self.make_backend()
+
+    def test_set_get_delete(self):
+        self.cache.set('a', {'x': 1})
+        self.assertEqual(self.cache.get('a'), {'x': 1})
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('a', 'default'), 'default')
+
+    def test_get_many(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.assertEqual(self.cache.get_many('a', 'missing', 'b'), [1, None, 2])
+
+    def test_tags_invalidate_entries(self):
+        self.cache.set('tagged', 'value', tags=['table:users'])
+        self.cache.set('other', 'value', tags=['table:courses'])
+        self.cache.invalidate_tags('table:users')
+        self.assertIsNone(self.cache.get('tagged'))
+        self.assertEqual(self.cache.get('other'), 'value')
+
+    def test_incr_is_cumulative(self):
+        self.assertEqual(self.cache.incr('hits'), 1)
+        self.assertEqual(self.cache.incr('hits', 5), 6)
+        self.assertEqual(self.cache.counter('hits'), 6)
+        self.assertEqual(self.cache.counter('never'), 0)
+
+    def test_ttl_expires(self):
+        self.cache.set('short', 'value', ttl=0.05)
+        self.assertEqual(self.cache.get('short'), 'value')
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+
+    def test_incr_keeps_the_ttl_it_was_created_with(self):
+        self.cache.incr('window', ttl=0.1)
+        time.sleep(0.05)
+        self.assertEqual(self.cache.incr('window', ttl=0.1), 2)
+        time.sleep(0.07)
+        self.assertEqual(self.cache.counter('window'), 0)
+
+    def test_incr_after_expiry_starts_over(self):
+        self.cache.incr('window', 5, ttl=0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.incr('window', ttl=0.05), 1)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.counter('window'), 0)
+
+    def test_memoize_computes_once(self):
+        calls = []
+        compute = lambda: calls.append(1) or 'computed'
+        self.assertEqual(self.cache.memoize('m', compute), 'computed')
+        self.assertEqual(self.cache.memoize('m', compute), 'computed')
+        self.assertEqual(len(calls), 1)
+
+
+class MemoryCacheTestCase(CacheContract, unittest.TestCase):
+    def make_backend(self):
+        return MemoryBackend(max_entries=3)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key)
+        self.cache.get('a')
+        self.cache.set('d', 'd')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 'a')
+
+
+class FilesystemCacheTestCase(CacheContract, unittest.TestCase):
+    def make_backend(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        return FilesystemBackend(self.directory)
+
+    def test_entries_are_shared_between_instances(self):
+        self.cache.set('shared', [1, 2, 3])
+        other = FilesystemBackend(self.directory)
+        self.assertEqual(other.get('shared')[0], [1, 2, 3])
+
+    def _files(self):
+        return [name for name in os.listdir(self.directory) if not name.startswith('.')]
+
+    def test_expired_files_are_removed_when_read(self):
+        self.cache.set('short', 'value', ttl=0.05)
+        self.cache.incr('counter', ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.counter('counter'), 0)
+        self.assertEqual(self._files(), [])
+
+    def test_sweep_removes_expired_files_nobody_reads(self):
+        backend = self.cache.backend
+        for n in range(5):
+            backend.incr(f'window:{n}', ttl=0.05)
+        backend.set('kept', 'value')
+        time.sleep(0.1)
+        backend.sweep_limit = 3
+        self.assertLessEqual(backend.sweep(), 3)
+        backend.sweep_limit = 1000
+        backend.sweep()
+        self.assertEqual(self._files(), [os.path.basename(backend._path('kept'))])
+
+    def test_writes_sweep_once_per_interval(self):
+        backend = self.cache.backend
+        backend.incr('window', ttl=0.05)
+        time.sleep(0.1)
+        backend._next_sweep = 0
+        backend.set('kept', 'value')
+        self.assertEqual(self._files(), [os.path.basename(backend._path('kept'))])
+
+
+class RedisProtocolCacheTestCase(CacheContract, unittest.TestCase):
+    def make_backend(self):
+        url = os.environ.get('CACHE_TEST_REDIS_URL')
+        if not url:
+            server = _RespStandIn()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            url = 'redis://127.0.0.1:%d/0' % server.server_address[1]
+        backend = RedisBackend(url, prefix='test-cache:')
+        self.addCleanup(backend.clear)
+        return backend
+
+
+class CommitInvalidationTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/cache.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.engine.dispose)
+
+    def version(self, table):
+        return cache.counter('tag:' + table_tag(table))
+
+    def test_commit_bumps_written_table_tags(self):
+        before_users, before_courses = self.version('users'), self.version('courses')
+        user = User(username='tagged', email='tagged@thbs.com')
+        user.set_password('Tagged123')
+        db.session.add(user)
+        db.session.commit()
+        self.assertEqual(self.version('users'), before_users + 1)
+        self.assertEqual(self.version('courses'), before_courses)
+
+        db.session.execute(update(User).values(is_approved=True))
+        db.session.commit()
+        self.assertEqual(self.version('users'), before_users + 2)
+
+    def test_rollback_bumps_nothing(self):
+        before = self.version('users')
+        db.session.add(User(username='rolled', email='rolled@thbs.com', password_hash='x'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(self.version('users'), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
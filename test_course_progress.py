@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.config import Config
+from app.models import User, Course, Lesson, UserCourse, UserCourseProgress
+from app.utils.course_progress import lessons_added, lesson_removed, sync_course_completion, reconcile_progress
+from app.utils.learner_events import mark_progress, mark_complete
+
+
+class ProgressCountersTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/progress.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.engine.dispose)
+
+        self.users = [User(username=f'learner{n}', email=f'l{n}@example.com', is_approved=True) for n in range(3)]
+        for user in self.users:
+            user.set_password('Learner123')
+        self.course, self.other = Course(title='Erlang', description='e'), Course(title='OTP', description='o')
+        db.session.add_all([*self.users, self.course, self.other])
+        db.session.flush()
+        self.lessons = [self.add_lesson(self.course, n) for n in range(3)]
+        self.other_lesson = self.add_lesson(self.other, 0)
+        db.session.commit()
+
+    def add_lesson(self, course, order):
+        # As admin_add_lesson and the ingest command do
+        lesson = Lesson(title=f'{course.title} {order}', content='text', course_id=course.id, order=order)
+        db.session.add(lesson)
+        lessons_added(course.id)
+        db.session.flush()
+        return lesson
+
+    def delete_lesson(self, lesson):
+        # As admin_delete_lesson does
+        lesson_removed(lesson)
+        db.session.delete(lesson)
+        db.session.flush()
+        sync_course_completion(lesson.course_id)
+        db.session.commit()
+
+    def start(self, user, lesson):
+        mark_progress(user.id, lesson, self.progress_row(user, lesson))
+        db.session.commit()
+
+    def complete(self, user, lesson):
+        mark_complete(user.id, lesson, self.progress_row(user, lesson))
+        db.session.commit()
+
+    @staticmethod
+    def progress_row(user, lesson):
+        return lesson.user_progress.filter_by(user_id=user.id).first()
+
+    @staticmethod
+    def snapshot():
+        counters = {
+            (row.user_id, row.course_id): (row.completed_lessons, row.in_progress_lessons, row.total_lessons)
+            for row in UserCourseProgress.query
+        }
+        completed = {(row.user_id, row.course_id): bool(row.completed) for row in UserCourse.query}
+        return counters, completed
+
+    def test_counters_match_a_full_recount(self):
+        first, second, third = self.users
+        one, two, three = self.lessons
+        self.start(first, one)
+        self.complete(first, one)
+        self.complete(first, two)
+        self.start(first, three)
+        self.complete(second, one)
+        self.start(second, two)
+        self.complete(third, self.other_lesson)  # finishes the one-lesson course
+
+        four = self.add_lesson(self.course, 3)
+        self.add_lesson(self.other, 1)  # reopens it
+        db.session.commit()
+        self.complete(second, four)
+        self.start(second, four)  # completed lessons keep their status
+        self.delete_lesson(two)
+        self.complete(first, three)
+        self.complete(first, four)  # all remaining lessons done
+
+        counters, completed = self.snapshot()
+        self.assertEqual(counters[(first.id, self.course.id)], (3, 0, 3))
+        self.assertTrue(completed[(first.id, self.course.id)])
+        self.assertFalse(completed[(third.id, self.other.id)])
+
+        self.assertEqual(reconcile_progress(), 0)
+        self.assertEqual(self.snapshot(), (counters, completed))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from app import create_app, db
+from app.config import Config
+from app.models import (User, Interest, Course, CourseInterest, Lesson, UserInterest, UserLessonProgress,
+                        ClientEventReceipt)
+from app.routes import api
+from app.utils import learner_events
+from app.utils.learner_events import MAX_EVENT_AGE, ingest_events, _event_time
+
+
+class EventsFixture:
+    """A learner granted one course's interest but not the other's"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{directory}/events.db', SCHEMA_AUTO_UPGRADE=True):
+            self.app = create_app()
+        self.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.engine.dispose)
+
+        self.user = User(username='learner', email='l@example.com', email_domain='example.com', is_approved=True)
+        self.user.set_password('Learner123')
+        erlang, other = Interest(name='Erlang', description='e'), Interest(name='Other', description='o')
+        db.session.add_all([self.user, erlang, other])
+        db.session.flush()
+        open_course, closed_course = Course(title='Open', description='o'), Course(title='Closed', description='c')
+        db.session.add_all([open_course, closed_course])
+        db.session.flush()
+        self.lesson = Lesson(title='One', content='one', course_id=open_course.id, order=1)
+        self.closed_lesson = Lesson(title='Two', content='two', course_id=closed_course.id, order=1)
+        db.session.add_all([
+            self.lesson, self.closed_lesson,
+            CourseInterest(course_id=open_course.id, interest_id=erlang.id),
+            CourseInterest(course_id=closed_course.id, interest_id=other.id),
+            UserInterest(user_id=self.user.id, interest_id=erlang.id, access_granted=True),
+        ])
+        db.session.commit()
+
+    def ingest(self, *events):
+        results = ingest_events(self.user, list(events))
+        db.session.commit()
+        return results
+
+    def receipts(self):
+        return db.session.query(ClientEventReceipt.idempotency_key).order_by(ClientEventReceipt.idempotency_key).all()
+
+
+class IngestEventsTestCase(EventsFixture, unittest.TestCase):
+    def test_duplicate_key_returns_the_stored_result(self):
+        event = {'key': 'k1', 'type': 'complete', 'lesson_id': self.lesson.id}
+        first, = self.ingest(event)
+        self.assertTrue(first['ok'])
+        self.assertNotIn('duplicate', first)
+        again, = self.ingest(dict(event, type='progress'))
+        self.assertEqual(again, dict(first, duplicate=True))
+        self.assertEqual(db.session.get(UserLessonProgress, (self.user.id, self.lesson.id)).status, 'completed')
+
+    def test_rejected_events_store_no_receipt(self):
+        results = self.ingest(
+            {'key': 'bad-type', 'type': 'teleport', 'lesson_id': self.lesson.id},
+            {'key': 'bad-note', 'type': 'note', 'lesson_id': self.lesson.id, 'note_text': '  '},
+            {'key': 'no-lesson', 'type': 'complete', 'lesson_id': 999999},
+            {'key': 'good', 'type': 'bookmark', 'lesson_id': self.lesson.id},
+        )
+        self.assertEqual([result['ok'] for result in results], [False, False, False, True])
+        self.assertEqual(self.receipts(), [('good',)])
+        # A corrected retry under a rejected key is applied
+        retried, = self.ingest({'key': 'bad-note', 'type': 'note', 'lesson_id': self.lesson.id, 'note_text': 'hi'})
+        self.assertTrue(retried['ok'])
+        self.assertNotIn('duplicate', retried)
+
+    def test_inaccessible_course_is_denied(self):
+        result, = self.ingest({'key': 'k1', 'type': 'complete', 'lesson_id': self.closed_lesson.id})
+        self.assertEqual(result, {'key': 'k1', 'ok': False, 'error': 'access denied'})
+        self.assertIsNone(db.session.get(UserLessonProgress, (self.user.id, self.closed_lesson.id)))
+
+    def test_client_timestamps_are_clamped(self):
+        now = datetime(2024, 5, 1, 12, 0)
+        week_ago = (now - timedelta(days=7)).replace(tzinfo=timezone.utc)
+        self.assertEqual(_event_time(week_ago.timestamp() * 1000, now), now - MAX_EVENT_AGE)
+        self.assertEqual(_event_time('2024-05-02T12:00:00Z', now), now)
+        self.assertEqual(_event_time('2024-05-01T13:00:00+02:00', now), datetime(2024, 5, 1, 11, 0))
+        self.assertEqual(_event_time('yesterday', now), now)
+
+        before = datetime.utcnow()
+        self.ingest({'key': 'k1', 'type': 'complete', 'lesson_id': self.lesson.id, 'at': 0})
+        completed_at = db.session.get(UserLessonProgress, (self.user.id, self.lesson.id)).completed_at
+        self.assertLessEqual(before - MAX_EVENT_AGE, completed_at)
+        self.assertLessEqual(completed_at, datetime.utcnow() - MAX_EVENT_AGE)
+
+
+class EventsEndpointTestCase(EventsFixture, unittest.TestCase):
+    def post(self, events):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user.id)
+            session['_fresh'] = True
+        return client.post('/api/events', data=json.dumps({'events': events}), content_type='application/json')
+
+    def test_malformed_batch_is_rejected(self):
+        response = self.post([{'key': 'same', 'type': 'complete'}, {'key': 'same', 'type': 'complete'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.receipts(), [])
+
+    def test_concurrent_retry_answers_from_the_winners_receipts(self):
+        real = learner_events.ingest_events
+        calls = []
+
+        def losing_race(user, events):
+            calls.append(len(calls))
+            if len(calls) > 1:
+                return real(user, events)
+            # The other request with the same batch commits first...
+            real(user, events)
+            db.session.commit()
+            # ...so this one's receipt insert fails on the primary key
+            for receipt in [obj for obj in db.session.identity_map.values() if isinstance(obj, ClientEventReceipt)]:
+                db.session.expunge(receipt)
+            db.session.add(ClientEventReceipt(user_id=user.id, idempotency_key=events[0]['key'],
+                                              result={'key': events[0]['key'], 'ok': True}))
+            return [{'key': events[0]['key'], 'ok': True}]
+
+        with mock.patch.object(api, 'ingest_events', side_effect=losing_race):
+            response = self.post([{'key': 'k1', 'type': 'complete', 'lesson_id': self.lesson.id}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calls, [0, 1])
+        result, = response.get_json()['results']
+        self.assertTrue(result['duplicate'])
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(self.receipts(), [('k1',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
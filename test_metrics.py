@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app, db, metrics
+from app.config import Config
+from app.metrics import CACHE_REQUESTS, DOCUMENT_ANALYSIS_IN_PROGRESS, DOCUMENT_ANALYSIS_LATENCY, REQUEST_LATENCY
+
+
+def _histogram(metric, *values):
+    counts = [0] * (len(metric.buckets) + 1) + [0.0]
+    for value in values:
+        counts[next((i for i, bound in enumerate(metric.buckets) if value <= bound), len(metric.buckets))] += 1
+        counts[-1] += value
+    return counts
+
+
+class RenderTestCase(unittest.TestCase):
+    def test_counters_gauges_and_escaped_labels(self):
+        text = metrics.render({
+            CACHE_REQUESTS.name: {('app', 'hit'): 3, ('cat"a\\log', 'miss'): 1},
+            DOCUMENT_ANALYSIS_IN_PROGRESS.name: {(): 2},
+        })
+        lines = text.splitlines()
+        self.assertIn('# TYPE lms_cache_requests_total counter', lines)
+        self.assertIn('lms_cache_requests_total{cache="app",result="hit"} 3', lines)
+        self.assertIn('lms_cache_requests_total{cache="cat\\"a\\\\log",result="miss"} 1', lines)
+        self.assertIn('lms_document_analysis_in_progress 2', lines)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_histograms_are_cumulative_with_request_totals(self):
+        labels = ('learner.index', 'GET', '200')
+        buckets = REQUEST_LATENCY.buckets
+        text = metrics.render({REQUEST_LATENCY.name: {labels: _histogram(REQUEST_LATENCY, buckets[0], buckets[-1] * 2)}})
+        lines = text.splitlines()
+        series = 'endpoint="learner.index",method="GET",status="200"'
+        self.assertIn(f'lms_http_request_duration_seconds_bucket{{{series},le="{buckets[0]!r}"}} 1', lines)
+        self.assertIn(f'lms_http_request_duration_seconds_bucket{{{series},le="{buckets[-1]!r}"}} 1', lines)
+        self.assertIn(f'lms_http_request_duration_seconds_bucket{{{series},le="+Inf"}} 2', lines)
+        self.assertIn(f'lms_http_request_duration_seconds_count{{{series}}} 2', lines)
+        self.assertIn(f'lms_http_requests_total{{{series}}} 2', lines)
+
+
+class DeadProcessTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def write(self, pid, snapshot):
+        metrics._write(os.path.join(self.directory, f'{pid}.json'), snapshot)
+
+    def test_dead_workers_are_folded_into_one_file(self):
+        latency = _histogram(DOCUMENT_ANALYSIS_LATENCY, 0.5)
+        for pid in (101, 102):
+            self.write(pid, {
+                CACHE_REQUESTS.name: {('app', 'hit'): pid - 100},
+                DOCUMENT_ANALYSIS_LATENCY.name: {('ok',): latency},
+                DOCUMENT_ANALYSIS_IN_PROGRESS.name: {(): 1},
+            })
+        metrics.mark_process_dead(101, self.directory)
+        metrics.mark_process_dead(102, self.directory)
+        metrics.mark_process_dead(103, self.directory)  # never wrote a snapshot
+
+        self.assertEqual(sorted(os.listdir(self.directory)), [metrics._DEAD_FILE])
+        dead = metrics._read(os.path.join(self.directory, metrics._DEAD_FILE))
+        self.assertEqual(dead[CACHE_REQUESTS.name], {('app', 'hit'): 3})
+        self.assertEqual(dead[DOCUMENT_ANALYSIS_LATENCY.name][('ok',)], [a + b for a, b in zip(latency, latency)])
+        # Gauges describe live processes only
+        self.assertNotIn(DOCUMENT_ANALYSIS_IN_PROGRESS.name, dead)
+
+    def test_totals_include_dead_workers(self):
+        self.write(101, {CACHE_REQUESTS.name: {('dead-test', 'hit'): 5}})
+        metrics.mark_process_dead(101, self.directory)
+        total = metrics.collect_directory(self.directory)
+        self.assertEqual(total[CACHE_REQUESTS.name][('dead-test', 'hit')], 5)
+
+
+class MetricsAccessTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.database_url = f'sqlite:///{directory}/metrics.db'
+
+    def client(self, **config):
+        with mock.patch.multiple(Config, DATABASE_URL=self.database_url, SCHEMA_AUTO_UPGRADE=True, **config):
+            app = create_app()
+        self.addCleanup(self.dispose, app)
+        return app.test_client()
+
+    @staticmethod
+    def dispose(app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def test_unconfigured_endpoint_is_hidden(self):
+        self.assertEqual(self.client().get('/metrics').status_code, 404)
+
+    def test_token_is_required(self):
+        client = self.client(METRICS_TOKEN='s3cret')
+        self.assertEqual(client.get('/metrics').status_code, 401)
+        self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE lms_http_request_duration_seconds histogram', response.data)
+
+    def test_allowed_networks_match_the_connection_not_forwarded_for(self):
+        client = self.client(METRICS_ALLOWED_NETWORKS='10.1.0.0/16')
+        inside, outside = {'REMOTE_ADDR': '10.1.2.3'}, {'REMOTE_ADDR': '203.0.113.9'}
+        self.assertEqual(client.get('/metrics', environ_base=inside).status_code, 200)
+        self.assertEqual(client.get('/metrics', environ_base=outside).status_code, 404)
+        spoofed = client.get('/metrics', environ_base=outside, headers={'X-Forwarded-For': '10.1.2.3'})
+        self.assertEqual(spoofed.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app, db, profiling
+from app.config import Config
+
+
+class ProfiledRequestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{self.directory}/profiling.db',
+                                 SCHEMA_AUTO_UPGRADE=True, PROFILE_DIR=os.path.join(self.directory, 'profiles')):
+            self.app = create_app()
+        self.addCleanup(self.dispose, self.app)
+        self.client = self.app.test_client()
+        self.headers = {profiling.HEADER: profiling.issue_token(self.app, 1)}
+
+    @staticmethod
+    def dispose(app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def get(self):
+        # Closing the response ends the profile
+        with self.client.get('/login', headers=self.headers) as response:
+            return response.status_code
+
+    def saved(self):
+        return [profile['kind'] for profile in profiling.list_profiles(self.app)]
+
+    def test_signed_request_is_profiled(self):
+        self.assertEqual(self.get(), 200)
+        self.assertEqual(self.saved(), ['pstats'])
+        self.assertFalse(profiling._profiling.locked())
+
+    def test_concurrent_request_falls_back_to_sampling(self):
+        with profiling._profiling:
+            self.assertEqual(self.get(), 200)
+        self.assertEqual(self.saved(), [])
+
+    def test_another_active_profiler_is_not_an_error(self):
+        # What Python 3.12+ raises while another cProfile is enabled
+        busy = ValueError('Another profiling tool is already active')
+        with mock.patch.object(profiling.cProfile.Profile, 'enable', side_effect=busy):
+            self.assertEqual(self.get(), 200)
+        self.assertEqual(self.saved(), [])
+        self.assertFalse(profiling._profiling.locked())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import g
+from sqlalchemy import select, text
+from app import create_app, db
+from app.config import Config
+from app.db_routing import replica_set
+from app.models import User, ForumTopic
+
+_tmpdir = tempfile.mkdtemp()
+_primary = os.path.join(_tmpdir, 'primary.db')
+_replica = os.path.join(_tmpdir, 'replica.db')
+
+
+class ReadReplicaRoutingTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with mock.patch.multiple(Config, DATABASE_URL=f'sqlite:///{_primary}',
+                                 DATABASE_REPLICA_URLS=f'sqlite:///{_replica}', SCHEMA_AUTO_UPGRADE=True):
+            cls.app = create_app()
+        cls.app.config['TESTING'] = True
+        with cls.app.app_context():
+            user = User(username='reader', email='reader@thbs.com', is_approved=True)
+            user.set_password('Reader123')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(ForumTopic(title='Replicated topic', content='x', user_id=user.id))
+            db.session.commit()
+            cls.user_id = user.id
+            for engine in db.engines.values():
+                engine.dispose()
+        # The replica is a copy taken before the next write, so it lags the
+        # primary; the backup API also copies pages still in the WAL
+        with sqlite3.connect(_primary) as source, sqlite3.connect(_replica) as target:
+            source.backup(target)
+        with cls.app.app_context():
+            db.session.add(ForumTopic(title='Primary-only topic', content='x', user_id=cls.user_id))
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    def setUp(self):
+        replica_set._health.clear()
+        self.client = self.app.test_client()
+
+    def test_annotated_view_reads_from_replica(self):
+        response = self.client.get('/forum')
+        self.assertIn(b'Replicated topic', response.data)
+        self.assertNotIn(b'Primary-only topic', response.data)
+
+    def test_unannotated_session_reads_from_primary(self):
+        with self.app.test_request_context('/'):
+            titles = db.session.execute(select(ForumTopic.title)).scalars().all()
+        self.assertIn('Primary-only topic', titles)
+
+    def test_session_is_pinned_to_primary_after_a_write(self):
+        with self.app.test_request_context('/'):
+            g.replica_reads = True
+            before = db.session.execute(select(ForumTopic.title)).scalars().all()
+            db.session.add(ForumTopic(title='Written in request', content='x', user_id=self.user_id))
+            db.session.flush()
+            after = db.session.execute(select(ForumTopic.title)).scalars().all()
+            db.session.rollback()
+            db.session.remove()
+        self.assertNotIn('Primary-only topic', before)
+        self.assertIn('Written in request', after)
+
+    def test_text_dml_goes_to_primary_and_pins(self):
+        with self.app.test_request_context('/'):
+            g.replica_reads = True
+            db.session.execute(text("UPDATE forum_topics SET content = 'y' WHERE title = 'Primary-only topic'"))
+            self.assertTrue(db.session.info.get('primary_pinned'))
+            titles = db.session.execute(text('SELECT title FROM forum_topics')).scalars().all()
+            db.session.rollback()
+            db.session.remove()
+        self.assertIn('Primary-only topic', titles)
+
+    def test_text_select_reads_from_replica(self):
+        with self.app.test_request_context('/'):
+            g.replica_reads = True
+            titles = db.session.execute(text('SELECT title FROM forum_topics')).scalars().all()
+            self.assertFalse(db.session.info.get('primary_pinned'))
+            db.session.remove()
+        self.assertNotIn('Primary-only topic', titles)
+
+    def test_one_replica_per_request(self):
+        with self.app.test_request_context('/'), mock.patch('app.db_routing.random.choice',
+                                                            side_effect=lambda keys: keys[0]) as choice:
+            g.replica_reads = True
+            db.session.execute(select(ForumTopic.title)).all()
+            db.session.execute(select(ForumTopic.id)).all()
+            db.session.remove()
+        self.assertEqual(choice.call_count, 1)
+
+    def test_recent_writer_stays_on_primary(self):
+        with self.client.session_transaction() as session:
+            session['primary_until'] = time.time() + 60
+        response = self.client.get('/forum')
+        self.assertIn(b'Primary-only topic', response.data)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        for key in replica_set.keys:
+            replica_set._health[key] = (False, time.monotonic())
+        response = self.client.get('/forum')
+        self.assertIn(b'Primary-only topic', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()